@@ -1,57 +1,80 @@
 from mesa import Agent
-from algorithms.astar import astar_search
-import random
+from algorithms.astar import search_many
+from algorithms.fields import uphill_step
 import math
 
 class Native(Agent):
     """
-    Prey: flees from nearest Voidspawn using A*.
+    Prey: flees from the Voidspawns.
+    native_flee="field" climbs the model's shared threat field (one grid sweep
+    per tick for all Natives); native_flee="sample" scores candidate goals with
+    one multi-goal search, bounded to a window when model.search_horizon is set.
+    native_flee="policy" (and leaders, whenever model.native_policy is set)
+    take one lookup in the shared Q-table (algorithms.qlearning).
     Has vision_range set from the model defaults.
+    unique_id defaults to the model's next integer id (model.next_id()).
     """
-    def __init__(self, pos, model, leader=False):
-        super().__init__(unique_id=f"native_{pos[0]}_{pos[1]}", model=model)
+    def __init__(self, pos, model, leader=False, unique_id=None):
+        super().__init__(unique_id=model.next_id() if unique_id is None else unique_id, model=model)
         self.pos = pos
         self.leader = leader
-        # future: q-table etc
-        self.q_table = {}
         # vision range from model preference
         self.vision_range = getattr(model, "native_vision", 5)
 
     def step(self):
-        # find nearest voidspawn
-        voids = [a for a in self.model.schedule.agents if a.__class__.__name__ == "Voidspawn"]
-        if not voids:
-            # wander randomly if no predator
-            self._random_move()
+        if self.pos is None:
+            # killed earlier this tick
             return
+        next_pos = self.plan()
+        if next_pos is not None:
+            self.model.move_agent(self, next_pos)
+
+    def plan(self, model=None, rng=None):
+        """
+        Cell to move to this tick, or None to stay. Only reads model (self.model,
+        or a frozen scheduling.PlanningView) and draws from rng (self.random).
+        """
+        model = self.model if model is None else model
+        rng = self.random if rng is None else rng
+        policy = getattr(model, "native_policy", None)
+        if policy is not None and (self.leader or model.native_flee == "policy"):
+            return self._plan_policy(model, policy, rng)
+        if getattr(model, "native_flee", "sample") == "field":
+            return self._plan_field(model, rng)
+        # find nearest voidspawn through the model's spatial index
+        nearest_void = model.nearest_agent("Voidspawn", self.pos)
+        if nearest_void is None:
+            # wander randomly if no predator
+            return self._random_cell(model, rng)
 
-        # nearest voidspawn
         def manhattan(a_pos, b_pos):
             return abs(a_pos[0]-b_pos[0]) + abs(a_pos[1]-b_pos[1])
 
-        nearest_void = min(voids, key=lambda v: manhattan(self.pos, v.pos))
+        # search window: the whole map, or search_horizon cells around us
+        # ("vision" = this Native's vision_range)
+        horizon = getattr(model, "search_horizon", None)
+        if horizon == "vision":
+            horizon = self.vision_range
+        if horizon is None:
+            x0, y0, x1, y1 = 0, 0, model.width-1, model.height-1
+        else:
+            x0, y0 = max(0, self.pos[0]-horizon), max(0, self.pos[1]-horizon)
+            x1, y1 = min(model.width-1, self.pos[0]+horizon), min(model.height-1, self.pos[1]+horizon)
 
         # generate candidate goals: corners + random samples
-        candidates = [
-            (0, 0),
-            (0, self.model.height-1),
-            (self.model.width-1, 0),
-            (self.model.width-1, self.model.height-1)
-        ]
+        candidates = [(x0, y0), (x0, y1), (x1, y0), (x1, y1)]
         # add random samples
         for _ in range(12):
-            candidates.append((self.random.randrange(self.model.width), self.random.randrange(self.model.height)))
+            candidates.append((rng.randrange(x0, x1+1), rng.randrange(y0, y1+1)))
 
-        # evaluate candidates: must be reachable (A* returns path)
+        # evaluate candidates: must be reachable; one expansion serves them all
+        reachable, _ = search_many(model, self.pos, candidates, horizon=horizon, paths=True)
         best = None
         best_score = -math.inf
         for cand in candidates:
-            # skip if out of bounds
-            if cand[0] < 0 or cand[0] >= self.model.width or cand[1] < 0 or cand[1] >= self.model.height:
-                continue
-            path = astar_search(self.model, start=self.pos, goal=cand)
-            if not path:
+            if cand not in reachable:
                 continue
+            path = reachable[cand][1]
             # score = distance from predator at goal minus path length penalty
             dist = manhattan(cand, nearest_void.pos)
             score = dist - 0.5 * len(path)  # encourage reachable but far positions
@@ -61,21 +84,33 @@ class Native(Agent):
 
         if best is None:
             # cannot find path to any candidate -> random move
-            self._random_move()
-            return
+            return self._random_cell(model, rng)
 
         target, path = best
-        # move one step along path (if path len >= 2)
-        if len(path) >= 2:
-            next_pos = path[1]
-            self.model.grid.move_agent(self, next_pos)
-            self.pos = next_pos
-        else:
-            # already at the target
-            pass
+        # one step along path (if path len >= 2); otherwise already at the target
+        return path[1] if len(path) >= 2 else None
+
+    def _plan_field(self, model, rng):
+        field = model.threat_field()
+        x, y = self.pos
+        if field[x][y] == math.inf:
+            # no predator can reach us: wander as if there were none
+            return self._random_cell(model, rng)
+        # step to the neighbour the predators need longest to reach;
+        # stay put when already at a local maximum of the threat field
+        return uphill_step(model, field, self.pos, rng)
+
+    def _plan_policy(self, model, policy, rng):
+        dx, dy = policy.act(self, model, rng)
+        if dx == 0 and dy == 0:
+            return None
+        x, y = self.pos[0] + dx, self.pos[1] + dy
+        # moves into walls or off the map leave the Native where it is
+        if 0 <= x < model.width and 0 <= y < model.height and model.passable[x, y]:
+            return (x, y)
+        return None
 
-    def _random_move(self):
+    def _random_cell(self, model, rng):
         # include Moore neighborhood for more natural movement
-        neighbors = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-        if neighbors:
-            self.model.grid.move_agent(self, random.choice(neighbors))
+        neighbors = model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
+        return rng.choice(neighbors) if neighbors else None
@@ -7,9 +7,10 @@ class Rift(Agent):
     Rift periodically spawns Voidspawns at its location.
     spawn_interval: initial ticks between spawns (provided from model)
     rift_accelerate: if True, interval will slowly reduce after each spawn
+    unique_id defaults to the model's next integer id (model.next_id()).
     """
-    def __init__(self, pos, model, spawn_interval=30):
-        super().__init__(unique_id=f"rift_{pos[0]}_{pos[1]}", model=model)
+    def __init__(self, pos, model, spawn_interval=30, unique_id=None):
+        super().__init__(unique_id=model.next_id() if unique_id is None else unique_id, model=model)
         self.pos = pos
         # allow rift-specific spawn interval, but default to model-wide setting
         self.spawn_interval = spawn_interval if spawn_interval is not None else getattr(model, "rift_spawn_interval", 30)
@@ -20,9 +21,9 @@ class Rift(Agent):
         self._tick += 1
         if self._tick >= self.spawn_interval:
             self._tick = 0
-            vs = Voidspawn(self.pos, self.model)
-            self.model.grid.place_agent(vs, self.pos)
-            self.model.schedule.add(vs)
+            # fresh integer id; the instance may be a recycled one from the model's pool
+            vs = self.model.spawn_agent(Voidspawn, self.pos)
+            self.model.place_agent(vs, self.pos)
             # optional acceleration: reduce spawn_interval gradually
             if getattr(self.model, "rift_accelerate", False):
                 # reduce the interval by 1 each spawn down to min_interval
@@ -1,58 +1,84 @@
 from mesa import Agent
 from algorithms.astar import astar_search
-import random
+from algorithms.fields import downhill_step
 
 class Voidspawn(Agent):
     """
-    Predator: uses A* to hunt nearest Native.
-    Moves one step along A* path each tick.
+    Predator: hunts the nearest Native.
+    Moves one step each tick, either down the model's shared hunt field
+    (void_hunting="field"), along its own A* path (void_hunting="astar") or
+    along a lazily refined hierarchical route (void_hunting="hpa").
+    unique_id defaults to the model's next integer id (model.next_id()).
     """
-    def __init__(self, pos, model):
-        super().__init__(unique_id=f"void_{pos[0]}_{pos[1]}", model=model)
+    def __init__(self, pos, model, unique_id=None):
+        super().__init__(unique_id=model.next_id() if unique_id is None else unique_id, model=model)
         self.pos = pos
         self.attack_range = 1
         # vision range from model default
         self.vision_range = getattr(model, "void_vision", 6)
 
     def step(self):
-        # find nearest native
-        natives = [a for a in self.model.schedule.agents if a.__class__.__name__ == "Native"]
-        if not natives:
-            # roam randomly if no natives
-            self._random_move()
+        if self.pos is None:
+            # removed earlier this tick
+            return
+        action = self.plan()
+        if action is None:
             return
+        kind, arg = action
+        if kind == "attack":
+            # remove the native from schedule and grid
+            self.model.remove_agent(arg)
+        else:
+            self.model.move_agent(self, arg)
 
-        # compute Manhattan distances and pick nearest
-        def manhattan(a_pos, b_pos):
-            return abs(a_pos[0]-b_pos[0]) + abs(a_pos[1]-b_pos[1])
+    def plan(self, model=None, rng=None):
+        """
+        This tick's action: ("attack", native), ("move", cell) or None. Only
+        reads model (self.model, or a frozen scheduling.PlanningView) and draws
+        from rng (self.random).
+        """
+        model = self.model if model is None else model
+        rng = self.random if rng is None else rng
+        # find nearest native through the model's spatial index, limited to
+        # vision_range when the model disables global knowledge
+        max_dist = self.vision_range if getattr(model, "hunt_in_vision", False) else None
+        target_native = model.nearest_agent("Native", self.pos, max_dist=max_dist)
+        if target_native is None:
+            # roam randomly if no natives
+            return self._random_move(model, rng)
 
-        natives_sorted = sorted(natives, key=lambda n: manhattan(self.pos, n.pos))
-        target_native = natives_sorted[0]
         # if adjacent -> attack
-        if manhattan(self.pos, target_native.pos) <= self.attack_range:
-            # remove the native from schedule and grid
-            try:
-                self.model.grid.remove_agent(target_native)
-            except Exception:
-                pass
-            try:
-                self.model.schedule.remove(target_native)
-            except Exception:
-                pass
-            return
+        in_range = model.agents_within("Native", self.pos, self.attack_range)
+        if in_range:
+            return ("attack", in_range[0])
+
+        if getattr(model, "void_hunting", "astar") == "field":
+            field = model.hunt_field()
+            # the shared field leads to the nearest Native on the whole map; its
+            # value bounds that Native's distance (cells cost >= 1), so under
+            # hunt_in_vision it is only followed while that Native is in sight.
+            # Otherwise chase the Native seen above with a private search.
+            if max_dist is None or field[self.pos[0]][self.pos[1]] <= max_dist:
+                # one O(1) step down the shared field instead of a private search
+                next_pos = downhill_step(model, field, self.pos)
+                if next_pos is not None:
+                    return ("move", next_pos)
+                return self._random_move(model, rng)
 
-        # else compute A* path to target_native.pos
-        path = astar_search(self.model, start=self.pos, goal=target_native.pos)
+        # else compute A* path to target_native.pos, reusing/repairing last tick's path when cached
+        cache = getattr(model, "path_cache", None)
+        if getattr(model, "void_hunting", "astar") == "hpa":
+            path = model.hierarchical_planner().find(self, self.pos, target_native.pos)
+        elif cache is not None:
+            path = cache.find(self, self.pos, target_native.pos)
+        else:
+            path = astar_search(model, start=self.pos, goal=target_native.pos)
         # move one step along path if possible (path includes start)
         if path and len(path) >= 2:
-            next_pos = path[1]
-            self.model.grid.move_agent(self, next_pos)
-            self.pos = next_pos
-        else:
-            # fallback: random walk
-            self._random_move()
+            return ("move", path[1])
+        # fallback: random walk
+        return self._random_move(model, rng)
 
-    def _random_move(self):
-        neighbors = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-        if neighbors:
-            self.model.grid.move_agent(self, random.choice(neighbors))
+    def _random_move(self, model, rng):
+        neighbors = model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
+        return ("move", rng.choice(neighbors)) if neighbors else None
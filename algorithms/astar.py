@@ -2,6 +2,16 @@
 astar.py - A* search on the model grid that respects TerrainTile.movement_cost
 and treats Obstacle agents as impassable.
 Returns a list of positions [(x,y), ...] including start and goal, or None if no path.
+
+Two node-access modes are supported:
+  - "layers": read the model's array-backed movement_cost / passable layers (fast, default)
+  - "grid":   scan cell contents for TerrainTile / Obstacle agents (reference fallback)
+The mode is taken from model.pathfinding unless passed explicitly.
+
+Searches can be bounded around the start: horizon limits them to the
+(2*horizon+1)^2 window centred on start, max_cost to paths costing at most
+that much. astar_path and search_many also report the nodes expanded, so a
+bounded search has a known worst-case cost whatever the map size.
 """
 import heapq
 
@@ -36,35 +46,312 @@ def heuristic(a, b):
     # Manhattan heuristic
     return abs(a[0]-b[0]) + abs(a[1]-b[1])
 
-def astar_search(model, start, goal):
+def _resolve_mode(model, mode):
+    if mode is None:
+        mode = getattr(model, "pathfinding", "grid")
+    if mode == "layers" and not hasattr(model, "static_layers"):
+        # model without array layers -> fall back to walking the grid
+        mode = "grid"
+    elif mode == "grid" and not getattr(model, "static_agents", True):
+        # no TerrainTile/Obstacle agents on the grid to walk -> read the layers
+        mode = "layers"
+    return mode
+
+def _reconstruct(came_from, node):
+    path = []
+    while node is not None:
+        path.append(node)
+        node = came_from[node]
+    return list(reversed(path))
+
+def _record(model, expanded):
+    # report the search to the model's tick profiler, if one is switched on
+    prof = getattr(model, "profiler", None)
+    if prof is not None and prof.enabled:
+        prof.add("astar_calls", 1)
+        prof.add("astar_nodes", expanded)
+
+def _window(model, start, horizon):
+    # inclusive (x0, y0, x1, y1) search bounds
+    if horizon is None:
+        return 0, 0, model.width - 1, model.height - 1
+    sx, sy = start
+    return max(0, sx - horizon), max(0, sy - horizon), min(model.width - 1, sx + horizon), min(model.height - 1, sy + horizon)
+
+def astar_search(model, start, goal, mode=None, horizon=None, max_cost=None):
     """Return path as list of positions from start to goal inclusive, or None."""
+    return astar_path(model, start, goal, mode=mode, horizon=horizon, max_cost=max_cost)[0]
+
+def astar_path(model, start, goal, mode=None, horizon=None, max_cost=None):
+    """
+    Like astar_search, but returns (path, nodes expanded). With horizon and/or
+    max_cost the search stays inside those bounds and path is None when the
+    goal cannot be reached within them.
+    """
+    mode = _resolve_mode(model, mode)
+    if mode == "grid":
+        path, expanded = _astar_grid(model, start, goal, horizon, max_cost)
+    else:
+        path, expanded = _astar_layers(model, start, goal, horizon, max_cost)
+    _record(model, expanded)
+    return path, expanded
+
+def search_many(model, start, goals, mode=None, horizon=None, max_cost=None, paths=False):
+    """
+    One expansion from start towards several goals (uniform-cost search that
+    stops once every goal is settled or the bounds are exhausted).
+    Returns (results, expanded): results maps each reachable goal to
+    (cost, next_step), or to (cost, path) with paths=True; goals that are
+    blocked or out of bounds are left out. next_step is start for goal == start.
+    """
+    mode = _resolve_mode(model, mode)
+    if mode == "grid":
+        # reference fallback: one search per goal
+        results, expanded = {}, 0
+        for goal in set(goals):
+            path, n = _astar_grid(model, start, goal, horizon, max_cost)
+            expanded += n
+            if path:
+                cost = sum(_get_terrain_cost(model, c) for c in path[1:])
+                results[goal] = (cost, path if paths else path[min(1, len(path) - 1)])
+        _record(model, expanded)
+        return results, expanded
+
+    results, expanded = _search_many_layers(model, start, goals, horizon, max_cost, paths)
+    _record(model, expanded)
+    return results, expanded
+
+def _search_many_layers(model, start, goals, horizon, max_cost, paths):
+    x0, y0, x1, y1 = _window(model, start, horizon)
+    costs, passable = model.static_layers()
+    pending = {g for g in goals if x0 <= g[0] <= x1 and y0 <= g[1] <= y1 and passable[g[0]][g[1]]}
+    results = {}
+    if start in pending:
+        pending.discard(start)
+        results[start] = (0, [start] if paths else start)
+    if not pending:
+        return results, 0
+
+    frontier = [(0, start)]
+    cost_so_far = {start: 0}
+    # first step of the best path to each node (or its predecessor, for full paths)
+    first = {start: start}
+    came_from = {start: None}
+    done = set()
+    expanded = 0
+    while frontier and pending:
+        d, current = heapq.heappop(frontier)
+        if current in done:
+            continue
+        done.add(current)
+        if current in pending:
+            pending.discard(current)
+            results[current] = (d, _reconstruct(came_from, current) if paths else first[current])
+            if not pending:
+                break
+        expanded += 1
+        x, y = current
+        for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            if nx < x0 or ny < y0 or nx > x1 or ny > y1 or not passable[nx][ny]:
+                continue
+            nxt = (nx, ny)
+            new_cost = d + costs[nx][ny]
+            if max_cost is not None and new_cost > max_cost:
+                continue
+            if nxt not in cost_so_far or new_cost < cost_so_far[nxt]:
+                cost_so_far[nxt] = new_cost
+                first[nxt] = nxt if current == start else first[current]
+                if paths:
+                    came_from[nxt] = current
+                heapq.heappush(frontier, (new_cost, nxt))
+    return results, expanded
+
+def _astar_grid(model, start, goal, horizon=None, max_cost=None):
+    # returns (path, nodes expanded)
     if start == goal:
-        return [start]
+        return [start], 0
     if _is_blocked(model, goal):
-        return None
+        return None, 0
+    x0, y0, x1, y1 = _window(model, start, horizon)
+    if not (x0 <= goal[0] <= x1 and y0 <= goal[1] <= y1):
+        return None, 0
 
     frontier = []
     heapq.heappush(frontier, (0 + heuristic(start, goal), 0, start))
     came_from = {start: None}
     cost_so_far = {start: 0}
 
+    expanded = 0
     while frontier:
         _, current_cost, current = heapq.heappop(frontier)
         if current == goal:
-            # reconstruct
-            path = []
-            node = current
-            while node is not None:
-                path.append(node)
-                node = came_from[node]
-            return list(reversed(path))
+            return _reconstruct(came_from, current), expanded
+        expanded += 1
         for nxt in _neighbors(model, current):
+            if not (x0 <= nxt[0] <= x1 and y0 <= nxt[1] <= y1):
+                continue
             # movement cost is the cost of entering nxt
             move_cost = _get_terrain_cost(model, nxt)
             new_cost = cost_so_far[current] + move_cost
+            if max_cost is not None and new_cost > max_cost:
+                continue
             if nxt not in cost_so_far or new_cost < cost_so_far[nxt]:
                 cost_so_far[nxt] = new_cost
                 priority = new_cost + heuristic(nxt, goal)
                 heapq.heappush(frontier, (priority, new_cost, nxt))
                 came_from[nxt] = current
-    return None
+    return None, expanded
+
+def _astar_layers(model, start, goal, horizon=None, max_cost=None):
+    # same search as _astar_grid, but node access is a list lookup into the static layers
+    if start == goal:
+        return [start], 0
+    x0, y0, x1, y1 = _window(model, start, horizon)
+    gx, gy = goal
+    if gx < x0 or gy < y0 or gx > x1 or gy > y1:
+        return None, 0
+    costs, passable = model.static_layers()
+    if not passable[gx][gy]:
+        return None, 0
+
+    frontier = []
+    heapq.heappush(frontier, (0 + heuristic(start, goal), 0, start))
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+
+    expanded = 0
+    while frontier:
+        _, current_cost, current = heapq.heappop(frontier)
+        if current == goal:
+            return _reconstruct(came_from, current), expanded
+        expanded += 1
+        x, y = current
+        base = cost_so_far[current]
+        for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            if nx < x0 or ny < y0 or nx > x1 or ny > y1 or not passable[nx][ny]:
+                continue
+            nxt = (nx, ny)
+            new_cost = base + costs[nx][ny]
+            if max_cost is not None and new_cost > max_cost:
+                continue
+            if nxt not in cost_so_far or new_cost < cost_so_far[nxt]:
+                cost_so_far[nxt] = new_cost
+                priority = new_cost + abs(nx - gx) + abs(ny - gy)
+                heapq.heappush(frontier, (priority, new_cost, nxt))
+                came_from[nxt] = current
+    return None, expanded
+
+class PathCache:
+    """
+    Per-agent path reuse and repair on top of astar_search.
+
+    For each key (usually the agent) the last path and its goal are kept.
+    On the next query from a position along that path:
+      - same goal, map unchanged        -> reuse the remaining path (hit)
+      - goal shifted by <= max_goal_shift -> splice a short search from the old
+        goal to the new one onto the remaining path (repair)
+      - map changed on the path          -> re-search only from just before the
+        first affected cell and splice (repair)
+      - anything else                    -> full search (miss)
+    Map changes are read from model.map_changes, a bounded log of
+    (map_version, pos, relaxed) entries; a change that makes some cell cheaper
+    or passable anywhere forces a full search, since it may open a shortcut.
+    Repaired paths are valid but not always optimal, so after max_repairs
+    consecutive repairs the entry is re-planned from scratch.
+    """
+    def __init__(self, model, max_goal_shift=2, max_repairs=8):
+        self.model = model
+        self.max_goal_shift = max_goal_shift
+        self.max_repairs = max_repairs
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.repairs = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "repairs": self.repairs}
+
+    def forget(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def find(self, key, start, goal):
+        """Return a path from start to goal (inclusive) like astar_search, or None."""
+        entry = self._entries.get(key)
+        path, repaired = None, False
+        if entry is not None:
+            path, repaired = self._reuse(entry, start, goal)
+        if path is None:
+            self.misses += 1
+            path = astar_search(self.model, start, goal)
+            repairs = 0
+        elif repaired:
+            self.repairs += 1
+            repairs = entry[3] + 1
+        else:
+            self.hits += 1
+            repairs = entry[3]
+        if path:
+            self._entries[key] = (goal, path, self.model.map_version, repairs)
+        else:
+            self._entries.pop(key, None)
+        return path
+
+    def _reuse(self, entry, start, goal):
+        # returns (path, repaired); path is None when a full search is needed
+        old_goal, path, version, repairs = entry
+        if start not in path:
+            # agent left its path (random move, displaced) -> replan
+            return None, False
+        remaining = path[path.index(start):]
+        if repairs >= self.max_repairs:
+            return None, False
+
+        repaired = False
+        if version != self.model.map_version:
+            changed = self._changes_since(version)
+            if changed is None or any(relaxed for _, relaxed in changed):
+                return None, False
+            on_path = {pos for pos, _ in changed}
+            for j, cell in enumerate(remaining):
+                if cell in on_path:
+                    # re-search from the cell before the first affected one
+                    k = max(0, j - 1)
+                    tail = astar_search(self.model, remaining[k], old_goal)
+                    if not tail:
+                        return None, False
+                    remaining = remaining[:k] + tail
+                    repaired = True
+                    break
+
+        if goal != old_goal:
+            if heuristic(goal, old_goal) > self.max_goal_shift:
+                return None, False
+            if goal in remaining:
+                # target moved towards us along the path
+                remaining = remaining[:remaining.index(goal) + 1]
+            else:
+                bridge = astar_search(self.model, old_goal, goal)
+                if not bridge:
+                    return None, False
+                remaining = _splice(remaining, bridge)
+            repaired = True
+
+        return remaining, repaired
+
+    def _changes_since(self, version):
+        log = getattr(self.model, "map_changes", None)
+        if not log or log[0][0] > version + 1:
+            # log does not reach back far enough to know what changed
+            return None
+        return [(pos, relaxed) for v, pos, relaxed in log if v > version]
+
+def _splice(path, bridge):
+    # path ends where bridge starts; cut any loop the bridge makes back over the path
+    seen = {cell: n for n, cell in enumerate(path)}
+    for m, cell in enumerate(bridge[1:], start=1):
+        if cell in seen:
+            return _splice(path[:seen[cell] + 1], bridge[m:])
+    return path + bridge[1:]
@@ -0,0 +1,87 @@
+"""
+fields.py - multi-source Dijkstra distance fields over the model's static map layers.
+
+A field answers "how expensive is it to reach the nearest source from here" for
+every cell at once, so many agents chasing (or fleeing) the same set of sources
+can share one grid sweep instead of running one A* each.
+Fields are nested lists indexed [x][y] (like model.static_layers()), with
+math.inf for cells that cannot reach any source.
+"""
+import heapq
+import math
+
+def distance_field(model, sources, outward=False):
+    """
+    Return field[x][y] = cheapest cost of walking from (x, y) to the nearest source,
+    or, with outward=True, from the nearest source to (x, y).
+    Cost follows astar_search: entering a cell costs its movement_cost.
+    """
+    width, height = model.width, model.height
+    costs, passable = model.static_layers()
+    field = [[math.inf] * height for _ in range(width)]
+
+    frontier = []
+    for (sx, sy) in sources:
+        if field[sx][sy] != 0:
+            field[sx][sy] = 0
+            frontier.append((0, sx, sy))
+    heapq.heapify(frontier)
+
+    while frontier:
+        d, x, y = heapq.heappop(frontier)
+        if d > field[x][y]:
+            continue
+        # inward: a walker at a neighbour pays costs[x][y] to step onto (x, y)
+        # outward: a walker at (x, y) pays the neighbour's cost to step onto it
+        nd = d + costs[x][y]
+        for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            if nx < 0 or ny < 0 or nx >= width or ny >= height or not passable[nx][ny]:
+                continue
+            if outward:
+                nd = d + costs[nx][ny]
+            if nd < field[nx][ny]:
+                field[nx][ny] = nd
+                heapq.heappush(frontier, (nd, nx, ny))
+    return field
+
+def downhill_step(model, field, pos):
+    """
+    Return the 4-neighbour of pos that lies on a cheapest path towards the
+    field's sources, or None if no neighbour can reach a source.
+    """
+    width, height = model.width, model.height
+    costs, passable = model.static_layers()
+    x, y = pos
+    best = None
+    best_cost = math.inf
+    for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+        if nx < 0 or ny < 0 or nx >= width or ny >= height or not passable[nx][ny]:
+            continue
+        c = costs[nx][ny] + field[nx][ny]
+        if c < best_cost:
+            best_cost = c
+            best = (nx, ny)
+    return best
+
+def uphill_step(model, field, pos, rng):
+    """
+    Return the 4-neighbour of pos with the largest field value if it beats
+    staying at pos (ties broken with rng), else None (pos is a local maximum).
+    """
+    width, height = model.width, model.height
+    _, passable = model.static_layers()
+    x, y = pos
+    best_val = field[x][y]
+    best = []
+    for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+        if nx < 0 or ny < 0 or nx >= width or ny >= height or not passable[nx][ny]:
+            continue
+        v = field[nx][ny]
+        if v > best_val:
+            best_val = v
+            best = [(nx, ny)]
+        elif v == best_val and best:
+            best.append((nx, ny))
+    if not best:
+        return None
+    return best[0] if len(best) == 1 else rng.choice(best)
@@ -0,0 +1,362 @@
+"""
+hpa.py - hierarchical pathfinding (HPA*) for large maps.
+
+The map is cut into cluster_size x cluster_size clusters. Wherever two
+neighbouring clusters share a run of passable border cells, the run gets an
+entrance: one pair of facing cells in its middle, or one pair at each end
+when the run is at least wide_entrance cells long. The entrance cells are the
+nodes of an abstract graph with two kinds of edges:
+  - inter edges across the border (cost of entering the cell on the other side)
+  - intra edges between the nodes of one cluster (cost of the best path
+    that stays inside the cluster, precomputed with one Dijkstra per node)
+
+A query links start and goal into their clusters, runs A* on the abstract
+graph, and refines only the first few abstract hops into grid cells. The rest
+of the route is refined later, as the agent walks it. Costs come from the
+model's static layers (movement cost of the entered cell, obstacles
+impassable), like astar_search. Paths are near-optimal: the route is forced
+through entrance cells and intra-cluster searches stay inside their cluster.
+
+Map edits are read from model.map_changes. Only the clusters containing a
+changed cell (plus the neighbour across the border when the cell is on one)
+get their entrances and intra edges rebuilt.
+
+    planner = HierarchicalPlanner(model, cluster_size=16)
+    path = planner.find(agent, agent.pos, target.pos)   # refined prefix, start first
+"""
+import heapq
+
+from algorithms.astar import heuristic, _reconstruct, _record
+
+_DIRS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+def _dijkstra_box(costs, passable, source, box, targets=None, reverse=False):
+    """
+    Costs from source to every cell of box (reverse=False), or from every
+    cell to source (reverse=True), never leaving box. Stops early once all
+    targets are settled. Returns (dist of settled cells, nodes expanded).
+    """
+    x0, y0, x1, y1 = box
+    pending = set(targets) if targets is not None else None
+    dist = {source: 0}
+    settled = {}
+    heap = [(0, source)]
+    expanded = 0
+    while heap:
+        d, current = heapq.heappop(heap)
+        if current in settled:
+            continue
+        settled[current] = d
+        if pending is not None:
+            pending.discard(current)
+            if not pending:
+                break
+        expanded += 1
+        x, y = current
+        for dx, dy in _DIRS:
+            nx, ny = x + dx, y + dy
+            if nx < x0 or ny < y0 or nx > x1 or ny > y1 or not passable[nx][ny]:
+                continue
+            # moving between two cells costs the cell entered
+            nd = d + (costs[x][y] if reverse else costs[nx][ny])
+            nxt = (nx, ny)
+            if nd < dist.get(nxt, float("inf")):
+                dist[nxt] = nd
+                heapq.heappush(heap, (nd, nxt))
+    return settled, expanded
+
+def _astar_box(costs, passable, start, goal, box):
+    # plain A* that never leaves box; returns (path, expanded)
+    if start == goal:
+        return [start], 0
+    x0, y0, x1, y1 = box
+    gx, gy = goal
+    frontier = [(heuristic(start, goal), 0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    expanded = 0
+    while frontier:
+        _, d, current = heapq.heappop(frontier)
+        if current == goal:
+            return _reconstruct(came_from, current), expanded
+        if d > cost_so_far[current]:
+            continue
+        expanded += 1
+        x, y = current
+        for dx, dy in _DIRS:
+            nx, ny = x + dx, y + dy
+            if nx < x0 or ny < y0 or nx > x1 or ny > y1 or not passable[nx][ny]:
+                continue
+            nxt = (nx, ny)
+            nd = d + costs[nx][ny]
+            if nd < cost_so_far.get(nxt, float("inf")):
+                cost_so_far[nxt] = nd
+                came_from[nxt] = current
+                heapq.heappush(frontier, (nd + abs(nx - gx) + abs(ny - gy), nd, nxt))
+    return None, expanded
+
+class HierarchicalPlanner:
+    """
+    cluster_size: side of a cluster in cells
+    refine_hops: abstract hops turned into grid cells per refinement
+    wide_entrance: border runs at least this long get two entrances
+    """
+    def __init__(self, model, cluster_size=16, refine_hops=2, wide_entrance=6):
+        self.model = model
+        self.cluster_size = cluster_size
+        self.refine_hops = refine_hops
+        self.wide_entrance = wide_entrance
+        self.cols = -(-model.width // cluster_size)
+        self.rows = -(-model.height // cluster_size)
+        # (cluster, neighbour) with neighbour to the right/top -> [(cell, cell across), ...]
+        self._borders = {}
+        # node -> [(node, cost)] across borders / inside its cluster
+        self._inter = {}
+        self._intra = {}
+        # cluster -> entrance cells inside it
+        self._nodes = {}
+        # key -> (goal cluster, refined cells, waypoints still to refine); cleared on map changes
+        self._routes = {}
+        self.builds = 0
+        self._build_all()
+
+    # --- layout ---
+    def cluster_of(self, pos):
+        return (pos[0] // self.cluster_size, pos[1] // self.cluster_size)
+
+    def _box(self, cluster):
+        cx, cy = cluster
+        s = self.cluster_size
+        return cx * s, cy * s, min(self.model.width, (cx + 1) * s) - 1, min(self.model.height, (cy + 1) * s) - 1
+
+    def _neighbour_clusters(self, cluster):
+        cx, cy = cluster
+        for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+            if 0 <= nx < self.cols and 0 <= ny < self.rows:
+                yield (nx, ny)
+
+    # --- building ---
+    def _build_all(self):
+        self._version = self.model.map_version
+        self._borders.clear()
+        for cx in range(self.cols):
+            for cy in range(self.rows):
+                for other in ((cx + 1, cy), (cx, cy + 1)):
+                    if other[0] < self.cols and other[1] < self.rows:
+                        self._build_border((cx, cy), other)
+        self._rebuild_clusters([(cx, cy) for cx in range(self.cols) for cy in range(self.rows)])
+
+    def _build_border(self, a, b):
+        # entrances on the border between cluster a and its right/top neighbour b
+        _, passable = self.model.static_layers()
+        ax0, ay0, ax1, ay1 = self._box(a)
+        if b[0] > a[0]:
+            # vertical border: a's column ax1 faces b's column ax1 + 1
+            pairs = [((ax1, y), (ax1 + 1, y)) for y in range(ay0, ay1 + 1)]
+        else:
+            pairs = [((x, ay1), (x, ay1 + 1)) for x in range(ax0, ax1 + 1)]
+        entrances = []
+        run = []
+        for p, q in pairs + [(None, None)]:
+            if p is not None and passable[p[0]][p[1]] and passable[q[0]][q[1]]:
+                run.append((p, q))
+                continue
+            if run:
+                if len(run) >= self.wide_entrance:
+                    entrances.extend([run[0], run[-1]])
+                else:
+                    entrances.append(run[len(run) // 2])
+                run = []
+        self._borders[(a, b)] = entrances
+
+    def _rebuild_clusters(self, clusters):
+        costs, passable = self.model.static_layers()
+        clusters = set(clusters)
+        for c in clusters:
+            for node in self._nodes.get(c, ()):
+                self._inter.pop(node, None)
+                self._intra.pop(node, None)
+            self._nodes[c] = set()
+        # entrance cells and inter edges from every border touching a rebuilt cluster
+        for (a, b), entrances in self._borders.items():
+            if a not in clusters and b not in clusters:
+                continue
+            for p, q in entrances:
+                if a in clusters:
+                    self._nodes[a].add(p)
+                    self._add_inter(p, q, costs[q[0]][q[1]])
+                if b in clusters:
+                    self._nodes[b].add(q)
+                    self._add_inter(q, p, costs[p[0]][p[1]])
+        # intra edges: one bounded Dijkstra per entrance cell
+        for c in clusters:
+            nodes = self._nodes[c]
+            box = self._box(c)
+            for node in nodes:
+                dist, _ = _dijkstra_box(costs, passable, node, box, targets=nodes)
+                self._intra[node] = [(other, d) for other, d in dist.items() if other in nodes and other != node]
+        self.builds += len(clusters)
+
+    def _add_inter(self, p, q, cost):
+        edges = self._inter.setdefault(p, [])
+        if all(other != q for other, _ in edges):
+            edges.append((q, cost))
+
+    def _sync(self):
+        """Rebuild the clusters touched by map changes since the last build."""
+        if self._version == self.model.map_version:
+            return
+        log = getattr(self.model, "map_changes", None)
+        changes = [pos for v, pos, _ in (log or ()) if v > self._version]
+        if len(changes) != self.model.map_version - self._version:
+            # log does not cover every change since the last build: start over
+            self._build_all()
+            self._routes.clear()
+            return
+        dirty = set()
+        for pos in changes:
+            c = self.cluster_of(pos)
+            dirty.add(c)
+            x0, y0, x1, y1 = self._box(c)
+            # a border cell also changes the neighbour's entrances
+            for other in self._neighbour_clusters(c):
+                if ((other[0] > c[0] and pos[0] == x1) or (other[0] < c[0] and pos[0] == x0)
+                        or (other[1] > c[1] and pos[1] == y1) or (other[1] < c[1] and pos[1] == y0)):
+                    dirty.add(other)
+        borders = {(a, b) for a in dirty for b in self._neighbour_clusters(a)}
+        for a, b in borders:
+            if (a, b) in self._borders:
+                self._build_border(a, b)
+        # clusters across a rebuilt border lose/gain entrance cells too
+        affected = set(dirty)
+        for c in dirty:
+            affected.update(self._neighbour_clusters(c))
+        self._rebuild_clusters(affected)
+        self._version = self.model.map_version
+        self._routes.clear()
+
+    # --- queries ---
+    def abstract_path(self, start, goal):
+        """
+        Route from start to goal as a list of cells where consecutive cells are
+        either neighbours or in the same cluster; None if unreachable.
+        Returns (route, nodes expanded).
+        """
+        self._sync()
+        costs, passable = self.model.static_layers()
+        if not passable[goal[0]][goal[1]]:
+            return None, 0
+        if start == goal:
+            return [start], 0
+        sc, gc = self.cluster_of(start), self.cluster_of(goal)
+        expanded = 0
+
+        # link start and goal into their clusters
+        s_nodes = self._nodes.get(sc, set())
+        from_start, n = _dijkstra_box(costs, passable, start, self._box(sc), targets=s_nodes | {goal} if sc == gc else s_nodes)
+        expanded += n
+        g_nodes = self._nodes.get(gc, set())
+        to_goal, n = _dijkstra_box(costs, passable, goal, self._box(gc), targets=g_nodes | ({start} if sc == gc else set()), reverse=True)
+        expanded += n
+        goal_links = {node: d for node, d in to_goal.items() if node in g_nodes}
+
+        frontier = [(heuristic(start, goal), 0, start)]
+        came_from = {start: None}
+        best = {start: 0}
+        while frontier:
+            _, d, current = heapq.heappop(frontier)
+            if current == goal:
+                return _reconstruct(came_from, current), expanded
+            if d > best[current]:
+                continue
+            expanded += 1
+            if current == start:
+                edges = [(node, c) for node, c in from_start.items() if node in s_nodes and node != start]
+                # start may itself be an entrance cell
+                edges += self._inter.get(start, [])
+                if sc == gc and goal in from_start:
+                    edges.append((goal, from_start[goal]))
+            else:
+                edges = self._intra.get(current, []) + self._inter.get(current, [])
+            if current in goal_links:
+                edges = edges + [(goal, goal_links[current])]
+            for nxt, c in edges:
+                nd = d + c
+                if nd < best.get(nxt, float("inf")):
+                    best[nxt] = nd
+                    came_from[nxt] = current
+                    heapq.heappush(frontier, (nd + heuristic(nxt, goal), nd, nxt))
+        return None, expanded
+
+    def _refine(self, route, hops):
+        """
+        Grid cells for the first hops of route (route[0] first). Returns
+        (cells, waypoints still to refine, expanded); cells is None if a hop
+        cannot be walked.
+        """
+        costs, passable = self.model.static_layers()
+        cells = [route[0]]
+        expanded = 0
+        i = 0
+        while i < len(route) - 1 and i < hops:
+            a, b = route[i], route[i + 1]
+            if heuristic(a, b) == 1:
+                # border crossing (or a neighbour inside the cluster): one step
+                cells.append(b)
+            else:
+                box = self._box(self.cluster_of(a))
+                bb = self._box(self.cluster_of(b))
+                if bb != box:
+                    # only after a goal change: search the two clusters' bounding box
+                    box = (min(box[0], bb[0]), min(box[1], bb[1]), max(box[2], bb[2]), max(box[3], bb[3]))
+                segment, n = _astar_box(costs, passable, a, b, box)
+                expanded += n
+                if segment is None:
+                    return None, None, expanded
+                cells.extend(segment[1:])
+            i += 1
+        return cells, route[i + 1:], expanded
+
+    def find(self, key, start, goal):
+        """
+        Refined path prefix from start towards goal (start first), like
+        PathCache.find but only the next refine_hops abstract hops are in grid
+        cells. The route is kept per key and reused while the goal stays in
+        the same cluster. Returns None if the goal is unreachable.
+        """
+        self._sync()
+        expanded = 0
+        gc = self.cluster_of(goal)
+        cells = None
+        entry = self._routes.get(key)
+        if entry is not None and entry[0] == gc and start in entry[1]:
+            cells = entry[1][entry[1].index(start):]
+            waypoints = list(entry[2])
+            # the goal may have moved inside its cluster: re-aim the final hop
+            if waypoints:
+                waypoints[-1] = goal
+            elif cells[-1] != goal:
+                waypoints = [goal]
+            if len(cells) < 2 and waypoints:
+                cells, waypoints, n = self._refine(cells[-1:] + waypoints, self.refine_hops)
+                expanded += n
+        if cells is None or (len(cells) < 2 and start != goal):
+            route, n = self.abstract_path(start, goal)
+            expanded += n
+            cells = None
+            if route is not None:
+                cells, waypoints, n = self._refine(route, self.refine_hops)
+                expanded += n
+        _record(self.model, expanded)
+        if cells is None:
+            self._routes.pop(key, None)
+            return None
+        self._routes[key] = (gc, cells, waypoints)
+        return cells
+
+    def forget(self, key):
+        self._routes.pop(key, None)
+
+    def stats(self):
+        return {"clusters": self.cols * self.rows, "nodes": len(self._intra),
+                "builds": self.builds, "routes": len(self._routes)}
@@ -0,0 +1,208 @@
+"""
+qlearning.py - tabular Q-learning for fleeing Natives, trained headless.
+
+One Q-table is shared by every Native: a float array of shape
+(N_STATES, N_ACTIONS) over a compact state encoding
+
+    threat direction  octant of the nearest Voidspawn within SIGHT cells,
+                      or "none" (9 values)
+    threat distance   Manhattan distance band: <=1, <=3, <=5, further (4)
+    surroundings      each of the 4 neighbours open / rough (cost > 1) /
+                      blocked or off the map (3**4)
+
+and five actions: stay, +x, -x, +y, -y.
+
+Training runs whole VoidBreachModel episodes (native_flee="policy") in a
+process pool. Every worker plays its episodes with the current table and an
+epsilon-greedy policy and returns its transitions as arrays. The parent then
+applies them in one batched update per round: the TD errors of all samples
+hitting the same (state, action) are averaged and added at once.
+
+    policy = train(rounds=40, episodes_per_round=16, workers=4)
+    policy.save("data/policies/natives.npz")
+    model = VoidBreachModel(native_flee="policy", native_policy="data/policies/natives.npz")
+
+In the model, QPolicy.act costs one encoding and one lookup in the greedy
+action list. Command line:
+
+    python -m algorithms.qlearning --rounds 40 --episodes 16 --workers 4 --out data/policies/natives.npz
+"""
+import argparse
+import math
+import multiprocessing as mp
+import os
+import numpy as np
+
+SIGHT = 8
+ACTIONS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+N_ACTIONS = len(ACTIONS)
+N_STATES = 9 * 4 * 3 ** 4
+DEATH_REWARD = -1.0
+# reward per cell of distance gained from the nearest threat (capped at SIGHT + 1)
+DISTANCE_REWARD = 0.05
+
+def _band(d):
+    return 0 if d <= 1 else 1 if d <= 3 else 2 if d <= 5 else 3
+
+def encode(model, pos, sight=SIGHT):
+    """(state index, distance to the nearest Voidspawn capped at sight + 1) for a Native at pos."""
+    costs, passable = model.static_layers()
+    x, y = pos
+    terrain = 0
+    for dx, dy in ACTIONS[1:]:
+        nx, ny = x + dx, y + dy
+        if not (0 <= nx < model.width and 0 <= ny < model.height) or not passable[nx][ny]:
+            level = 2
+        else:
+            level = 1 if costs[nx][ny] > 1 else 0
+        terrain = terrain * 3 + level
+    threat = model.nearest_agent("Voidspawn", pos, max_dist=sight)
+    if threat is None:
+        return (8 * 4) * 81 + terrain, sight + 1
+    dx, dy = threat.pos[0] - x, threat.pos[1] - y
+    dist = abs(dx) + abs(dy)
+    octant = int(round(math.atan2(dy, dx) / (math.pi / 4))) % 8
+    return (octant * 4 + _band(dist)) * 81 + terrain, dist
+
+class QPolicy:
+    """
+    Shared Q-table plus the greedy action per state. epsilon > 0 explores with
+    the acting Native's RNG (the model's), so runs stay reproducible.
+    With record=True, act() also collects (s, a, r, s', done) transitions.
+    """
+    def __init__(self, table=None, epsilon=0.0, record=False, sight=SIGHT):
+        self.table = np.zeros((N_STATES, N_ACTIONS)) if table is None else np.asarray(table, dtype=np.float64)
+        if self.table.shape != (N_STATES, N_ACTIONS):
+            raise ValueError(f"Q-table shape {self.table.shape} does not match ({N_STATES}, {N_ACTIONS})")
+        self.epsilon = epsilon
+        self.sight = sight
+        self.greedy = self.table.argmax(axis=1).tolist()
+        self.record = record
+        self._pending = {}      # native -> (state, action, distance) of its last decision
+        self._samples = []
+
+    def act(self, native, model=None, rng=None):
+        """Move (dx, dy) for native from its current state (model/rng default to the native's)."""
+        model = native.model if model is None else model
+        rng = native.random if rng is None else rng
+        state, dist = encode(model, native.pos, self.sight)
+        if self.epsilon and rng.random() < self.epsilon:
+            action = rng.randrange(N_ACTIONS)
+        else:
+            action = self.greedy[state]
+        if self.record:
+            last = self._pending.get(native)
+            if last is not None:
+                self._samples.append((last[0], last[1], DISTANCE_REWARD * (dist - last[2]), state, 0.0))
+            self._pending[native] = (state, action, dist)
+        return ACTIONS[action]
+
+    def end_tick(self):
+        """Close the decisions of Natives killed this tick (recording only)."""
+        for native in [n for n in self._pending if n.pos is None]:
+            state, action, _ = self._pending.pop(native)
+            self._samples.append((state, action, DEATH_REWARD, state, 1.0))
+
+    def transitions(self):
+        """Recorded transitions as arrays (s, a, r, s2, done); clears the buffer."""
+        samples, self._samples = self._samples, []
+        self._pending.clear()
+        if not samples:
+            return (np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0), np.zeros(0, np.int64), np.zeros(0))
+        s, a, r, s2, done = zip(*samples)
+        return (np.array(s, np.int64), np.array(a, np.int64), np.array(r), np.array(s2, np.int64), np.array(done))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, table=self.table, sight=self.sight)
+
+    @classmethod
+    def load(cls, path, epsilon=0.0):
+        with np.load(path) as data:
+            return cls(data["table"], epsilon=epsilon, sight=int(data["sight"]))
+
+def batched_update(table, batch, alpha=0.2, gamma=0.9):
+    """
+    One Q-learning step over a whole batch of transitions, in place. Samples
+    that share a (state, action) pair contribute their mean TD error.
+    """
+    s, a, r, s2, done = batch
+    if len(s) == 0:
+        return 0.0
+    target = r + gamma * (1.0 - done) * table[s2].max(axis=1)
+    td = target - table[s, a]
+    total = np.zeros_like(table)
+    counts = np.zeros_like(table)
+    np.add.at(total, (s, a), td)
+    np.add.at(counts, (s, a), 1.0)
+    seen = counts > 0
+    table[seen] += alpha * total[seen] / counts[seen]
+    return float(np.abs(td).mean())
+
+def run_episode(args):
+    """Play one episode with a fixed table; meant to run in a pool worker."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    from model import VoidBreachModel
+
+    table, epsilon, seed, ticks, model_params = args
+    policy = QPolicy(table, epsilon=epsilon, record=True)
+    model = VoidBreachModel(seed=seed, native_flee="policy", native_policy=policy, **model_params)
+    for _ in range(ticks):
+        if not model.running:
+            break
+        model.step()
+        policy.end_tick()
+    return policy.transitions(), model.schedule.steps
+
+def train(rounds=40, episodes_per_round=16, ticks=150, workers=None, epsilon=(0.3, 0.05),
+          alpha=0.2, gamma=0.9, sweeps=4, seed=0, model_params=None, table=None, log=print):
+    """
+    Train a QPolicy. Each round plays episodes_per_round episodes in parallel
+    with the current table, then applies sweeps batched updates over their
+    transitions. epsilon decays linearly from epsilon[0] to epsilon[1].
+    """
+    params = {"width": 30, "height": 30, "initial_natives": 20, "initial_voidspawns": 5}
+    params.update(model_params or {})
+    table = np.zeros((N_STATES, N_ACTIONS)) if table is None else np.array(table, dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    ctx = mp.get_context("spawn")
+    pool = ctx.Pool(workers) if workers > 1 else None
+    try:
+        for r in range(rounds):
+            eps = epsilon[0] + (epsilon[1] - epsilon[0]) * r / max(1, rounds - 1)
+            jobs = [(table, eps, seed + r * episodes_per_round + e, ticks, params) for e in range(episodes_per_round)]
+            results = pool.map(run_episode, jobs) if pool is not None else [run_episode(j) for j in jobs]
+            batch = tuple(np.concatenate(part) for part in zip(*(res[0] for res in results)))
+            for _ in range(sweeps):
+                err = batched_update(table, batch, alpha=alpha, gamma=gamma)
+            if log is not None:
+                survived = np.mean([res[1] for res in results])
+                log(f"round {r + 1:>3}/{rounds}  eps {eps:.2f}  samples {len(batch[0]):>7}  "
+                    f"mean episode {survived:6.1f} ticks  |td| {err:.4f}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return QPolicy(table)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the shared Native Q-table headless.")
+    parser.add_argument("--rounds", type=int, default=40)
+    parser.add_argument("--episodes", type=int, default=16, help="episodes per round")
+    parser.add_argument("--ticks", type=int, default=150, help="tick limit per episode")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--size", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resume", help="start from a saved policy")
+    parser.add_argument("--out", default="data/policies/natives.npz")
+    args = parser.parse_args(argv)
+    table = QPolicy.load(args.resume).table if args.resume else None
+    policy = train(rounds=args.rounds, episodes_per_round=args.episodes, ticks=args.ticks,
+                   workers=args.workers, seed=args.seed, table=table,
+                   model_params={"width": args.size, "height": args.size})
+    policy.save(args.out)
+    print(f"saved {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+spatial_index.py - bucket-grid spatial hash for mobile agents.
+
+Agents are filed into square buckets of bucket_size cells so that
+"nearest agent to pos" and "agents within radius r" only look at the
+buckets around pos instead of the whole population.
+Distances are Manhattan, matching the agents' targeting and attack_range.
+"""
+
+def manhattan(a, b):
+    return abs(a[0]-b[0]) + abs(a[1]-b[1])
+
+class SpatialHash:
+    def __init__(self, width, height, bucket_size=8):
+        self.width = width
+        self.height = height
+        self.bucket_size = bucket_size
+        self.nbx = (width + bucket_size - 1) // bucket_size
+        self.nby = (height + bucket_size - 1) // bucket_size
+        # bucket -> {agent: pos}; dicts keep insertion order, so ties resolve deterministically
+        self._buckets = {}
+        self._where = {}
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, agent):
+        return agent in self._where
+
+    def positions(self):
+        """Positions of all indexed agents."""
+        return list(self._where.values())
+
+    def _key(self, pos):
+        return (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+
+    def insert(self, agent, pos):
+        if agent in self._where:
+            self.remove(agent)
+        self._where[agent] = pos
+        self._buckets.setdefault(self._key(pos), {})[agent] = pos
+
+    def remove(self, agent):
+        pos = self._where.pop(agent, None)
+        if pos is None:
+            return
+        key = self._key(pos)
+        bucket = self._buckets[key]
+        del bucket[agent]
+        if not bucket:
+            del self._buckets[key]
+
+    def move(self, agent, pos):
+        old = self._where.get(agent)
+        if old is not None and self._key(old) == self._key(pos):
+            # same bucket: update in place
+            self._where[agent] = pos
+            self._buckets[self._key(pos)][agent] = pos
+            return
+        self.insert(agent, pos)
+
+    def _ring(self, bx, by, k):
+        # bucket keys at Chebyshev bucket-distance exactly k from (bx, by)
+        if k == 0:
+            yield (bx, by)
+            return
+        for i in range(bx - k, bx + k + 1):
+            yield (i, by - k)
+            yield (i, by + k)
+        for j in range(by - k + 1, by + k):
+            yield (bx - k, j)
+            yield (bx + k, j)
+
+    def nearest(self, pos, max_dist=None, exclude=None):
+        """Return the nearest agent to pos (Manhattan), or None; optionally within max_dist."""
+        bx, by = self._key(pos)
+        bs = self.bucket_size
+        best = None
+        best_d = None
+        max_k = max(self.nbx, self.nby)
+        for k in range(max_k + 1):
+            # every cell k buckets away is at least (k-1)*bs+1 cells away
+            lower = (k - 1) * bs + 1 if k > 0 else 0
+            if best_d is not None and lower > best_d:
+                break
+            if max_dist is not None and lower > max_dist:
+                break
+            for key in self._ring(bx, by, k):
+                bucket = self._buckets.get(key)
+                if not bucket:
+                    continue
+                for agent, apos in bucket.items():
+                    if agent is exclude:
+                        continue
+                    d = abs(apos[0]-pos[0]) + abs(apos[1]-pos[1])
+                    if best_d is None or d < best_d:
+                        best, best_d = agent, d
+        if best is not None and max_dist is not None and best_d > max_dist:
+            return None
+        return best
+
+    def within(self, pos, radius):
+        """Return the agents whose Manhattan distance to pos is <= radius."""
+        bs = self.bucket_size
+        x, y = pos
+        found = []
+        for i in range(max(0, (x - radius) // bs), min(self.nbx - 1, (x + radius) // bs) + 1):
+            for j in range(max(0, (y - radius) // bs), min(self.nby - 1, (y + radius) // bs) + 1):
+                bucket = self._buckets.get((i, j))
+                if not bucket:
+                    continue
+                for agent, apos in bucket.items():
+                    if abs(apos[0]-x) + abs(apos[1]-y) <= radius:
+                        found.append(agent)
+        return found
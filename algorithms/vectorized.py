@@ -0,0 +1,133 @@
+"""
+vectorized.py - NumPy kernels for the array population engine.
+
+Every array carries a leading world dimension B, so the same kernels step one
+model (B=1) or a stacked ensemble of independent worlds. Grids are indexed
+[b, x, y] like the model's static layers; agent positions are (B, N, 2) int
+arrays with a matching (B, N) alive mask.
+"""
+import numpy as np
+
+INF = np.inf
+
+# 4-neighbourhood in the same order as astar._neighbors / fields.downhill_step
+DIRS4 = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int64)
+# Moore neighbourhood used by the agents' random moves
+DIRS8 = np.array([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)], dtype=np.int64)
+
+def distance_fields(cost, passable, sources, outward=False, max_rounds=None, initial=None):
+    """
+    Batched equivalent of fields.distance_field: cost (B, W, H) to the nearest
+    source for every cell (outward=False), or from it (outward=True).
+    Uses alternating directional sweeps (fast sweeping) until nothing changes;
+    each sweep is a Python loop over one axis with the other vectorized.
+    initial: optional known upper bounds (e.g. values computed by a
+    neighbouring tile) to start from instead of INF.
+    """
+    B, W, H = cost.shape
+    field = np.where(sources, 0.0, INF)
+    if initial is not None:
+        np.minimum(field, initial, out=field)
+    # entering an impassable cell is impossible; sources keep their 0
+    block = np.where(passable, 0.0, INF)
+    enter = cost + block
+    rounds = 0
+    while True:
+        before = field.copy()
+        # sweeps along x (+, -), then along y (+, -)
+        for axis, order in ((1, range(1, W)), (1, range(W - 2, -1, -1)),
+                            (2, range(1, H)), (2, range(H - 2, -1, -1))):
+            step = 1 if order.step > 0 else -1
+            for i in order:
+                if axis == 1:
+                    cur, prev = (slice(None), i), (slice(None), i - step)
+                else:
+                    cur, prev = (slice(None), slice(None), i), (slice(None), slice(None), i - step)
+                if outward:
+                    cand = field[prev] + enter[cur]
+                else:
+                    cand = field[prev] + cost[prev] + block[cur]
+                np.minimum(field[cur], cand, out=field[cur])
+        rounds += 1
+        if np.array_equal(before, field) or (max_rounds is not None and rounds >= max_rounds):
+            return field
+
+def sources_mask(shape, pos, alive):
+    """(B, W, H) bool grid marking the cells of the alive agents."""
+    mask = np.zeros(shape, dtype=bool)
+    b, n = np.nonzero(alive)
+    mask[b, pos[b, n, 0], pos[b, n, 1]] = True
+    return mask
+
+def _gather(grid, pos, dirs, passable=None):
+    # values of grid at pos + dirs for each agent -> (B, N, K), plus validity mask
+    B, W, H = grid.shape
+    nx = pos[:, :, None, 0] + dirs[None, None, :, 0]
+    ny = pos[:, :, None, 1] + dirs[None, None, :, 1]
+    valid = (nx >= 0) & (nx < W) & (ny >= 0) & (ny < H)
+    cx, cy = np.clip(nx, 0, W - 1), np.clip(ny, 0, H - 1)
+    bi = np.arange(B)[:, None, None]
+    if passable is not None:
+        valid &= passable[bi, cx, cy]
+    return grid[bi, cx, cy], valid, nx, ny
+
+def downhill_moves(field, cost, passable, pos):
+    """
+    Per agent: the 4-neighbour minimising cost + field (first one on ties,
+    like fields.downhill_step). Returns (new_pos, ok) where ok is False when
+    no neighbour reaches a source.
+    """
+    vals, valid, nx, ny = _gather(field, pos, DIRS4, passable)
+    step_cost, _, _, _ = _gather(cost, pos, DIRS4)
+    total = np.where(valid, vals + step_cost, INF)
+    k = np.argmin(total, axis=2)
+    ok = np.isfinite(np.take_along_axis(total, k[..., None], axis=2)[..., 0])
+    new = np.stack([np.take_along_axis(nx, k[..., None], axis=2)[..., 0],
+                    np.take_along_axis(ny, k[..., None], axis=2)[..., 0]], axis=-1)
+    return np.where(ok[..., None], new, pos), ok
+
+def uphill_moves(field, passable, pos, rng):
+    """
+    Per agent: move to the 4-neighbour with the largest field value if it beats
+    the current cell (random among ties), like fields.uphill_step.
+    Returns (new_pos, moved).
+    """
+    B = field.shape[0]
+    bi = np.arange(B)[:, None]
+    here = field[bi, pos[:, :, 0], pos[:, :, 1]]
+    vals, valid, nx, ny = _gather(field, pos, DIRS4, passable)
+    vals = np.where(valid, vals, -INF)
+    best = vals.max(axis=2)
+    moved = best > here
+    # random tie-break among the maximal neighbours
+    keys = np.where(vals == best[..., None], rng.random(vals.shape), -1.0)
+    k = np.argmax(keys, axis=2)
+    new = np.stack([np.take_along_axis(nx, k[..., None], axis=2)[..., 0],
+                    np.take_along_axis(ny, k[..., None], axis=2)[..., 0]], axis=-1)
+    return np.where(moved[..., None], new, pos), moved
+
+def random_moves(shape, pos, rng):
+    """Per agent: a uniformly random in-bounds Moore neighbour (obstacles ignored, like _random_move)."""
+    _, W, H = shape
+    nx = pos[:, :, None, 0] + DIRS8[None, None, :, 0]
+    ny = pos[:, :, None, 1] + DIRS8[None, None, :, 1]
+    valid = (nx >= 0) & (nx < W) & (ny >= 0) & (ny < H)
+    keys = np.where(valid, rng.random(valid.shape), -1.0)
+    k = np.argmax(keys, axis=2)
+    return np.stack([np.take_along_axis(nx, k[..., None], axis=2)[..., 0],
+                     np.take_along_axis(ny, k[..., None], axis=2)[..., 0]], axis=-1)
+
+def stamp_squares_batched(shape, pos, alive, radius):
+    """(B, W, H) bool coverage of Chebyshev squares of radius around alive agents."""
+    B, W, H = shape
+    out = np.zeros((B, W + 1, H + 1), dtype=np.int32)
+    b, n = np.nonzero(alive)
+    if b.size:
+        x, y = pos[b, n, 0], pos[b, n, 1]
+        x0, x1 = np.clip(x - radius, 0, W), np.clip(x + radius + 1, 0, W)
+        y0, y1 = np.clip(y - radius, 0, H), np.clip(y + radius + 1, 0, H)
+        np.add.at(out, (b, x0, y0), 1)
+        np.add.at(out, (b, x1, y0), -1)
+        np.add.at(out, (b, x0, y1), -1)
+        np.add.at(out, (b, x1, y1), 1)
+    return out.cumsum(axis=1).cumsum(axis=2)[:, :W, :H] > 0
@@ -0,0 +1,50 @@
+"""
+visibility.py - vectorized fog-of-war layers.
+
+Vision is a Chebyshev square of radius vision_range around each source.
+All squares are stamped at once with a 2-D difference array (a summed-area
+table in reverse): +1/-1 at the four corners of every square, then two
+cumulative sums give the per-cell coverage count.
+"""
+import numpy as np
+
+def stamp_squares(width, height, xs, ys, radii):
+    """Return a (width, height) bool mask covered by squares centred on (xs[i], ys[i])."""
+    xs = np.asarray(xs, dtype=np.int64)
+    if xs.size == 0:
+        return np.zeros((width, height), dtype=bool)
+    ys = np.asarray(ys, dtype=np.int64)
+    radii = np.broadcast_to(np.asarray(radii, dtype=np.int64), xs.shape)
+    x0 = np.clip(xs - radii, 0, width)
+    x1 = np.clip(xs + radii + 1, 0, width)
+    y0 = np.clip(ys - radii, 0, height)
+    y1 = np.clip(ys + radii + 1, 0, height)
+
+    diff = np.zeros((width + 1, height + 1), dtype=np.int32)
+    np.add.at(diff, (x0, y0), 1)
+    np.add.at(diff, (x1, y0), -1)
+    np.add.at(diff, (x0, y1), -1)
+    np.add.at(diff, (x1, y1), 1)
+    coverage = diff.cumsum(axis=0).cumsum(axis=1)
+    return coverage[:width, :height] > 0
+
+class CellMask:
+    """
+    Read-only set-like view over a bool mask, so existing `(x, y) in cells`
+    checks keep working with O(1) array lookups.
+    """
+    def __init__(self, mask):
+        self.mask = mask
+
+    def __contains__(self, pos):
+        x, y = pos
+        if x < 0 or y < 0 or x >= self.mask.shape[0] or y >= self.mask.shape[1]:
+            return False
+        return bool(self.mask[x, y])
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+    def __iter__(self):
+        for x, y in zip(*np.nonzero(self.mask)):
+            yield (int(x), int(y))
@@ -0,0 +1,158 @@
+"""
+scaling.py - scaling benchmark for VoidBreachModel.step.
+
+Runs every combination of map size, population density, obstacle fraction and
+rift acceleration with a fixed seed, each in a fresh process so peak memory
+is measured per configuration, and reports setup time, per-tick latency
+percentiles, peak RSS and throughput.
+
+Usage:
+    python -m benchmarks.scaling --quick
+    python -m benchmarks.scaling --sizes 30 100 250 500 --ticks 20 --out data/bench.json
+    python -m benchmarks.scaling --baseline data/bench.json --threshold 0.25   # exit 1 on regression
+"""
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import time
+import numpy as np
+
+DEFAULT_SIZES = [30, 100, 250, 500]
+# (native density, void density)
+DEFAULT_DENSITIES = [(0.05, 0.02), (0.01, 0.004)]
+DEFAULT_OBSTACLES = [0.05, 0.2]
+DEFAULT_ACCELERATE = [True, False]
+
+def config_key(cfg):
+    return (f"{cfg['size']}x{cfg['size']}/n{cfg['density_native']}/v{cfg['density_void']}"
+            f"/o{cfg['obstacle_fraction']}/acc{int(cfg['rift_accelerate'])}")
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run_config(cfg):
+    """Build and step one configuration; meant to run in its own process."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    from model import VoidBreachModel
+
+    rss_before = _peak_rss_mb()
+    size = cfg["size"]
+    t0 = time.perf_counter()
+    model = VoidBreachModel(width=size, height=size,
+                            initial_natives=int(size*size*cfg["density_native"]),
+                            initial_voidspawns=int(size*size*cfg["density_void"]),
+                            obstacle_fraction=cfg["obstacle_fraction"],
+                            rift_accelerate=cfg["rift_accelerate"],
+                            seed=cfg["seed"], **cfg.get("model_params", {}))
+    setup_s = time.perf_counter() - t0
+
+    ticks = []
+    for _ in range(cfg["ticks"]):
+        # keep stepping after the stop condition so every config runs the same tick count
+        t = time.perf_counter()
+        model.step()
+        ticks.append(time.perf_counter() - t)
+    ticks_ms = np.array(ticks) * 1000.0
+
+    return {
+        "key": config_key(cfg),
+        "config": cfg,
+        "setup_s": setup_s,
+        "tick_ms_p50": float(np.percentile(ticks_ms, 50)),
+        "tick_ms_p90": float(np.percentile(ticks_ms, 90)),
+        "tick_ms_p99": float(np.percentile(ticks_ms, 99)),
+        "tick_ms_max": float(ticks_ms.max()),
+        "ticks_per_s": float(len(ticks) / (ticks_ms.sum() / 1000.0)) if ticks else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "setup_rss_mb": _peak_rss_mb() - rss_before,
+        "final_natives": len(model.registry["Native"]),
+        "final_voidspawns": len(model.registry["Voidspawn"]),
+    }
+
+def build_configs(sizes, densities, obstacles, accelerate, ticks, seed, model_params=None):
+    configs = []
+    for size, (dn, dv), obs, acc in itertools.product(sizes, densities, obstacles, accelerate):
+        configs.append({"size": size, "density_native": dn, "density_void": dv,
+                        "obstacle_fraction": obs, "rift_accelerate": acc,
+                        "ticks": ticks, "seed": seed, "model_params": model_params or {}})
+    return configs
+
+def run_suite(configs):
+    results = []
+    # spawn: a clean interpreter per configuration, so peak RSS is not inherited
+    ctx = mp.get_context("spawn")
+    for cfg in configs:
+        with ctx.Pool(1) as pool:
+            res = pool.apply(run_config, (cfg,))
+        print(f"{res['key']:<40} setup {res['setup_s']:7.2f}s  p50 {res['tick_ms_p50']:9.2f}ms  "
+              f"p99 {res['tick_ms_p99']:9.2f}ms  {res['ticks_per_s']:8.2f} ticks/s  rss {res['peak_rss_mb']:7.1f}MB")
+        results.append(res)
+    return results
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages for configs slower than baseline*(1+threshold)."""
+    base = {r["key"]: r for r in baseline["results"]}
+    regressions = []
+    for res in results:
+        ref = base.get(res["key"])
+        if ref is None:
+            continue
+        for metric in ("tick_ms_p50", "tick_ms_p90", "setup_s", "peak_rss_mb"):
+            if ref[metric] > 0 and res[metric] > ref[metric] * (1 + threshold):
+                regressions.append(f"{res['key']}: {metric} {ref[metric]:.2f} -> {res[metric]:.2f} "
+                                   f"(+{(res[metric] / ref[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VoidBreachModel scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--obstacles", type=float, nargs="+", default=DEFAULT_OBSTACLES)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--quick", action="store_true", help="30x30 and 100x100 only, one density")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=JSON",
+                        help="extra VoidBreachModel keyword for every config, e.g. native_flee='\"sample\"'")
+    parser.add_argument("--out", default="data/benchmark_scaling.json")
+    parser.add_argument("--baseline", help="previous JSON output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    sizes, densities = args.sizes, DEFAULT_DENSITIES
+    if args.quick:
+        sizes, densities = [30, 100], DEFAULT_DENSITIES[:1]
+    model_params = {}
+    for item in args.param:
+        name, value = item.split("=", 1)
+        model_params[name] = json.loads(value)
+
+    configs = build_configs(sizes, densities, args.obstacles, DEFAULT_ACCELERATE,
+                            args.ticks, args.seed, model_params)
+    results = run_suite(configs)
+    report = {"machine": platform.platform(), "python": platform.python_version(),
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark results to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for msg in regressions:
+            print("REGRESSION", msg)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
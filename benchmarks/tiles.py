@@ -0,0 +1,150 @@
+"""
+tiles.py - strong and weak scaling of distributed.TiledWorld with the worker count.
+
+  strong  one fixed map (--size), split over 1, 2, 4, ... workers; ideal is
+          tick time / workers. A single-process VoidBreachModel(engine="arrays")
+          run of the same map is reported as workers=0 for reference.
+  weak    every worker gets a --tile x --tile share, so the map grows with
+          the worker count; ideal is a flat tick time.
+
+Populations scale with the map area (--native-density / --void-density).
+Every configuration is seeded identically and timed over --ticks ticks after
+setup (worker start-up included in setup_s). Worker counts above the number
+of cores are still run but flagged, since they can only show overhead.
+
+Usage:
+    python -m benchmarks.tiles --workers 1 2 4 8
+    python -m benchmarks.tiles --mode strong --size 1200 --ticks 30 --out data/bench_tiles.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+def _time_ticks(step, ticks, running):
+    times = []
+    for _ in range(ticks):
+        if not running():
+            break
+        t = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - t)
+    return np.array(times) * 1000.0
+
+def _summary(times_ms):
+    if not len(times_ms):
+        return {"ticks": 0, "tick_ms_p50": 0.0, "tick_ms_mean": 0.0}
+    return {"ticks": int(len(times_ms)), "tick_ms_p50": float(np.percentile(times_ms, 50)),
+            "tick_ms_mean": float(times_ms.mean())}
+
+def run_tiled(width, height, tiles, ticks, seed, density_native, density_void):
+    from distributed import TiledWorld
+
+    t0 = time.perf_counter()
+    world = TiledWorld(width=width, height=height, tiles=tiles, seed=seed,
+                       initial_natives=int(width*height*density_native),
+                       initial_voidspawns=int(width*height*density_void))
+    setup_s = time.perf_counter() - t0
+    try:
+        rounds = world.field_rounds
+        times = _time_ticks(world.step, ticks, lambda: world.running)
+        res = {"workers": world.workers, "tiles": list(world.tiles), "width": width, "height": height,
+               "setup_s": setup_s, **_summary(times)}
+        res["field_rounds_per_tick"] = (world.field_rounds - rounds) / max(1, res["ticks"])
+    finally:
+        world.close()
+    return res
+
+def run_reference(width, height, ticks, seed, density_native, density_void):
+    """The same map in one process with VoidBreachModel(engine="arrays")."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    from model import VoidBreachModel
+
+    t0 = time.perf_counter()
+    model = VoidBreachModel(width=width, height=height, engine="arrays", seed=seed,
+                            initial_natives=int(width*height*density_native),
+                            initial_voidspawns=int(width*height*density_void))
+    setup_s = time.perf_counter() - t0
+    times = _time_ticks(model.step, ticks, lambda: model.running)
+    return {"workers": 0, "tiles": None, "width": width, "height": height, "setup_s": setup_s, **_summary(times)}
+
+def strong_scaling(size, workers, **kw):
+    from distributed import tile_grid
+
+    results = [run_reference(size, size, **kw)]
+    for n in workers:
+        results.append(run_tiled(size, size, tile_grid(n, size, size), **kw))
+    base = next((r for r in results if r["workers"] == min(workers)), None)
+    for r in results[1:]:
+        speedup = base["tick_ms_mean"] / r["tick_ms_mean"] if r["tick_ms_mean"] else 0.0
+        r["speedup"] = speedup
+        r["efficiency"] = speedup * base["workers"] / r["workers"]
+    return results
+
+def weak_scaling(tile, workers, **kw):
+    from distributed import tile_grid
+
+    results = []
+    for n in workers:
+        tx, ty = tile_grid(n, tile, tile)
+        results.append(run_tiled(tx * tile, ty * tile, (tx, ty), **kw))
+    base = results[0]
+    for r in results:
+        r["efficiency"] = base["tick_ms_mean"] / r["tick_ms_mean"] if r["tick_ms_mean"] else 0.0
+    return results
+
+def _print(mode, results, cores):
+    print(f"--- {mode} scaling ({cores} cores) ---")
+    for r in results:
+        label = "arrays engine" if r["workers"] == 0 else f"{r['workers']:>3} workers {r['tiles'][0]}x{r['tiles'][1]}"
+        line = (f"{label:<22} {r['width']}x{r['height']:<6} setup {r['setup_s']:6.2f}s  "
+                f"mean {r['tick_ms_mean']:9.2f}ms  p50 {r['tick_ms_p50']:9.2f}ms  ({r['ticks']} ticks)")
+        if "field_rounds_per_tick" in r:
+            line += f"  rounds/tick {r['field_rounds_per_tick']:5.1f}"
+        if "speedup" in r:
+            line += f"  speedup {r['speedup']:5.2f}"
+        if "efficiency" in r:
+            line += f"  efficiency {r['efficiency']:5.2f}"
+        if r["workers"] > cores:
+            line += "  (oversubscribed)"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TiledWorld strong / weak scaling benchmark")
+    parser.add_argument("--mode", choices=("strong", "weak", "both"), default="both")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="worker counts (default: 1, 2, 4, ... up to the core count)")
+    parser.add_argument("--size", type=int, default=800, help="strong scaling: map side")
+    parser.add_argument("--tile", type=int, default=300, help="weak scaling: tile side per worker")
+    parser.add_argument("--native-density", type=float, default=0.05)
+    parser.add_argument("--void-density", type=float, default=0.02)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=12345)
+    parser.add_argument("--out", default="data/benchmark_tiles.json")
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or [2 ** k for k in range(cores.bit_length()) if 2 ** k <= cores]
+    kw = {"ticks": args.ticks, "seed": args.seed,
+          "density_native": args.native_density, "density_void": args.void_density}
+    report = {"machine": platform.platform(), "python": platform.python_version(), "cores": cores,
+              "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    if args.mode in ("strong", "both"):
+        report["strong"] = strong_scaling(args.size, workers, **kw)
+        _print("strong", report["strong"], cores)
+    if args.mode in ("weak", "both"):
+        report["weak"] = weak_scaling(args.tile, workers, **kw)
+        _print("weak", report["weak"], cores)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark results to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+"""
+distributed.py - one very large world split into tiles stepped by worker processes.
+
+TiledWorld cuts the map into a grid of rectangular tiles and starts one
+worker process per tile. A worker owns the Natives, Voidspawns and Rifts
+standing in its tile and steps them with the batched kernels of the array
+engine, under the rules of VoidBreachModel(engine="arrays"). Every per-cell
+layer that tiles need to see across their edges is one global array in
+shared memory (multiprocessing.shared_memory):
+
+    cost, passable          static map
+    threat0/1, hunt0/1      distance fields, two buffers each (see 2.)
+    sources                 field sources of the current phase
+    native_id/native_owner  which Native stands on a cell, and the tile holding it
+    visible, explored       fog of war
+
+That is the halo exchange: a worker writes its own agents into the shared
+layers and reads its neighbours' cells around its edges straight from them.
+Only agent hand-offs travel over the pipes.
+
+The parent drives every tick as a sequence of phases. Each phase is one
+command sent to every worker over its pipe, and the next phase starts once
+all of them have answered:
+
+  1. Rifts count down and spawn; Voidspawns mark the threat sources.
+  2. Threat field. Each worker sweeps its tile plus a one-cell ring of its
+     neighbours' values (vectorized.distance_fields with the current values
+     as upper bounds), reading one buffer and writing the other. Rounds repeat
+     until no tile changes, so the field is exactly the global one and paths
+     bend around walls across any number of tiles.
+  3. About half of the Natives flee, and all of them mark their cell.
+  4. Voidspawns pick the first Native within attack range, including Natives
+     held by a neighbouring tile. The tile holding a targeted Native draws one
+     winner among its attackers, and the winners are reported back.
+  5. The hunt field is built from the survivors as in 2. The other Voidspawns
+     step down it, then the remaining Natives flee.
+  6. Agents that crossed a tile border migrate to the tile they now stand in.
+  7. Fog: every worker stamps its agents' vision squares, across tile edges
+     where needed, then folds its own tile into explored.
+
+The world is generated with the draws of VoidBreachModel(seed=seed), as the
+ensemble runner does. Each tile has its own generator, seeded with
+(seed, tile index), so a seeded run repeats exactly for a given tile layout.
+Another layout gives a different run with the same rules.
+
+    with TiledWorld(width=2000, height=2000, initial_natives=200000,
+                    initial_voidspawns=80000, workers=8, seed=1) as world:
+        world.run(max_steps=200)
+        df = world.get_results_df()     # Step, Natives, Voidspawns
+
+benchmarks/tiles.py measures strong and weak scaling with the worker count.
+"""
+import multiprocessing as mp
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from algorithms.vectorized import (INF, distance_fields, downhill_moves, uphill_moves, random_moves,
+                                   stamp_squares_batched)
+from ensemble import _draw_world
+from population import _ATTACK_OFFSETS, _manhattan_offsets
+
+# shared per-cell layers
+LAYERS = (("cost", np.float64), ("passable", np.bool_),
+          ("threat0", np.float64), ("threat1", np.float64), ("hunt0", np.float64), ("hunt1", np.float64),
+          ("sources", np.bool_), ("native_id", np.int64), ("native_owner", np.int32),
+          ("visible", np.bool_), ("explored", np.bool_))
+
+class SharedLayers:
+    """The global per-cell arrays; created by the parent (names=None), attached by the workers."""
+    def __init__(self, width, height, names=None):
+        self.shape = (width, height)
+        self.created = names is None
+        self._blocks = {}
+        for name, dtype in LAYERS:
+            if self.created:
+                block = shared_memory.SharedMemory(create=True, size=max(1, width * height * np.dtype(dtype).itemsize))
+            else:
+                block = shared_memory.SharedMemory(name=names[name])
+            self._blocks[name] = block
+            setattr(self, name, np.ndarray(self.shape, dtype=dtype, buffer=block.buf))
+
+    def names(self):
+        return {name: block.name for name, block in self._blocks.items()}
+
+    def close(self):
+        # views have to go before their buffers can be released
+        for name, _ in LAYERS:
+            setattr(self, name, None)
+        for block in self._blocks.values():
+            block.close()
+            if self.created:
+                block.unlink()
+        self._blocks = {}
+
+def tile_grid(workers, width, height):
+    """(tiles along x, tiles along y) for workers tiles, with the shortest total border."""
+    pairs = [(a, workers // a) for a in range(1, workers + 1) if workers % a == 0]
+    return min(pairs, key=lambda p: (p[0] - 1) * height + (p[1] - 1) * width)
+
+def _empty(n=0):
+    return np.zeros((n, 2), dtype=np.int64)
+
+class _Tile:
+    """One worker's share of the world: its agents plus views of the shared layers."""
+    def __init__(self, index, box, shape, names, seed, natives, native_ids, voids, rifts,
+                 native_vision, void_vision, rift_spawn_interval, rift_accelerate, min_interval, attack_range):
+        self.index = index
+        self.x0, self.y0, self.x1, self.y1 = box
+        self.own = (slice(self.x0, self.x1), slice(self.y0, self.y1))
+        self.layers = SharedLayers(*shape, names=names)
+        self.shape = (1,) + tuple(shape)
+        self.rng = np.random.default_rng([seed, index])
+        self.native_vision = native_vision
+        self.void_vision = void_vision
+        self.rift_accelerate = rift_accelerate
+        self.min_interval = min_interval
+        self.offsets = _ATTACK_OFFSETS if attack_range == 1 else _manhattan_offsets(attack_range)
+
+        self.native_pos = np.asarray(natives, dtype=np.int64).reshape(-1, 2)
+        self.native_id = np.asarray(native_ids, dtype=np.int64)
+        self.native_alive = np.ones(len(self.native_id), dtype=bool)
+        self.early = np.zeros(len(self.native_id), dtype=bool)
+        self.void_pos = np.asarray(voids, dtype=np.int64).reshape(-1, 2)
+        self.void_newborn = np.zeros(len(self.void_pos), dtype=bool)
+        self.rift_pos = np.asarray(rifts, dtype=np.int64).reshape(-1, 2)
+        self.rift_tick = np.zeros(len(self.rift_pos), dtype=np.int64)
+        self.rift_interval = np.full(len(self.rift_pos), rift_spawn_interval, dtype=np.int64)
+        self.spawned = self.killed = 0
+        # per field: (window values read, result) of this tile's last round
+        self._last = {}
+
+    def _window(self, margin):
+        # own box grown by margin cells, clipped to the map
+        _, W, H = self.shape
+        return (slice(max(0, self.x0 - margin), min(W, self.x1 + margin)),
+                slice(max(0, self.y0 - margin), min(H, self.y1 + margin)))
+
+    # --- phases (see module docstring) ---
+    def begin(self):
+        self.rift_tick += 1
+        due = self.rift_tick >= self.rift_interval
+        self.rift_tick[due] = 0
+        if self.rift_accelerate:
+            faster = due & (self.rift_interval > self.min_interval)
+            self.rift_interval[faster] = np.maximum(self.min_interval, self.rift_interval[faster] - 1)
+        born = self.rift_pos[due]
+        self.void_pos = np.concatenate([self.void_pos, born])
+        self.void_newborn = np.concatenate([np.zeros(len(self.void_newborn), dtype=bool), np.ones(len(born), dtype=bool)])
+        self.spawned = len(born)
+        self.killed = 0
+        L = self.layers
+        L.sources[self.own] = False
+        L.native_id[self.own] = -1
+        L.threat0[self.own] = INF
+        self._last.pop("threat", None)
+
+    def mark_voids(self):
+        self.layers.sources[self.void_pos[:, 0], self.void_pos[:, 1]] = True
+
+    def sweep(self, field, rnd, outward):
+        """One exchange round of a distance field; True if this tile's values changed."""
+        L = self.layers
+        read = getattr(L, f"{field}{rnd % 2}")
+        write = getattr(L, f"{field}{(rnd + 1) % 2}")
+        win = self._window(1)
+        seen = read[win]
+        last = self._last.get(field)
+        if last is not None and np.array_equal(seen, last[0]):
+            # nothing new on this tile or its ring since the last round
+            write[self.own] = last[1]
+            return False
+        new = distance_fields(L.cost[win][None], L.passable[win][None], L.sources[win][None],
+                              outward=outward, initial=seen[None])[0]
+        inner = new[self.x0 - win[0].start:self.x1 - win[0].start, self.y0 - win[1].start:self.y1 - win[1].start]
+        changed = not np.array_equal(inner, read[self.own])
+        write[self.own] = inner
+        self._last[field] = (seen.copy(), inner)
+        return changed
+
+    def flee(self, early):
+        L = self.layers
+        if early:
+            self.early = self.rng.random(len(self.native_id)) < 0.5
+        movers = self.native_alive & (self.early if early else ~self.early)
+        if movers.any():
+            pos = self.native_pos[None]
+            here = L.threat0[self.native_pos[:, 0], self.native_pos[:, 1]]
+            up, _ = uphill_moves(L.threat0[None], L.passable[None], pos, self.rng)
+            wander = random_moves(self.shape, pos, self.rng)
+            # no predator can reach this cell (or there are none): wander
+            new = np.where(np.isinf(here)[:, None], wander[0], up[0])
+            self.native_pos = np.where(movers[:, None], new, self.native_pos)
+        if early:
+            # the threat sources are spent; the hunt field starts over
+            L.sources[self.own] = False
+            L.hunt0[self.own] = INF
+            self._last.pop("hunt", None)
+
+    def mark_natives(self):
+        L = self.layers
+        x, y = self.native_pos[self.native_alive].T
+        L.native_id[x, y] = self.native_id[self.native_alive]
+        L.native_owner[x, y] = self.index
+
+    def attack(self):
+        """(holding tiles, Voidspawn slots, target Native ids) of this tile's attack proposals."""
+        L = self.layers
+        _, W, H = self.shape
+        tx = self.void_pos[:, None, 0] + self.offsets[None, :, 0]
+        ty = self.void_pos[:, None, 1] + self.offsets[None, :, 1]
+        inside = (tx >= 0) & (tx < W) & (ty >= 0) & (ty < H)
+        tx, ty = np.clip(tx, 0, W - 1), np.clip(ty, 0, H - 1)
+        cand = np.where(inside, L.native_id[tx, ty], -1)
+        has = cand >= 0
+        first = has.argmax(axis=1)[:, None]
+        attackers = np.flatnonzero(~self.void_newborn & has.any(axis=1))
+        target = np.take_along_axis(cand, first, axis=1)[attackers, 0]
+        holder = np.take_along_axis(L.native_owner[tx, ty], first, axis=1)[attackers, 0]
+        return holder, attackers, target
+
+    def resolve(self, workers, slots, targets):
+        """Kill the targeted Natives, one random winner each; returns the winners (workers, slots)."""
+        if len(targets):
+            order = self.rng.permutation(len(targets))
+            _, first = np.unique(targets[order], return_index=True)
+            win = order[first]
+            dead = self.native_alive & np.isin(self.native_id, targets[win])
+            self.native_alive &= ~dead
+            self.killed = int(dead.sum())
+            workers, slots = workers[win], slots[win]
+        x, y = self.native_pos[self.native_alive].T
+        self.layers.sources[x, y] = True
+        return workers, slots
+
+    def move(self, winners):
+        """Hunt, flee the rest, and hand over the agents that left the tile: (native ids, native pos, void pos)."""
+        L = self.layers
+        movers = ~self.void_newborn
+        movers[winners] = False
+        if movers.any():
+            pos = self.void_pos[None]
+            down, ok = downhill_moves(L.hunt0[None], L.cost[None], L.passable[None], pos)
+            wander = random_moves(self.shape, pos, self.rng)
+            new = np.where(ok[0][:, None], down[0], wander[0])
+            self.void_pos = np.where(movers[:, None], new, self.void_pos)
+        self.flee(early=False)
+
+        keep = self.native_alive
+        self.native_pos, self.native_id = self.native_pos[keep], self.native_id[keep]
+        out_n, out_v = self._outside(self.native_pos), self._outside(self.void_pos)
+        leaving = (self.native_id[out_n], self.native_pos[out_n], self.void_pos[out_v])
+        self.native_pos, self.native_id = self.native_pos[~out_n], self.native_id[~out_n]
+        self.native_alive = np.ones(len(self.native_id), dtype=bool)
+        self.void_pos = self.void_pos[~out_v]
+        self.void_newborn = np.zeros(len(self.void_pos), dtype=bool)
+        L.visible[self.own] = False
+        return leaving
+
+    def _outside(self, pos):
+        x, y = pos[:, 0], pos[:, 1]
+        return (x < self.x0) | (x >= self.x1) | (y < self.y0) | (y >= self.y1)
+
+    def migrate(self, native_ids, native_pos, void_pos):
+        self.native_id = np.concatenate([self.native_id, native_ids])
+        self.native_pos = np.concatenate([self.native_pos, native_pos])
+        self.native_alive = np.ones(len(self.native_id), dtype=bool)
+        self.void_pos = np.concatenate([self.void_pos, void_pos])
+        self.void_newborn = np.zeros(len(self.void_pos), dtype=bool)
+
+    def stamp(self):
+        win = self._window(max(self.native_vision, self.void_vision))
+        shape = (1, win[0].stop - win[0].start, win[1].stop - win[1].start)
+        offset = np.array([win[0].start, win[1].start])
+        seen = np.zeros(shape[1:], dtype=bool)
+        for pos, radius in ((self.native_pos, self.native_vision), (self.void_pos, self.void_vision)):
+            if len(pos):
+                seen |= stamp_squares_batched(shape, (pos - offset)[None], np.ones((1, len(pos)), dtype=bool), radius)[0]
+        # set-only writes: a neighbour may be stamping the same halo cells
+        self.layers.visible[win][seen] = True
+
+    def explore(self):
+        """Fold the visible tile into explored; returns (natives, voidspawns, kills, spawns)."""
+        L = self.layers
+        L.explored[self.own] |= L.visible[self.own]
+        return len(self.native_id), len(self.void_pos), self.killed, self.spawned
+
+    def positions(self, kind):
+        return {"Native": self.native_pos, "Voidspawn": self.void_pos, "Rift": self.rift_pos}[kind]
+
+    def close(self):
+        self.layers.close()
+
+def _serve(conn, init):
+    # worker process main loop: run the phase the parent asks for, answer (ok, result)
+    tile = _Tile(**init)
+    try:
+        while True:
+            name, args = conn.recv()
+            if name == "close":
+                break
+            try:
+                conn.send((True, getattr(tile, name)(*args)))
+            except Exception:
+                conn.send((False, traceback.format_exc()))
+    finally:
+        tile.close()
+        conn.close()
+
+class TiledWorld:
+    """
+    workers: number of tiles / worker processes, laid out by tile_grid
+             (or pass tiles=(along x, along y))
+    The other parameters mean what they mean for VoidBreachModel.
+    """
+    def __init__(self, width=300, height=300, initial_natives=1000, initial_voidspawns=400,
+                 obstacle_fraction=0.05, seed=0, workers=4, tiles=None,
+                 native_vision=5, void_vision=6, rift_spawn_interval=30, rift_accelerate=True,
+                 min_interval=5, attack_range=1):
+        self.width = width
+        self.height = height
+        self.tiles = tuple(tiles) if tiles is not None else tile_grid(workers, width, height)
+        tx, ty = self.tiles
+        if not (0 < tx <= width and 0 < ty <= height):
+            raise ValueError(f"cannot cut a {width}x{height} map into {tx}x{ty} tiles")
+        self.x_edges = np.arange(tx + 1) * width // tx
+        self.y_edges = np.arange(ty + 1) * height // ty
+
+        cost, passable, natives, voids, rifts = _draw_world(seed, width, height, obstacle_fraction,
+                                                            initial_natives, initial_voidspawns)
+        self.layers = SharedLayers(width, height)
+        self.layers.cost[:] = cost
+        self.layers.passable[:] = passable
+        self.layers.visible[:] = False
+        self.layers.explored[:] = False
+
+        natives = np.asarray(natives, dtype=np.int64).reshape(-1, 2)
+        voids = np.asarray(voids, dtype=np.int64).reshape(-1, 2)
+        rifts = np.asarray(rifts, dtype=np.int64).reshape(-1, 2)
+        at_n, at_v, at_r = self.tile_of(natives), self.tile_of(voids), self.tile_of(rifts)
+        ctx = mp.get_context("spawn")
+        self._conns = []
+        self._procs = []
+        for i in range(tx * ty):
+            ix, iy = divmod(i, ty)
+            box = (int(self.x_edges[ix]), int(self.y_edges[iy]), int(self.x_edges[ix + 1]), int(self.y_edges[iy + 1]))
+            init = dict(index=i, box=box, shape=(width, height), names=self.layers.names(), seed=seed,
+                        natives=natives[at_n == i], native_ids=np.flatnonzero(at_n == i),
+                        voids=voids[at_v == i], rifts=rifts[at_r == i],
+                        native_vision=native_vision, void_vision=void_vision,
+                        rift_spawn_interval=rift_spawn_interval, rift_accelerate=rift_accelerate,
+                        min_interval=min_interval, attack_range=attack_range)
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_serve, args=(child, init), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+        self.steps = 0
+        self.kills = 0
+        self.spawns = 0
+        self.field_rounds = 0
+        self.running = True
+        self._records = []
+        natives, voids, _, _ = self._update_fog()
+        self._records.append((0, natives, voids))
+
+    @property
+    def workers(self):
+        return len(self._conns)
+
+    @property
+    def visible(self):
+        return self.layers.visible
+
+    @property
+    def explored(self):
+        return self.layers.explored
+
+    def tile_of(self, pos):
+        """Index of the tile holding each (x, y) in pos."""
+        pos = np.asarray(pos, dtype=np.int64).reshape(-1, 2)
+        ix = np.searchsorted(self.x_edges, pos[:, 0], side="right") - 1
+        iy = np.searchsorted(self.y_edges, pos[:, 1], side="right") - 1
+        return ix * self.tiles[1] + iy
+
+    def _all(self, name, args=None):
+        # one phase: the same command to every worker (per-worker args if given), then wait for all
+        for i, conn in enumerate(self._conns):
+            conn.send((name, args[i] if args is not None else ()))
+        results = []
+        for conn in self._conns:
+            ok, result = conn.recv()
+            if not ok:
+                raise RuntimeError(f"tile worker failed in {name}:\n{result}")
+            results.append(result)
+        return results
+
+    def _field(self, field, outward):
+        rnd = 0
+        while True:
+            changed = self._all("sweep", [(field, rnd, outward)] * self.workers)
+            rnd += 1
+            if not any(changed):
+                break
+        self.field_rounds += rnd
+
+    def _route(self, tiles, *columns):
+        # split the rows of columns by destination tile -> per-worker tuples of arrays
+        return [tuple(c[tiles == t] for c in columns) for t in range(self.workers)]
+
+    def _update_fog(self):
+        self._all("stamp")
+        counts = np.array(self._all("explore"))
+        return tuple(int(v) for v in counts.sum(axis=0))
+
+    def step(self):
+        """Advance the whole world by one tick (a no-op once it has stopped)."""
+        if not self.running:
+            return
+        n = self.workers
+        self._all("begin")
+        self._all("mark_voids")
+        self._field("threat", True)
+        self._all("flee", [(True,)] * n)
+        self._all("mark_natives")
+
+        # attack proposals go to the tile holding the target, winners come back
+        proposals = self._all("attack")
+        holder = np.concatenate([p[0] for p in proposals]).astype(np.int64)
+        worker = np.concatenate([np.full(len(p[1]), w, dtype=np.int64) for w, p in enumerate(proposals)])
+        slots = np.concatenate([p[1] for p in proposals]).astype(np.int64)
+        targets = np.concatenate([p[2] for p in proposals]).astype(np.int64)
+        wins = self._all("resolve", self._route(holder, worker, slots, targets))
+        win_worker = np.concatenate([w for w, _ in wins]).astype(np.int64)
+        win_slot = np.concatenate([s for _, s in wins]).astype(np.int64)
+
+        self._field("hunt", False)
+        leaving = self._all("move", [(win_slot[win_worker == w],) for w in range(n)])
+        ids = np.concatenate([l[0] for l in leaving]).astype(np.int64)
+        native_pos = np.concatenate([_empty()] + [l[1] for l in leaving])
+        void_pos = np.concatenate([_empty()] + [l[2] for l in leaving])
+        to_n, to_v = self.tile_of(native_pos), self.tile_of(void_pos)
+        self._all("migrate", [(ids[to_n == t], native_pos[to_n == t], void_pos[to_v == t]) for t in range(n)])
+
+        natives, voids, kills, spawns = self._update_fog()
+        self.steps += 1
+        self.kills += kills
+        self.spawns += spawns
+        self._records.append((self.steps, natives, voids))
+        # the stop condition of VoidBreachModel.step
+        if natives == 0 or voids == 0:
+            self.running = False
+
+    def run(self, max_steps=None):
+        """Step until the world stops, or for at most max_steps more ticks."""
+        n = 0
+        while self.running and (max_steps is None or n < max_steps):
+            self.step()
+            n += 1
+        return self
+
+    def positions(self, kind):
+        """(n, 2) positions of all live "Native", "Voidspawn" or "Rift" agents, tile by tile."""
+        return np.concatenate([_empty()] + self._all("positions", [(kind,)] * self.workers))
+
+    def get_results_df(self):
+        """Population time series in the schema of VoidBreachModel.get_results_df()."""
+        return pd.DataFrame(self._records, columns=["Step", "Natives", "Voidspawns"])
+
+    def close(self):
+        """Stop the workers and release the shared layers."""
+        if self.layers is None:
+            return
+        for conn in self._conns:
+            try:
+                conn.send(("close", ()))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join()
+        for conn in self._conns:
+            conn.close()
+        self._conns, self._procs = [], []
+        self.layers.close()
+        self.layers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,163 @@
+"""
+ensemble.py - many independent small worlds simulated together in one process.
+
+Replicate studies run thousands of small maps, and as separate
+VoidBreachModels each one pays for its MultiGrid, schedule and per-agent
+step calls. Ensemble stacks B worlds along the leading dimension of one
+population.PopulationArrays (terrain, passability, fog and populations are
+all (B, ...) arrays) and advances every running world with the same batched
+kernels, with the same rules as VoidBreachModel(engine="arrays").
+
+World b is generated with the same draws as VoidBreachModel(seed=seeds[b]),
+so it starts on the same map with the same Rifts, Voidspawns and Natives.
+The tick dynamics share one NumPy generator across the batch, so runs match
+the single-world engine in distribution, not draw for draw.
+
+Each world stops on its own when it runs out of Natives or Voidspawns (the
+check in VoidBreachModel.step); finished worlds are masked out, and once at
+most half of the batch is still running the arrays are compacted to the
+running worlds.
+
+    ens = Ensemble(worlds=1000, seed=0)
+    ens.run(max_steps=200)
+    df = ens.get_results_df()       # World, Step, Natives, Voidspawns
+    one = ens.world_results_df(3)   # same schema as VoidBreachModel.get_results_df()
+"""
+import random
+import numpy as np
+import pandas as pd
+
+from population import PopulationArrays
+
+def _draw_world(seed, width, height, obstacle_fraction, initial_natives, initial_voidspawns,
+                default_cost=1.0, high_cost_prob=0.08, high_cost=3.0):
+    # the draws of VoidBreachModel.__init__ (_create_terrain, _scatter_obstacles,
+    # _populate_arrays), in the same order
+    rnd = random.Random(seed)
+    draws = np.array([rnd.random() for _ in range(width * height)]).reshape(width, height)
+    cost = np.where(draws < high_cost_prob, high_cost, default_cost)
+    passable = np.ones((width, height), dtype=bool)
+    num_obstacles = int(width * height * obstacle_fraction)
+    placed = attempts = 0
+    while placed < num_obstacles and attempts < num_obstacles * 10:
+        x, y = rnd.randrange(width), rnd.randrange(height)
+        if passable[x, y]:
+            passable[x, y] = False
+            placed += 1
+        attempts += 1
+
+    def draw(n):
+        return [(rnd.randrange(width), rnd.randrange(height)) for _ in range(n)]
+    rifts = draw(max(1, int(initial_voidspawns/2)))
+    voids = draw(initial_voidspawns)
+    natives = draw(initial_natives)
+    return cost, passable, natives, voids, rifts
+
+class Ensemble:
+    """
+    worlds: number of worlds, seeded seed, seed + 1, ... (or pass seeds)
+    fog: keep per-world visible / explored masks like the model does
+    The other parameters mean what they mean for VoidBreachModel.
+    """
+    def __init__(self, worlds=64, width=30, height=30, initial_natives=20, initial_voidspawns=5,
+                 obstacle_fraction=0.05, seed=0, seeds=None,
+                 native_vision=5, void_vision=6, rift_spawn_interval=30, rift_accelerate=True,
+                 fog=True):
+        self.seeds = list(seeds) if seeds is not None else [seed + b for b in range(worlds)]
+        self.width = width
+        self.height = height
+        B = len(self.seeds)
+        layers = [_draw_world(s, width, height, obstacle_fraction, initial_natives, initial_voidspawns)
+                  for s in self.seeds]
+        cost, passable, natives, voids, rifts = zip(*layers)
+        self.population = PopulationArrays(
+            np.stack(cost), np.stack(passable), list(natives), list(voids), list(rifts),
+            np.random.default_rng(self.seeds[0] if self.seeds else 0),
+            native_vision=native_vision, void_vision=void_vision,
+            rift_spawn_interval=rift_spawn_interval, rift_accelerate=rift_accelerate)
+        # world index of each row of the population arrays (rows drop out on compaction)
+        self.world_ids = np.arange(B)
+        # per-world tick counters; a finished world keeps its final step
+        self.steps = np.zeros(B, dtype=np.int64)
+        self.running = np.ones(B, dtype=bool)
+
+        self.fog = fog
+        if fog:
+            self.visible = np.zeros((B, width, height), dtype=bool)
+            self.explored = np.zeros((B, width, height), dtype=bool)
+            self._update_fog()
+        # per collect: (world ids, step, natives, voidspawns)
+        self._records = []
+        self._collect()
+
+    def _update_fog(self):
+        masks = self.population.visibility()
+        visible = masks["Native"] | masks["Voidspawn"]
+        ids = self.world_ids
+        self.visible[ids] = visible
+        self.explored[ids] |= visible
+
+    def _collect(self):
+        pop = self.population
+        live = pop.active
+        self._records.append((self.world_ids[live], self.steps[self.world_ids[live]],
+                              pop.count("Native")[live], pop.count("Voidspawn")[live]))
+
+    def step(self):
+        """Advance every running world by one tick."""
+        pop = self.population
+        if not pop.active.any():
+            return
+        pop.step()
+        self.steps[self.world_ids[pop.active]] += 1
+        if self.fog:
+            self._update_fog()
+        self._collect()
+        # per-world stop condition: no natives or no voidspawns
+        done = pop.active & ((pop.count("Native") == 0) | (pop.count("Voidspawn") == 0))
+        if done.any():
+            pop.active &= ~done
+            self.running[self.world_ids[done]] = False
+            if pop.active.sum() * 2 <= pop.active.size:
+                self._compact()
+
+    def _compact(self):
+        keep = np.nonzero(self.population.active)[0]
+        self.population.select(keep)
+        self.world_ids = self.world_ids[keep]
+
+    def run(self, max_steps=None):
+        """Step until every world has finished, or for at most max_steps more ticks."""
+        n = 0
+        while self.running.any() and (max_steps is None or n < max_steps):
+            self.step()
+            n += 1
+        return self
+
+    def get_results_df(self):
+        """Per-world population time series: World, Step, Natives, Voidspawns."""
+        if self._records:
+            world, step, natives, voids = (np.concatenate(c) for c in zip(*self._records))
+        else:
+            world = step = natives = voids = np.zeros(0, dtype=np.int64)
+        df = pd.DataFrame({"World": world, "Step": step, "Natives": natives, "Voidspawns": voids})
+        return df.sort_values(["World", "Step"], kind="stable").reset_index(drop=True)
+
+    def world_results_df(self, world):
+        """One world's rows in the schema of VoidBreachModel.get_results_df()."""
+        df = self.get_results_df()
+        return df[df["World"] == world].drop(columns="World").reset_index(drop=True)
+
+def run_ensemble(worlds, max_steps=None, batch_size=256, seed=0, **params):
+    """
+    Run worlds replicates (seeds seed, seed + 1, ...) in batches of batch_size
+    and return their results in one get_results_df()-style frame. Very large
+    batches stop paying off once the stacked arrays outgrow the CPU caches.
+    """
+    frames = []
+    for first in range(0, worlds, batch_size):
+        seeds = range(seed + first, seed + min(worlds, first + batch_size))
+        df = Ensemble(seeds=seeds, **params).run(max_steps=max_steps).get_results_df()
+        df["World"] += first
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
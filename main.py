@@ -4,17 +4,64 @@ main.py - entrypoint for Void Breach.
 Usage:
     python main.py          # runs a headless simulation (short)
     python main.py --steps 200  # run 200 steps
+    python main.py --steps 100000 --stream-every 500 --agent-stride 50   # bounded memory
+    python main.py --sweep sweep.json --replicates 10   # parameter sweep on all cores
+    python main.py --sweep '{"native_vision": [3, 5]}' --workers 1   # serial, for debugging
+    python main.py --ensemble 1000 --steps 200   # 1000 replicates batched in one process
+    python main.py --tiled --workers 8 --width 2000 --height 2000   # one large map over 8 processes
+
+A sweep grid maps parameter names to lists of values. Any VoidBreachModel
+keyword can be swept, plus width/height/density_native/density_void as in
+run_headless. Each finished run is appended to one CSV (one row per step,
+with run_id, replicate, seed and the run's parameters as columns); re-running
+the same sweep (same grid, steps and --seed) skips run_ids already present in
+that file. A run is only counted once its rows are committed in <out>.done,
+so a run cut short by a crash is dropped from the CSV and redone.
+
+--ensemble runs replicates of one configuration through ensemble.Ensemble
+(array engine rules, seeds seed, seed + 1, ...) and writes one CSV with a
+World column in front of the get_results_df columns.
+
+--tiled runs one map cut into tiles, one worker process per tile
+(distributed.TiledWorld, array engine rules).
 """
 import argparse
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 from model import VoidBreachModel
+from profiler import REPORTERS
+from ensemble import run_ensemble
+from distributed import TiledWorld
+from storage.stream import ResultsSink
+
+def build_model(width=30, height=30, density_native=0.05, density_void=0.02, seed=None, **params):
+    return VoidBreachModel(width=width, height=height,
+                           initial_natives=int(width*height*density_native),
+                           initial_voidspawns=int(width*height*density_void),
+                           seed=seed, **params)
 
-def run_headless(steps=100, width=30, height=30, density_native=0.05, density_void=0.02):
-    model = VoidBreachModel(width=width, height=height,
-                            initial_natives=int(width*height*density_native),
-                            initial_voidspawns=int(width*height*density_void))
+def run_headless(steps=100, width=30, height=30, density_native=0.05, density_void=0.02, seed=None,
+                 stream_every=None, agent_stride=0):
+    """
+    Run one simulation. With stream_every, rows are appended to
+    data/simulation_results_model.csv every stream_every steps (plus agent
+    snapshots every agent_stride steps) and only the last rows are returned.
+    """
+    sink = None
+    if stream_every:
+        sink = ResultsSink("data/simulation_results", flush_every=stream_every, agent_stride=agent_stride)
+    model = build_model(width=width, height=height, density_native=density_native,
+                        density_void=density_void, seed=seed, results_sink=sink)
     for i in range(steps):
         model.step()
+    if sink is not None:
+        sink.close(model)
+        print(f"Streamed results to {sink.model_path}")
+        return sink.tail()
     # collect results saved by model.data_collector
     df = model.get_results_df()
     out = "data/simulation_results.csv"
@@ -22,6 +69,160 @@ def run_headless(steps=100, width=30, height=30, density_native=0.05, density_vo
     print(f"Saved results to {out}")
     return df
 
+# --- parameter sweeps ---
+def sweep_runs(grid, replicates=1, steps=100, base_seed=0):
+    """Expand grid x replicates into run specs with stable run_ids and seeds."""
+    names = sorted(grid)
+    runs = []
+    for values in itertools.product(*(grid[n] for n in names)):
+        params = dict(zip(names, values))
+        for rep in range(replicates):
+            key = json.dumps({"params": params, "replicate": rep, "steps": steps, "base_seed": base_seed},
+                             sort_keys=True)
+            run_id = hashlib.sha1(key.encode()).hexdigest()[:12]
+            # seed depends only on base_seed and the run, never on worker or completion order
+            seed = int(hashlib.sha1(f"{base_seed}:{run_id}".encode()).hexdigest()[:8], 16)
+            runs.append({"run_id": run_id, "replicate": rep, "seed": seed, "steps": steps, "params": params})
+    return runs
+
+def sweep_columns(grid):
+    """CSV columns of a sweep over grid; every run is written in this order."""
+    reporters = ["Natives", "Voidspawns"]
+    if any(grid.get("profile", ())):
+        # profiled runs add the tick-profiler reporters, the other runs leave them empty
+        reporters += list(REPORTERS)
+    return ["run_id", "replicate", "seed", "Step"] + reporters + sorted(grid)
+
+def run_one(spec):
+    """Run a single sweep entry and return its per-step results as a DataFrame."""
+    with build_model(seed=spec["seed"], **spec["params"]) as model:
+        for _ in range(spec["steps"]):
+            if not model.running:
+                break
+            model.step()
+        df = model.get_results_df()
+    df.insert(0, "seed", spec["seed"])
+    df.insert(0, "replicate", spec["replicate"])
+    df.insert(0, "run_id", spec["run_id"])
+    for name, value in spec["params"].items():
+        df[name] = value
+    return df
+
+def completed_runs(out):
+    """
+    run_ids whose rows are complete in out. Each append is committed by a
+    "<run_id> <end offset>" line in out.done once the rows are on disk, so
+    anything after the last committed offset (a run cut off by a crash) is
+    truncated here and that run is redone.
+    """
+    marker = f"{out}.done"
+    if not os.path.exists(out):
+        return set()
+    if not os.path.exists(marker):
+        # file written before completion markers: trust its run_ids
+        return set(pd.read_csv(out, usecols=["run_id"], dtype=str)["run_id"])
+    done, end = set(), None
+    with open(marker, "r+b") as f:
+        committed = 0
+        for line in f:
+            # a torn last line has no newline yet and is not a commit
+            if not line.endswith(b"\n"):
+                break
+            run_id, offset = line.decode().split()
+            done.add(run_id)
+            end = int(offset)
+            committed += len(line)
+        f.truncate(committed)
+    if end is None:
+        # not even the header was committed
+        os.remove(out)
+        os.remove(marker)
+        return set()
+    with open(out, "r+b") as f:
+        f.truncate(end)
+    done.discard("-")
+    return done
+
+def _append_run(out, text, run_id):
+    # rows first, durable, then the marker line that commits them
+    with open(out, "ab") as f:
+        f.write(text.encode())
+        f.flush()
+        os.fsync(f.fileno())
+        end = f.tell()
+    with open(f"{out}.done", "a") as f:
+        f.write(f"{run_id} {end}\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def sweep(grid, replicates=1, steps=100, base_seed=0, workers=None, out="data/sweep_results.csv"):
+    """
+    Run every grid combination x replicates and append each finished run to out.
+    workers=None uses every core; workers<=1 runs serially in this process.
+    """
+    runs = sweep_runs(grid, replicates=replicates, steps=steps, base_seed=base_seed)
+    columns = sweep_columns(grid)
+    done = completed_runs(out)
+    if os.path.exists(out) and list(pd.read_csv(out, nrows=0).columns) != columns:
+        raise ValueError(f"{out} holds a sweep with different columns; write this grid to another --out")
+    todo = [r for r in runs if r["run_id"] not in done]
+    print(f"Sweep: {len(runs)} runs, {len(runs) - len(todo)} already in {out}, {len(todo)} to go")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+
+    if not os.path.exists(out):
+        _append_run(out, pd.DataFrame(columns=columns).to_csv(index=False), "-")
+
+    def write(df):
+        extra = set(df.columns) - set(columns)
+        if extra:
+            raise ValueError(f"run produced columns outside the sweep schema: {sorted(extra)}")
+        _append_run(out, df.reindex(columns=columns).to_csv(index=False, header=False), df["run_id"].iloc[0])
+
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1:
+        for n, spec in enumerate(todo, 1):
+            write(run_one(spec))
+            print(f"[{n}/{len(todo)}] {spec['run_id']} {spec['params']}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_one, spec): spec for spec in todo}
+            for n, fut in enumerate(as_completed(futures), 1):
+                spec = futures[fut]
+                write(fut.result())
+                print(f"[{n}/{len(todo)}] {spec['run_id']} {spec['params']}")
+    return out
+
+def ensemble(worlds, steps=100, width=30, height=30, density_native=0.05, density_void=0.02, seed=None,
+             out="data/ensemble_results.csv"):
+    """Run worlds replicates batched in this process and write their series to out."""
+    df = run_ensemble(worlds, max_steps=steps, seed=seed or 0, width=width, height=height,
+                      initial_natives=int(width*height*density_native),
+                      initial_voidspawns=int(width*height*density_void))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    df.to_csv(out, index=False)
+    print(f"Saved {worlds} worlds to {out}")
+    return df
+
+def tiled(steps=100, width=30, height=30, density_native=0.05, density_void=0.02, seed=None, workers=None,
+          out="data/tiled_results.csv"):
+    """Run one map split over worker processes and write its series to out."""
+    with TiledWorld(width=width, height=height, initial_natives=int(width*height*density_native),
+                    initial_voidspawns=int(width*height*density_void), seed=seed or 0,
+                    workers=workers or os.cpu_count() or 1) as world:
+        df = world.run(max_steps=steps).get_results_df()
+        print(f"{world.workers} tiles ({world.tiles[0]}x{world.tiles[1]}), "
+              f"{world.field_rounds / max(1, world.steps):.1f} field exchange rounds per tick")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    df.to_csv(out, index=False)
+    print(f"Saved results to {out}")
+    return df
+
+def load_grid(arg):
+    if arg.lstrip().startswith("{"):
+        return json.loads(arg)
+    with open(arg) as f:
+        return json.load(f)
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--steps", type=int, default=100, help="Number of simulation steps")
@@ -29,10 +230,49 @@ def main():
     parser.add_argument("--height", type=int, default=30)
     parser.add_argument("--native-density", type=float, default=0.05)
     parser.add_argument("--void-density", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=None, help="Seed (base seed for sweeps)")
+    parser.add_argument("--stream-every", type=int, default=None, metavar="N",
+                        help="Append results to disk every N steps instead of keeping them in memory")
+    parser.add_argument("--agent-stride", type=int, default=0, metavar="K",
+                        help="With --stream-every, also snapshot agent positions every K steps")
+    parser.add_argument("--sweep", metavar="GRID", help="JSON file or inline JSON parameter grid")
+    parser.add_argument("--replicates", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Sweep processes or tiles (default: all cores, 1 = serial)")
+    parser.add_argument("--out", default=None, help="Sweep/ensemble/tiled CSV (default data/<mode>_results.csv)")
+    parser.add_argument("--ensemble", type=int, default=None, metavar="N",
+                        help="Run N replicates as one batched ensemble")
+    parser.add_argument("--tiled", action="store_true",
+                        help="Run one map split into tiles across --workers processes")
     args = parser.parse_args()
 
+    if args.ensemble:
+        df = ensemble(args.ensemble, steps=args.steps, width=args.width, height=args.height,
+                      density_native=args.native_density, density_void=args.void_density,
+                      seed=args.seed, out=args.out or "data/ensemble_results.csv")
+        print(df.groupby("World").tail(1).describe())
+        return
+
+    if args.tiled:
+        df = tiled(steps=args.steps, width=args.width, height=args.height,
+                   density_native=args.native_density, density_void=args.void_density,
+                   seed=args.seed, workers=args.workers, out=args.out or "data/tiled_results.csv")
+        print(df.tail())
+        return
+
+    if args.sweep:
+        grid = load_grid(args.sweep)
+        # command-line map settings apply unless the grid sweeps them
+        for name, value in (("width", args.width), ("height", args.height),
+                            ("density_native", args.native_density), ("density_void", args.void_density)):
+            grid.setdefault(name, [value])
+        sweep(grid, replicates=args.replicates, steps=args.steps, base_seed=args.seed or 0,
+              workers=args.workers, out=args.out or "data/sweep_results.csv")
+        return
+
     df = run_headless(steps=args.steps, width=args.width, height=args.height,
-                      density_native=args.native_density, density_void=args.void_density)
+                      density_native=args.native_density, density_void=args.void_density,
+                      seed=args.seed, stream_every=args.stream_every, agent_stride=args.agent_stride)
     print(df.tail())
 
 if __name__ == "__main__":
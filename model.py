@@ -1,8 +1,9 @@
 """
 model.py - Mesa model for Void Breach with fog-of-war (visibility) support.
 """
-import random
 import os
+from collections import deque
+import numpy as np
 from mesa import Model
 from mesa.space import MultiGrid
 from mesa.time import RandomActivation
@@ -13,12 +14,26 @@ from agents.obstacle import Obstacle
 from agents.native import Native
 from agents.voidspawn import Voidspawn
 from agents.rift import Rift
+from algorithms.astar import PathCache
+from algorithms.fields import distance_field
+from algorithms.hpa import HierarchicalPlanner
+from algorithms.qlearning import QPolicy
+from algorithms.spatial_index import SpatialHash
+from algorithms.visibility import stamp_squares, CellMask
+from profiler import TickProfiler, REPORTERS, make_reporter
+from population import PopulationArrays
+from scheduling import PlanCommitScheduler
+from storage.maps import load_map
+from storage.replay import ReplayRecorder
 
 # ensure data directory
 os.makedirs("data/logs", exist_ok=True)
 
 def count_agents(model, agent_type):
-    return sum(1 for a in model.schedule.agents if isinstance(a, agent_type))
+    # O(1): read the live per-type registry instead of scanning the schedule
+    if model.population is not None:
+        return int(model.population.count(agent_type.__name__)[0])
+    return len(model.registry.get(agent_type.__name__, ()))
 
 def count_natives(model): return count_agents(model, Native)
 def count_voidspawns(model): return count_agents(model, Voidspawn)
@@ -27,12 +42,36 @@ class VoidBreachModel(Model):
     def __init__(self, width=30, height=30, initial_natives=20, initial_voidspawns=5,
                  obstacle_fraction=0.05, seed=None,
                  native_vision=5, void_vision=6,
-                 rift_spawn_interval=30, rift_accelerate=True):
+                 rift_spawn_interval=30, rift_accelerate=True,
+                 pathfinding="layers", void_hunting="field", native_flee="field",
+                 hunt_in_vision=False, path_cache=True, profile=False,
+                 results_sink=None, populate=True, engine="objects",
+                 terrain_map=None, static_agents=False, agent_pool=False,
+                 search_horizon=None, native_policy=None, leaders=0,
+                 activation="random", planning_workers=None, replay_log=None):
         super().__init__()
+        if terrain_map is not None:
+            # authored map: a path for storage.maps.load_map or a (movement_cost, passable) pair
+            cost_layer, passable_layer = load_map(terrain_map) if isinstance(terrain_map, (str, os.PathLike)) else terrain_map
+            width, height = cost_layer.shape
+        # construction settings, kept so a checkpoint can rebuild an equivalent model
+        self.params = dict(width=width, height=height, native_vision=native_vision, void_vision=void_vision,
+                           rift_spawn_interval=rift_spawn_interval, rift_accelerate=rift_accelerate,
+                           pathfinding=pathfinding, void_hunting=void_hunting, native_flee=native_flee,
+                           hunt_in_vision=hunt_in_vision, path_cache=path_cache, profile=profile,
+                           engine=engine, static_agents=static_agents, agent_pool=agent_pool,
+                           search_horizon=search_horizon, leaders=leaders,
+                           activation=activation, planning_workers=planning_workers,
+                           native_policy=native_policy if isinstance(native_policy, (str, os.PathLike)) else None)
         if seed is not None:
-            random.seed(seed)
+            # all draws (setup, scheduling, agents) go through self.random so a seed fixes the run
+            self.reset_randomizer(seed)
         self.grid = MultiGrid(width, height, torus=False)
         self.schedule = RandomActivation(self)
+        # activation="simultaneous": each tick plans every move against the state at
+        # its start (A* plans on planning_workers processes), then commits them
+        self.activation = activation
+        self.plan_commit = PlanCommitScheduler(self, workers=planning_workers) if activation == "simultaneous" else None
         self.running = True
         self.width = width
         self.height = height
@@ -45,62 +84,210 @@ class VoidBreachModel(Model):
         self.rift_spawn_interval = rift_spawn_interval
         self.rift_accelerate = rift_accelerate
 
-        # sets for fog-of-war
-        self.visible_cells = set()    # cells visible this tick
-        self.explored_cells = set()   # cells seen at least once
+        # Pathfinding mode: "layers" reads the array-backed static map below,
+        # "grid" walks cell contents (slow, kept as a reference implementation)
+        self.pathfinding = pathfinding
 
-        # create terrain - uniform default with occasional high-cost tiles
-        self._create_terrain(default_cost=1.0, high_cost_prob=0.08, high_cost=3.0)
+        # static map layers indexed [x, y]; the layers are the map. With static_agents=True
+        # TerrainTile/Obstacle agents are also placed on the grid and kept in sync
+        # (needed by the "grid" pathfinding reference mode and the CanvasGrid portrayal)
+        self.static_agents = static_agents
+        if terrain_map is not None:
+            self.movement_cost, self.passable = cost_layer, passable_layer
+        else:
+            self.movement_cost = np.ones((width, height), dtype=np.float64)
+            self.passable = np.ones((width, height), dtype=bool)
+        # bumped on every terrain/obstacle change so cached views can be invalidated
+        self.map_version = 0
+        self._layer_lists = None
+        # bounded log of (map_version, pos, relaxed) for incremental path repair;
+        # relaxed=True when the cell became cheaper or passable
+        self.map_changes = deque(maxlen=4096)
 
-        # obstacles
-        num_cells = width * height
-        num_obstacles = int(num_cells * obstacle_fraction)
-        self._scatter_obstacles(num_obstacles)
+        # Voidspawn pursuit: "field" descends a shared hunt field built once per tick,
+        # "astar" runs one A* per predator towards its nearest Native,
+        # "hpa" plans on the hierarchical cluster graph (built on first use)
+        self.void_hunting = void_hunting
+        self.hpa = None
+        self._hunt_field = None
+        self._hunt_field_step = -1
+        self._hunt_field_epoch = -1
+        self._hunt_field_map = -1
+        # bumped whenever a Native moves or dies; tells the hunt field it is stale
+        self._native_epoch = 0
+
+        # Native fleeing: "field" climbs a shared threat field built once per tick,
+        # "sample" scores 16 candidate goals with one A* each,
+        # "policy" looks the move up in native_policy's Q-table
+        self.native_flee = native_flee
+        # shared Q-table (algorithms.qlearning.QPolicy, or the path of a saved one);
+        # the first `leaders` Natives placed use it under every flee mode
+        if isinstance(native_policy, (str, os.PathLike)):
+            native_policy = QPolicy.load(native_policy)
+        self.native_policy = native_policy
+        self._threat_field = None
+        self._threat_field_step = -1
+        self._threat_field_epoch = -1
+        self._threat_field_map = -1
+        # bumped whenever a Voidspawn moves, spawns or dies
+        self._void_epoch = 0
+
+        # per-agent path reuse/repair for A* pursuit (None disables it)
+        self.path_cache = PathCache(self) if path_cache else None
+
+        # optional storage.stream.ResultsSink: rows go to disk in chunks instead of piling up in memory
+        self.results_sink = results_sink
+        # optional storage.replay.ReplayRecorder (or its path): every collected tick is
+        # appended to a binary log that playback can seek without re-simulating
+        if isinstance(replay_log, (str, os.PathLike)):
+            replay_log = ReplayRecorder(replay_log)
+        self.replay = replay_log
+
+        # per-phase tick instrumentation. Its reporters join the DataCollector only with
+        # profile=True at construction; profiler.enabled can pause and resume such a
+        # model's timings, but a model built without profile never collects them
+        self.profiler = TickProfiler(enabled=profile)
+
+        # Voidspawns only see Natives within void_vision when True (global knowledge otherwise);
+        # under void_hunting="field" they then follow the shared field only towards a Native in sight
+        self.hunt_in_vision = hunt_in_vision
+
+        # bounds the Natives' sampled flee searches to a window of this radius
+        # around the agent ("vision" = its vision_range); None searches the whole map
+        self.search_horizon = search_horizon
+
+        # bucket-grid indexes for the mobile agents keyed by class name,
+        # updated by place/move/remove_agent
+        bucket = max(4, native_vision, void_vision)
+        self.spatial = {
+            "Native": SpatialHash(width, height, bucket_size=bucket),
+            "Voidspawn": SpatialHash(width, height, bucket_size=bucket),
+        }
+
+        # per-type registries of live scheduled agents (dicts used as ordered sets)
+        # plus cumulative spawn/kill counters, maintained by place/remove_agent
+        self.registry = {"Native": {}, "Voidspawn": {}, "Rift": {}}
+        self.spawns = 0
+        self.kills = 0
+
+        # schedule changes made while agents are stepping (spawns, kills) are
+        # queued and applied together by _commit_schedule() at the end of the tick
+        self._in_tick = False
+        self._pending_add = []
+        self._pending_remove = {}
+        # optional free lists of dead Natives/Voidspawns, reinitialized by spawn_agent()
+        self.agent_pool = {"Native": [], "Voidspawn": []} if agent_pool else None
+
+        # fog-of-war bitmaps indexed [x, y], combined and per faction
+        self.visible = np.zeros((width, height), dtype=bool)     # cells visible this tick
+        self.explored = np.zeros((width, height), dtype=bool)    # cells seen at least once
+        self.visible_by_faction = {cls: np.zeros((width, height), dtype=bool) for cls in ("Native", "Voidspawn")}
+        self.explored_by_faction = {cls: np.zeros((width, height), dtype=bool) for cls in ("Native", "Voidspawn")}
+        # set-like views kept for `(x, y) in model.visible_cells` callers
+        self.visible_cells = CellMask(self.visible)
+        self.explored_cells = CellMask(self.explored)
+
+        # Population engine: "objects" steps Mesa agents through the schedule,
+        # "arrays" keeps Natives/Voidspawns/Rifts in population.PopulationArrays
+        # (field policies only, no per-agent objects)
+        self.engine = engine
+        self.population = None
+
+        # Data collector
+        model_reporters = {"Natives": count_natives, "Voidspawns": count_voidspawns}
+        if profile:
+            model_reporters.update({label: make_reporter(key) for label, key in REPORTERS.items()})
+        self.data_collector = DataCollector(model_reporters=model_reporters)
+
+        if not populate:
+            # empty world with uniform terrain; storage.checkpoint fills in the rest
+            self._create_terrain(default_cost=1.0, high_cost_prob=0.0)
+            return
+
+        if terrain_map is not None:
+            # authored terrain and obstacles are used as they are
+            self._load_terrain()
+        else:
+            # create terrain - uniform default with occasional high-cost tiles
+            self._create_terrain(default_cost=1.0, high_cost_prob=0.08, high_cost=3.0)
+
+            # obstacles
+            num_cells = width * height
+            num_obstacles = int(num_cells * obstacle_fraction)
+            self._scatter_obstacles(num_obstacles)
+
+        if engine == "arrays":
+            self._populate_arrays(initial_natives, initial_voidspawns)
+            self.compute_visibility()
+            self._collect()
+            return
 
         # rifts (a few)
         for _ in range(max(1, int(initial_voidspawns/2))):
-            x = random.randrange(self.grid.width)
-            y = random.randrange(self.grid.height)
+            x = self.random.randrange(self.grid.width)
+            y = self.random.randrange(self.grid.height)
             rift = Rift((x, y), self, spawn_interval=self.rift_spawn_interval)
-            self.grid.place_agent(rift, (x, y))
-            self.schedule.add(rift)
+            self.place_agent(rift, (x, y))
 
         # place Voidspawns
         for _ in range(initial_voidspawns):
-            x = random.randrange(self.grid.width)
-            y = random.randrange(self.grid.height)
+            x = self.random.randrange(self.grid.width)
+            y = self.random.randrange(self.grid.height)
             vs = Voidspawn((x, y), self)
-            self.grid.place_agent(vs, (x, y))
-            self.schedule.add(vs)
+            self.place_agent(vs, (x, y))
 
         # place Natives
-        for _ in range(initial_natives):
-            x = random.randrange(self.grid.width)
-            y = random.randrange(self.grid.height)
-            nat = Native((x, y), self)
-            self.grid.place_agent(nat, (x, y))
-            self.schedule.add(nat)
-
-        # Data collector
-        self.data_collector = DataCollector(
-            model_reporters={"Natives": count_natives, "Voidspawns": count_voidspawns}
-        )
+        for i in range(initial_natives):
+            x = self.random.randrange(self.grid.width)
+            y = self.random.randrange(self.grid.height)
+            nat = Native((x, y), self, leader=i < leaders)
+            self.place_agent(nat, (x, y))
 
         # initial visibility computation
         self.compute_visibility()
         # initial collect
-        self.data_collector.collect(self)
+        self._collect()
+
+    def _populate_arrays(self, initial_natives, initial_voidspawns):
+        # same placement draws as the object engine, kept as positions only
+        def draw(n):
+            return [(self.random.randrange(self.width), self.random.randrange(self.height)) for _ in range(n)]
+        rifts = draw(max(1, int(initial_voidspawns/2)))
+        voids = draw(initial_voidspawns)
+        natives = draw(initial_natives)
+        rng = np.random.default_rng(self.random.getrandbits(64))
+        self.population = self._make_population(natives, voids, rifts, rng)
+
+    def _make_population(self, natives, voids, rifts, rng):
+        # single-world PopulationArrays over this model's layers (also used by storage.checkpoint)
+        return PopulationArrays(
+            self.movement_cost[None], self.passable[None], [natives], [voids], [rifts], rng,
+            native_vision=self.native_vision, void_vision=self.void_vision,
+            rift_spawn_interval=self.rift_spawn_interval, rift_accelerate=self.rift_accelerate,
+            model=self)
 
     def _create_terrain(self, default_cost=1.0, high_cost_prob=0.08, high_cost=3.0):
-        """Place TerrainTile objects on every cell with movement_cost attribute."""
-        for x in range(self.grid.width):
-            for y in range(self.grid.height):
-                cost = default_cost
-                if self.random.random() < high_cost_prob:
-                    cost = high_cost
-                terrain = TerrainTile((x, y), self, movement_cost=cost)
-                self.grid.place_agent(terrain, (x, y))
-                # Not scheduling terrain (they are static), but they exist on grid cell.
+        """Fill the movement_cost layer (and TerrainTile agents when static_agents is on)."""
+        # one draw per cell in x-major order, as the per-tile loop always did, so seeds keep their maps
+        draws = np.array([self.random.random() for _ in range(self.width * self.height)]).reshape(self.width, self.height)
+        self.movement_cost[:] = np.where(draws < high_cost_prob, high_cost, default_cost)
+        if self.static_agents:
+            self._place_static_agents()
+        self.map_version += 1
+
+    def _load_terrain(self):
+        # terrain_map layers are already in place
+        if self.static_agents:
+            self._place_static_agents()
+        self.map_version += 1
+
+    def _place_static_agents(self):
+        # TerrainTile/Obstacle agents mirroring the layers (not scheduled, they are static)
+        for x in range(self.width):
+            for y in range(self.height):
+                self.grid.place_agent(TerrainTile((x, y), self, movement_cost=self.movement_cost[x, y]), (x, y))
+                if not self.passable[x, y]:
+                    self.grid.place_agent(Obstacle((x, y), self), (x, y))
 
     def _scatter_obstacles(self, num_obstacles):
         placed = 0
@@ -108,48 +295,317 @@ class VoidBreachModel(Model):
         while placed < num_obstacles and attempts < num_obstacles * 10:
             x = self.random.randrange(self.grid.width)
             y = self.random.randrange(self.grid.height)
-            # check if only terrain exists at that cell (no obstacle already)
-            cell = self.grid.get_cell_list_contents((x, y))
-            if not any(isinstance(a, Obstacle) for a in cell):
-                obs = Obstacle((x, y), self)
-                self.grid.place_agent(obs, (x, y))
+            # check the passability layer instead of scanning the cell for an Obstacle
+            if self.passable[x, y]:
+                self.add_obstacle((x, y))
                 # obstacles can be scheduled if you want them dynamic; here they are static
                 placed += 1
             attempts += 1
 
+    # --- static map layer maintenance ---
+    def add_obstacle(self, pos):
+        """Mark the cell impassable (placing an Obstacle agent when static_agents is on)."""
+        obs = None
+        if self.static_agents:
+            obs = Obstacle(pos, self)
+            self.grid.place_agent(obs, pos)
+        self.passable[pos] = False
+        self._map_changed(pos, relaxed=False)
+        return obs
+
+    def remove_obstacle(self, pos):
+        """Remove any Obstacle at pos and mark the cell passable again."""
+        if self.static_agents:
+            for a in self.grid.get_cell_list_contents(pos):
+                if isinstance(a, Obstacle):
+                    self.grid.remove_agent(a)
+        self.passable[pos] = True
+        self._map_changed(pos, relaxed=True)
+
+    def set_terrain_cost(self, pos, cost):
+        """Change the movement cost of the cell at pos."""
+        if self.static_agents:
+            for a in self.grid.get_cell_list_contents(pos):
+                if isinstance(a, TerrainTile):
+                    a.movement_cost = float(cost)
+        relaxed = float(cost) < self.movement_cost[pos]
+        self.movement_cost[pos] = float(cost)
+        self._map_changed(pos, relaxed=relaxed)
+
+    def _map_changed(self, pos, relaxed):
+        self.map_version += 1
+        self.map_changes.append((self.map_version, tuple(pos), relaxed))
+
+    def static_layers(self):
+        """
+        Return (movement_cost, passable) as nested Python lists indexed [x][y].
+        Plain lists are much cheaper than NumPy scalar indexing inside the A* loop;
+        the copy is rebuilt only when map_version changes.
+        """
+        if self._layer_lists is None or self._layer_lists[0] != self.map_version:
+            self._layer_lists = (self.map_version, self.movement_cost.tolist(), self.passable.tolist())
+        return self._layer_lists[1], self._layer_lists[2]
+
+    # --- mobile agent bookkeeping ---
+    def _touch(self, agent):
+        # invalidate the shared field that depends on this agent's position
+        if isinstance(agent, Native):
+            self._native_epoch += 1
+        elif isinstance(agent, Voidspawn):
+            self._void_epoch += 1
+
+    def spawn_agent(self, cls, pos, **kwargs):
+        """
+        New cls agent for pos with a fresh integer id; with agent_pool on, a dead
+        instance of cls is reinitialized instead of allocating one. Place it with place_agent.
+        """
+        pool = self.agent_pool.get(cls.__name__) if self.agent_pool is not None else None
+        if pool:
+            agent = pool.pop()
+            agent.__dict__.clear()
+            agent.__init__(pos, self, **kwargs)
+            return agent
+        return cls(pos, self, **kwargs)
+
+    def place_agent(self, agent, pos):
+        """Put a new scheduled agent on the grid (setup and Rift spawns)."""
+        self.grid.place_agent(agent, pos)
+        if self._in_tick:
+            self._pending_add.append(agent)
+        else:
+            self.schedule.add(agent)
+        cls = agent.__class__.__name__
+        self.registry.setdefault(cls, {})[agent] = None
+        if self._in_tick and cls == "Voidspawn":
+            # placed during a tick -> spawned by a Rift
+            self.spawns += 1
+        index = self.spatial.get(cls)
+        if index is not None:
+            index.insert(agent, pos)
+        self._touch(agent)
+
+    def move_agent(self, agent, pos):
+        """Move a mobile agent on the grid, keeping derived state in sync."""
+        self.grid.move_agent(agent, pos)
+        index = self.spatial.get(agent.__class__.__name__)
+        if index is not None:
+            index.move(agent, pos)
+        self._touch(agent)
+
+    def remove_agent(self, agent):
+        """
+        Remove a killed agent. It leaves the grid, registry and spatial index at
+        once; the schedule (and the agent pool) only at the end of the tick.
+        """
+        cls = agent.__class__.__name__
+        registered = self.registry.get(cls, {})
+        if agent not in registered:
+            return
+        del registered[agent]
+        if cls == "Native":
+            self.kills += 1
+        if agent.pos is not None:
+            self.grid.remove_agent(agent)
+        index = self.spatial.get(cls)
+        if index is not None:
+            index.remove(agent)
+        if self.path_cache is not None:
+            self.path_cache.forget(agent)
+        if self.hpa is not None:
+            self.hpa.forget(agent)
+        self._touch(agent)
+        self._pending_remove[agent] = None
+        if not self._in_tick:
+            self._commit_schedule()
+
+    def _commit_schedule(self):
+        """Apply the schedule adds/removes queued during the tick and recycle the dead."""
+        removed = self._pending_remove
+        for agent in self._pending_add:
+            if agent not in removed:
+                self.schedule.add(agent)
+        for agent in removed:
+            try:
+                self.schedule.remove(agent)
+            except KeyError:
+                pass  # spawned and killed within the same tick: never scheduled
+            # drop the model's hard reference so the dead agent can be freed (or pooled)
+            agent.remove()
+            pool = self.agent_pool.get(agent.__class__.__name__) if self.agent_pool is not None else None
+            if pool is not None:
+                pool.append(agent)
+        self._pending_add = []
+        self._pending_remove = {}
+
+    # --- spatial queries ---
+    def nearest_agent(self, agent_type, pos, max_dist=None):
+        """Nearest agent of agent_type ("Native"/"Voidspawn") to pos (Manhattan), optionally within max_dist."""
+        return self.spatial[agent_type].nearest(pos, max_dist=max_dist)
+
+    def agents_within(self, agent_type, pos, radius):
+        """Agents of agent_type within Manhattan distance radius of pos."""
+        return self.spatial[agent_type].within(pos, radius)
+
+    def hunt_field(self):
+        """
+        Shared pursuit field: cost from every cell to the nearest Native.
+        Rebuilt at most once per tick, and only if some Native moved or died
+        since the last build; a map edit makes it stale at once.
+        """
+        stale = self._hunt_field_epoch != self._native_epoch
+        if (self._hunt_field is None or self._hunt_field_map != self.map_version
+                or (stale and self._hunt_field_step != self.schedule.steps)):
+            self._hunt_field = distance_field(self, self.spatial["Native"].positions())
+            self._hunt_field_step = self.schedule.steps
+            self.profiler.add("field_builds", 1)
+            self._hunt_field_epoch = self._native_epoch
+            self._hunt_field_map = self.map_version
+        return self._hunt_field
+
+    def threat_field(self):
+        """
+        Shared flee field: cost for the nearest Voidspawn to reach every cell.
+        Rebuilt at most once per tick, and only if some Voidspawn moved,
+        spawned or died since the last build; a map edit makes it stale at once.
+        """
+        stale = self._threat_field_epoch != self._void_epoch
+        if (self._threat_field is None or self._threat_field_map != self.map_version
+                or (stale and self._threat_field_step != self.schedule.steps)):
+            self._threat_field = distance_field(self, self.spatial["Voidspawn"].positions(), outward=True)
+            self._threat_field_step = self.schedule.steps
+            self.profiler.add("field_builds", 1)
+            self._threat_field_epoch = self._void_epoch
+            self._threat_field_map = self.map_version
+        return self._threat_field
+
+    def hierarchical_planner(self):
+        """The model's HierarchicalPlanner, built on first use; it follows map edits by itself."""
+        if self.hpa is None:
+            self.hpa = HierarchicalPlanner(self)
+        return self.hpa
+
     def compute_visibility(self):
-        """Compute visible cells (radius-based) and update explored_cells."""
-        visible = set()
-        # consider Natives and Voidspawns as vision sources
-        for a in self.schedule.agents:
-            cls = a.__class__.__name__
-            if cls == "Native":
-                vr = getattr(a, "vision_range", self.native_vision)
-            elif cls == "Voidspawn":
-                vr = getattr(a, "vision_range", self.void_vision)
-            else:
-                continue
-            (ax, ay) = a.pos
-            # square / Chebyshev neighborhood for vision
-            x0 = max(0, ax - vr)
-            x1 = min(self.width - 1, ax + vr)
-            y0 = max(0, ay - vr)
-            y1 = min(self.height - 1, ay + vr)
-            for x in range(x0, x1 + 1):
-                for y in range(y0, y1 + 1):
-                    visible.add((x, y))
-        self.visible_cells = visible
-        # update explored set
-        self.explored_cells.update(visible)
+        """Stamp every agent's vision square into the visible masks and OR them into explored."""
+        self.visible[:] = False
+        if self.population is not None:
+            for cls, masks in self.population.visibility().items():
+                self.visible_by_faction[cls][:] = masks[0]
+                self.explored_by_faction[cls] |= masks[0]
+                self.visible |= masks[0]
+            self.explored |= self.visible
+            return
+        for cls, default_vr in (("Native", self.native_vision), ("Voidspawn", self.void_vision)):
+            agents = self.registry[cls]
+            xs = [a.pos[0] for a in agents]
+            ys = [a.pos[1] for a in agents]
+            radii = [getattr(a, "vision_range", default_vr) for a in agents]
+            mask = stamp_squares(self.width, self.height, xs, ys, radii)
+            self.visible_by_faction[cls][:] = mask
+            self.explored_by_faction[cls] |= mask
+            self.visible |= mask
+        # update explored in place
+        self.explored |= self.visible
 
     def step(self):
-        self.schedule.step()
-        # after agents moved / acted, recompute visibility for next draw
-        self.compute_visibility()
-        self.data_collector.collect(self)
+        if self.profiler.enabled:
+            self._profiled_step()
+        else:
+            self._step_agents()
+            # after agents moved / acted, recompute visibility for next draw
+            self.compute_visibility()
+            self._collect()
         # stop condition: no natives or no voidspawns
         if count_natives(self) == 0 or count_voidspawns(self) == 0:
             self.running = False
+            if self.results_sink is not None:
+                self.results_sink.flush(self)
+            if self.replay is not None:
+                self.replay.flush()
+            if self.plan_commit is not None:
+                # no more ticks to plan: let the planning processes go
+                self.plan_commit.close()
+
+    def _profiled_step(self):
+        # same phases as step(), timed; agent steps are charged to their type
+        prof = self.profiler
+        prof.begin_tick()
+        spawns, kills = self.spawns, self.kills
+        with prof.phase("agents_ms"):
+            if self.population is not None or self.plan_commit is not None:
+                self._step_agents()
+            elif hasattr(self.schedule, "do_each"):
+                self._in_tick = True
+                try:
+                    self.schedule.do_each(prof.timed_step, shuffle=True)
+                finally:
+                    self._in_tick = False
+                    self._commit_schedule()
+                self.schedule.steps += 1
+                self.schedule.time += 1
+            else:
+                self._step_agents()
+        with prof.phase("visibility_ms"):
+            self.compute_visibility()
+        prof.add("spawns", self.spawns - spawns)
+        prof.add("kills", self.kills - kills)
+        prof.end_tick()
+        t = prof.now()
+        self._collect()
+        prof.record_collect((prof.now() - t) * 1000.0)
+
+    def _step_agents(self):
+        if self.population is None:
+            self._in_tick = True
+            try:
+                if self.plan_commit is not None:
+                    self.plan_commit.step()
+                else:
+                    self.schedule.step()
+            finally:
+                self._in_tick = False
+                self._commit_schedule()
+            if self.plan_commit is not None:
+                self.schedule.steps += 1
+                self.schedule.time += 1
+            return
+        spawned, killed = self.population.step()
+        self.spawns += int(spawned[0])
+        self.kills += int(killed[0])
+        self.schedule.steps += 1
+        self.schedule.time += 1
+
+    def _collect(self):
+        self.data_collector.collect(self)
+        if self.results_sink is not None:
+            self.results_sink.collect(self)
+        if self.replay is not None:
+            self.replay.record(self)
+
+    def close(self):
+        """
+        Release what the model holds outside this process: the planning pool,
+        unflushed sink rows and the replay log's files. The pool is restarted
+        and the replay log reopened for appending if the model steps again.
+        Also available as `with VoidBreachModel(...) as model:`.
+        """
+        if self.plan_commit is not None:
+            self.plan_commit.close()
+        if self.results_sink is not None:
+            self.results_sink.flush(self)
+        if self.replay is not None:
+            self.replay.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-    def get_results_df(self):
+    def get_results_df(self, chunksize=None):
+        """
+        Model-level results with a Step column. With a results sink they are read
+        back from disk (as an iterator of DataFrames when chunksize is given).
+        """
+        if self.results_sink is not None:
+            return self.results_sink.read_model(chunksize=chunksize)
         return self.data_collector.get_model_vars_dataframe().reset_index().rename(columns={"index": "Step"})
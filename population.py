@@ -0,0 +1,233 @@
+"""
+population.py - struct-of-arrays population engine (VoidBreachModel engine="arrays").
+
+Natives, Voidspawns and Rifts are stored as NumPy position / state / alive
+arrays instead of Mesa agents, and each tick runs as a handful of batched
+array operations:
+
+  1. Rifts count down and spawn Voidspawns (newborns act from the next tick).
+  2. About half of the Natives, picked at random, flee first, climbing the
+     threat field.
+  3. Voidspawns attack a Native within attack_range. If two pick the same
+     Native, one of them (chosen at random) gets the kill. The rest step down
+     the hunt field.
+  4. The remaining Natives flee, using the same threat field.
+
+Splitting the Natives around the Voidspawn phase approximates the object
+engine's RandomActivation interleaving, so population dynamics match in
+distribution rather than draw for draw. The policies are the object engine's
+field policies (void_hunting="field", native_flee="field"); A*/sampling modes
+and hunt_in_vision are not available here.
+
+All state has a leading world dimension B; the model uses B=1 and the
+ensemble runner stacks many worlds.
+"""
+import numpy as np
+
+from algorithms.fields import distance_field
+from algorithms.vectorized import (distance_fields, sources_mask, downhill_moves, uphill_moves,
+                                   random_moves, stamp_squares_batched)
+
+# attack check order: own cell, then the 4-neighbourhood (Manhattan distance <= 1)
+_ATTACK_OFFSETS = np.array([(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int64)
+
+def _pad_positions(per_world, capacity=None):
+    B = len(per_world)
+    n = max([len(p) for p in per_world] + [0])
+    cap = max(n, capacity or 0, 1)
+    pos = np.zeros((B, cap, 2), dtype=np.int64)
+    alive = np.zeros((B, cap), dtype=bool)
+    for b, p in enumerate(per_world):
+        if len(p):
+            pos[b, :len(p)] = np.asarray(p, dtype=np.int64)
+            alive[b, :len(p)] = True
+    return pos, alive
+
+# per-agent / per-world state, in the order select() and checkpoints handle it
+STATE_ARRAYS = ("native_pos", "native_alive", "void_pos", "void_alive", "void_count", "void_newborn",
+                "rift_pos", "rift_alive", "rift_tick", "rift_interval", "active", "kills", "spawns")
+
+class PopulationArrays:
+    """
+    cost, passable: (B, W, H) static layers (views of the model's layers for B=1)
+    natives, voids, rifts: per-world lists of (x, y) positions
+    model: optional single-world model; its Dijkstra fields replace the sweeps
+           when the map is obstacle-heavy
+    """
+    def __init__(self, cost, passable, natives, voids, rifts, rng,
+                 native_vision=5, void_vision=6, rift_spawn_interval=30, rift_accelerate=True,
+                 min_interval=5, attack_range=1, model=None):
+        self.cost = cost
+        self.passable = passable
+        self.shape = cost.shape
+        self.rng = rng
+        self.native_vision = native_vision
+        self.void_vision = void_vision
+        self.rift_accelerate = rift_accelerate
+        self.min_interval = min_interval
+        self.attack_range = attack_range
+        self.model = model
+        B = self.shape[0]
+
+        self.native_pos, self.native_alive = _pad_positions(natives)
+        self.void_pos, self.void_alive = _pad_positions(voids, capacity=64)
+        self.void_count = np.array([len(v) for v in voids], dtype=np.int64)
+        self.void_newborn = np.zeros_like(self.void_alive)
+        self.rift_pos, self.rift_alive = _pad_positions(rifts)
+        self.rift_tick = np.zeros(self.rift_alive.shape, dtype=np.int64)
+        self.rift_interval = np.full(self.rift_alive.shape, rift_spawn_interval, dtype=np.int64)
+
+        # worlds that still step (the ensemble freezes finished ones)
+        self.active = np.ones(B, dtype=bool)
+        self.kills = np.zeros(B, dtype=np.int64)
+        self.spawns = np.zeros(B, dtype=np.int64)
+
+    def select(self, worlds):
+        """Keep only the given worlds (indices along the leading dimension), in that order."""
+        for name in ("cost", "passable") + STATE_ARRAYS:
+            setattr(self, name, getattr(self, name)[worlds])
+        self.shape = self.cost.shape
+
+    # --- queries ---
+    def count(self, kind):
+        """Per-world live counts for "Native", "Voidspawn" or "Rift"."""
+        alive = {"Native": self.native_alive, "Voidspawn": self.void_alive, "Rift": self.rift_alive}[kind]
+        return alive.sum(axis=1)
+
+    def slots(self, kind, world=0):
+        """(positions, alive) arrays of one world; slot indices are stable for an agent's lifetime."""
+        pos, alive = {"Native": (self.native_pos, self.native_alive),
+                      "Voidspawn": (self.void_pos, self.void_alive),
+                      "Rift": (self.rift_pos, self.rift_alive)}[kind]
+        return pos[world], alive[world]
+
+    def positions(self, kind, world=0):
+        """(n, 2) positions of the live agents of one world."""
+        pos, alive = self.slots(kind, world)
+        return pos[alive]
+
+    def visibility(self):
+        """Per-faction (B, W, H) visible masks."""
+        return {
+            "Native": stamp_squares_batched(self.shape, self.native_pos, self.native_alive, self.native_vision),
+            "Voidspawn": stamp_squares_batched(self.shape, self.void_pos, self.void_alive, self.void_vision),
+        }
+
+    def _field(self, pos, alive, outward):
+        if self.model is not None and self.passable.mean() < 0.85:
+            # single obstacle-heavy world: sweeps need many rounds to wind around
+            # walls, so the heap Dijkstra is faster there
+            sources = [tuple(p) for p in pos[0][alive[0]].tolist()]
+            self.model.profiler.add("field_builds", 1)
+            return np.asarray(distance_field(self.model, sources, outward=outward), dtype=np.float64)[None]
+        return distance_fields(self.cost, self.passable, sources_mask(self.shape, pos, alive), outward=outward)
+
+    # --- tick ---
+    def step(self):
+        """Advance every active world by one tick; returns (spawns, kills) per world."""
+        act = self.active
+        spawned = self._step_rifts(act)
+
+        early = self.rng.random(self.native_alive.shape) < 0.5
+        threat = self._field(self.void_pos, self.void_alive, outward=True)
+        self._flee(threat, self.native_alive & act[:, None] & early)
+
+        killed = self._step_voids(act)
+
+        self._flee(threat, self.native_alive & act[:, None] & ~early)
+        self.spawns += spawned
+        self.kills += killed
+        return spawned, killed
+
+    def _step_rifts(self, act):
+        live = self.rift_alive & act[:, None]
+        self.rift_tick += live
+        due = live & (self.rift_tick >= self.rift_interval)
+        self.rift_tick[due] = 0
+        if self.rift_accelerate:
+            faster = due & (self.rift_interval > self.min_interval)
+            self.rift_interval[faster] = np.maximum(self.min_interval, self.rift_interval[faster] - 1)
+
+        self.void_newborn[:] = False
+        per_world = due.sum(axis=1)
+        if per_world.any():
+            need = int((self.void_count + per_world).max())
+            if need > self.void_pos.shape[1]:
+                self._grow_voids(need)
+            b, r = np.nonzero(due)
+            # slot for each spawn: the world's fill pointer plus its rank among that world's spawns
+            rank = np.arange(b.size) - np.searchsorted(b, b)
+            slot = self.void_count[b] + rank
+            self.void_pos[b, slot] = self.rift_pos[b, r]
+            self.void_alive[b, slot] = True
+            self.void_newborn[b, slot] = True
+            self.void_count += per_world
+        return per_world
+
+    def _grow_voids(self, need):
+        cap = max(need, 2 * self.void_pos.shape[1])
+        B = self.shape[0]
+        for name in ("void_pos", "void_alive", "void_newborn"):
+            old = getattr(self, name)
+            new = np.zeros((B, cap) + old.shape[2:], dtype=old.dtype)
+            new[:, :old.shape[1]] = old
+            setattr(self, name, new)
+
+    def _flee(self, threat, movers):
+        if not movers.any():
+            return
+        B = self.shape[0]
+        bi = np.arange(B)[:, None]
+        here = threat[bi, self.native_pos[:, :, 0], self.native_pos[:, :, 1]]
+        up, _ = uphill_moves(threat, self.passable, self.native_pos, self.rng)
+        wander = random_moves(self.shape, self.native_pos, self.rng)
+        # no predator can reach this cell (or there are none): wander
+        new = np.where(np.isinf(here)[..., None], wander, up)
+        self.native_pos = np.where(movers[..., None], new, self.native_pos)
+
+    def _step_voids(self, act):
+        B, W, H = self.shape
+        hunters = self.void_alive & act[:, None] & ~self.void_newborn
+        killed = np.zeros(B, dtype=np.int64)
+        if not hunters.any():
+            return killed
+
+        # which Native (if any) sits at each cell
+        native_at = np.full(self.shape, -1, dtype=np.int64)
+        b, n = np.nonzero(self.native_alive)
+        native_at[b, self.native_pos[b, n, 0], self.native_pos[b, n, 1]] = n
+
+        # first Native within attack range of each Voidspawn
+        offsets = _ATTACK_OFFSETS if self.attack_range == 1 else _manhattan_offsets(self.attack_range)
+        tx = self.void_pos[:, :, None, 0] + offsets[None, None, :, 0]
+        ty = self.void_pos[:, :, None, 1] + offsets[None, None, :, 1]
+        inside = (tx >= 0) & (tx < W) & (ty >= 0) & (ty < H)
+        cand = np.where(inside, native_at[np.arange(B)[:, None, None], np.clip(tx, 0, W - 1), np.clip(ty, 0, H - 1)], -1)
+        has = cand >= 0
+        target = np.where(has.any(axis=2), np.take_along_axis(cand, has.argmax(axis=2)[..., None], axis=2)[..., 0], -1)
+        attackers = hunters & (target >= 0)
+
+        # one kill per Native: a random attacker wins, the others keep hunting
+        wins = np.zeros_like(attackers)
+        ab, av = np.nonzero(attackers)
+        if ab.size:
+            order = self.rng.permutation(ab.size)
+            key = ab[order] * self.native_alive.shape[1] + target[ab[order], av[order]]
+            _, first = np.unique(key, return_index=True)
+            winners = order[first]
+            wins[ab[winners], av[winners]] = True
+            self.native_alive[ab[winners], target[ab[winners], av[winners]]] = False
+            killed = np.bincount(ab[winners], minlength=B)
+
+        movers = hunters & ~wins
+        if movers.any():
+            hunt = self._field(self.native_pos, self.native_alive, outward=False)
+            down, ok = downhill_moves(hunt, self.cost, self.passable, self.void_pos)
+            wander = random_moves(self.shape, self.void_pos, self.rng)
+            new = np.where(ok[..., None], down, wander)
+            self.void_pos = np.where(movers[..., None], new, self.void_pos)
+        return killed
+
+def _manhattan_offsets(r):
+    return np.array([(dx, dy) for dx in range(-r, r + 1) for dy in range(-r, r + 1)
+                     if abs(dx) + abs(dy) <= r], dtype=np.int64)
@@ -0,0 +1,95 @@
+"""
+profiler.py - low-overhead per-tick instrumentation for VoidBreachModel.
+
+When enabled, the model records for every tick:
+  - wall time per phase (agent stepping, visibility, data collection)
+  - wall time spent in each agent type's step()
+  - A* calls and nodes expanded, distance-field builds
+  - Voidspawns spawned and Natives killed
+The tick's numbers are exposed through model reporters (see REPORTERS)
+so they are collected and charted next to the population counts. Data
+collection runs after the tick is closed, so "Collect ms" in row t is the
+collection cost of tick t-1 and "Tick ms" excludes it.
+
+The reporters are registered when the model is built with profile=True,
+and only then: the results schema is fixed at construction. Setting
+model.profiler.enabled afterwards pauses or resumes the timings of such
+a model (paused ticks repeat the last values), while turning it on for a
+model built without profile times ticks that never reach get_results_df().
+"""
+import time
+
+# reporter label -> key in TickProfiler.last
+REPORTERS = {
+    "Tick ms": "tick_ms",
+    "Agents ms": "agents_ms",
+    "Native ms": "Native_ms",
+    "Voidspawn ms": "Voidspawn_ms",
+    "Rift ms": "Rift_ms",
+    "Visibility ms": "visibility_ms",
+    "Collect ms": "collect_ms",
+    "A* calls": "astar_calls",
+    "A* nodes": "astar_nodes",
+    "Field builds": "field_builds",
+    "Spawns": "spawns",
+    "Kills": "kills",
+}
+
+class TickProfiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        # counters for the tick in progress
+        self.current = {}
+        # finished counters of the last complete tick (read by the reporters)
+        self.last = {key: 0 for key in REPORTERS.values()}
+        self._clock = time.perf_counter
+        self._collect_ms = 0
+
+    def begin_tick(self):
+        self.current = {key: 0 for key in REPORTERS.values()}
+        self.current["collect_ms"] = self._collect_ms
+        self._t0 = self._clock()
+
+    def end_tick(self):
+        # publish the tick to the reporters
+        self.current["tick_ms"] = (self._clock() - self._t0) * 1000.0
+        self.last = self.current
+
+    def record_collect(self, ms):
+        # reported with the next tick, since this tick's row is already collected
+        self._collect_ms = ms
+
+    def add(self, key, value):
+        if self.enabled and self.current:
+            self.current[key] = self.current.get(key, 0) + value
+
+    def timed_step(self, agent):
+        """Call agent.step() and charge its wall time to the agent's type."""
+        t = self._clock()
+        agent.step()
+        key = agent.__class__.__name__ + "_ms"
+        self.current[key] = self.current.get(key, 0) + (self._clock() - t) * 1000.0
+
+    def phase(self, key):
+        return _Phase(self, key)
+
+    def now(self):
+        return self._clock()
+
+def make_reporter(key):
+    def reporter(model):
+        return model.profiler.last.get(key, 0)
+    return reporter
+
+class _Phase:
+    __slots__ = ("profiler", "key", "t")
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+
+    def __enter__(self):
+        self.t = self.profiler._clock()
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.key, (self.profiler._clock() - self.t) * 1000.0)
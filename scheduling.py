@@ -0,0 +1,254 @@
+"""
+scheduling.py - plan/commit (simultaneous) activation for VoidBreachModel.
+
+Under RandomActivation each agent moves or kills as soon as it steps, so the
+agents stepping after it see a changed world, and the A* searches in
+Native.step / Voidspawn.step must run one after another. With
+activation="simultaneous" every tick is split in two:
+
+  plan    Every Native and Voidspawn decides its action (Agent.plan) against the
+          state at the start of the tick. Nothing is changed in this phase.
+          Agents whose planning is an A* search (native_flee="sample",
+          void_hunting="astar") plan against a PlanningView: positions
+          snapshot + static layers. With planning_workers > 1 those plans
+          are spread over a process pool; the remaining policies are O(1) per
+          agent and are planned in this process.
+  commit  Plans are applied in an order shuffled with the tick's RNG:
+            1. attacks. The first Voidspawn (in commit order) to attack a
+               Native kills it; later attackers of the same Native do nothing
+               this tick.
+            2. moves of the survivors. The first mover claims its target cell;
+               later movers into the same cell stay where they are.
+            3. Rifts count down and spawn; newborns act from the next tick.
+
+Every agent draws from its own RNG, seeded from (tick seed, unique_id),
+and the tick seed comes from model.random. A seeded run therefore gives the
+same result for any number of planning workers, including none. It is a
+different run from activation="random" with the same seed. Searches made by
+pool workers are not counted by the tick profiler, and they do not use the
+model's path cache.
+
+    model = VoidBreachModel(void_hunting="astar", native_flee="sample",
+                            activation="simultaneous", planning_workers=4)
+"""
+import random
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+from agents.native import Native
+from agents.voidspawn import Voidspawn
+from algorithms.spatial_index import SpatialHash
+
+# model attributes the agents' plan() reads, copied into every PlanningView
+VIEW_SETTINGS = ("pathfinding", "search_horizon", "hunt_in_vision", "void_hunting", "native_flee",
+                 "native_vision", "void_vision")
+# per-agent attributes a planning worker needs besides unique_id and pos
+AGENT_ATTRS = ("vision_range", "leader", "attack_range")
+AGENT_CLASSES = {"Native": Native, "Voidspawn": Voidspawn}
+
+class _Ghost:
+    # spatial-index entry for an agent in a snapshot
+    __slots__ = ("unique_id", "pos")
+
+    def __init__(self, unique_id, pos):
+        self.unique_id = unique_id
+        self.pos = pos
+
+class _Neighbourhoods:
+    # MultiGrid.get_neighborhood (non-torus, radius 1) without the grid
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def get_neighborhood(self, pos, moore, include_center=False):
+        x, y = pos
+        cells = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                if (dx == 0 and dy == 0 and not include_center) or (not moore and dx and dy):
+                    continue
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height:
+                    cells.append((nx, ny))
+        return tuple(cells)
+
+class PlanningView:
+    """
+    Read-only stand-in for the model during planning: static layers, the
+    model's planning settings and spatial indexes over a positions snapshot.
+    Provides the parts of the model interface that Agent.plan uses.
+    """
+    def __init__(self, settings, movement_cost, passable):
+        for name, value in settings.items():
+            setattr(self, name, value)
+        self.width, self.height = movement_cost.shape
+        self.movement_cost = movement_cost
+        self.passable = passable
+        self._layers = (movement_cost.tolist(), passable.tolist())
+        self.static_agents = False
+        self.path_cache = None
+        self.native_policy = None
+        self.profiler = None
+        self.grid = _Neighbourhoods(self.width, self.height)
+        self.spatial = {}
+
+    def load(self, snapshot):
+        """snapshot: {"Native"/"Voidspawn": [(unique_id, x, y), ...]} in the model's registry order."""
+        bucket = max(4, self.native_vision, self.void_vision)
+        for cls, rows in snapshot.items():
+            index = SpatialHash(self.width, self.height, bucket_size=bucket)
+            for uid, x, y in rows:
+                ghost = _Ghost(uid, (x, y))
+                index.insert(ghost, ghost.pos)
+            self.spatial[cls] = index
+
+    def static_layers(self):
+        return self._layers
+
+    def nearest_agent(self, agent_type, pos, max_dist=None):
+        return self.spatial[agent_type].nearest(pos, max_dist=max_dist)
+
+    def agents_within(self, agent_type, pos, radius):
+        return self.spatial[agent_type].within(pos, radius)
+
+def agent_rng(tick_seed, unique_id):
+    """The RNG an agent plans with this tick."""
+    return random.Random(tick_seed * 2**32 + unique_id)
+
+def _plan_jobs(view, tick_seed, jobs):
+    # jobs: [(class name, unique_id, pos, attrs)] -> [(unique_id, plan with agents as unique_ids)]
+    out = []
+    for cls_name, uid, pos, attrs in jobs:
+        cls = AGENT_CLASSES[cls_name]
+        agent = cls.__new__(cls)
+        agent.__dict__.update(attrs, unique_id=uid, pos=pos, model=view)
+        plan = agent.plan(view, agent_rng(tick_seed, uid))
+        if isinstance(plan, tuple) and plan and plan[0] == "attack":
+            plan = ("attack", plan[1].unique_id)
+        out.append((uid, plan))
+    return out
+
+_worker_view = None
+
+def _init_worker(settings, movement_cost, passable):
+    global _worker_view
+    _worker_view = PlanningView(settings, movement_cost, passable)
+
+def _plan_chunk(args):
+    tick_seed, snapshot, jobs = args
+    _worker_view.load(snapshot)
+    return _plan_jobs(_worker_view, tick_seed, jobs)
+
+class PlanCommitScheduler:
+    """
+    Runs one tick of plan/commit activation for model (see module docstring).
+    workers: planning processes for the A* plans; None or <= 1 plans in this
+    process. The pool is started on first use and restarted after map edits.
+    The model closes it when it stops running or is closed; a model dropped
+    without either takes its pool down when it is garbage collected.
+    """
+    def __init__(self, model, workers=None):
+        self.model = model
+        self.workers = workers
+        self._pool = None
+        self._finalizer = None
+        self._view = None
+        self._version = None
+
+    def _settings(self):
+        return {name: getattr(self.model, name) for name in VIEW_SETTINGS}
+
+    def _offloaded(self, agent):
+        # plans that are an A* search; the others are O(1) lookups on shared fields/tables
+        model = self.model
+        if isinstance(agent, Native):
+            policy = model.native_policy
+            if policy is not None and (agent.leader or model.native_flee == "policy"):
+                return False
+            return model.native_flee not in ("field", "policy")
+        return model.void_hunting == "astar"
+
+    def _prepare(self):
+        # (re)build the view / pool when the map changed since they were built
+        model = self.model
+        if self._version == model.map_version:
+            return
+        self.close()
+        settings = self._settings()
+        if self.workers is not None and self.workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(settings, model.movement_cost.copy(), model.passable.copy()))
+            self._finalizer = weakref.finalize(model, self._pool.shutdown, wait=False, cancel_futures=True)
+        else:
+            self._view = PlanningView(settings, model.movement_cost.copy(), model.passable.copy())
+            # planning in this process: searches still reach the tick profiler
+            self._view.profiler = model.profiler
+        self._version = model.map_version
+
+    def _plan_offloaded(self, tick_seed, agents):
+        model = self.model
+        snapshot = {cls: [(a.unique_id, a.pos[0], a.pos[1]) for a in model.registry[cls]]
+                    for cls in ("Native", "Voidspawn")}
+        jobs = [(a.__class__.__name__, a.unique_id, a.pos,
+                 {k: getattr(a, k) for k in AGENT_ATTRS if hasattr(a, k)}) for a in agents]
+        self._prepare()
+        if self._pool is None:
+            self._view.load(snapshot)
+            results = _plan_jobs(self._view, tick_seed, jobs)
+        else:
+            # a few chunks per worker evens out uneven search costs
+            n = max(1, -(-len(jobs) // (self.workers * 4)))
+            chunks = [(tick_seed, snapshot, jobs[i:i + n]) for i in range(0, len(jobs), n)]
+            results = [r for part in self._pool.map(_plan_chunk, chunks) for r in part]
+        natives = {a.unique_id: a for a in model.registry["Native"]}
+        plans = {}
+        for uid, plan in results:
+            if isinstance(plan, tuple) and plan and plan[0] == "attack":
+                plan = ("attack", natives[plan[1]])
+            plans[uid] = plan
+        return plans
+
+    def step(self):
+        model = self.model
+        tick_seed = model.random.getrandbits(64)
+        movers = [a for cls in ("Native", "Voidspawn") for a in model.registry[cls]]
+
+        # plan: nothing below changes the model until every agent has decided
+        offload = [a for a in movers if self._offloaded(a)]
+        plans = self._plan_offloaded(tick_seed, offload) if offload else {}
+        for a in movers:
+            if a.unique_id not in plans:
+                plans[a.unique_id] = a.plan(model, agent_rng(tick_seed, a.unique_id))
+
+        # commit in a random but seeded order
+        order = list(movers)
+        random.Random(tick_seed).shuffle(order)
+        attacked = set()
+        for a in order:
+            plan = plans[a.unique_id]
+            if isinstance(a, Voidspawn) and plan is not None and plan[0] == "attack":
+                plans[a.unique_id] = None
+                if plan[1] not in attacked:
+                    attacked.add(plan[1])
+                    model.remove_agent(plan[1])
+        claimed = set()
+        for a in order:
+            plan = plans[a.unique_id]
+            if a.pos is None or plan is None:
+                continue
+            target = plan[1] if isinstance(a, Voidspawn) else plan
+            if target in claimed:
+                continue
+            claimed.add(target)
+            model.move_agent(a, target)
+        for rift in list(model.registry["Rift"]):
+            rift.step()
+
+    def close(self):
+        """Shut the planning pool down (it is restarted on the next tick if needed)."""
+        if self._pool is not None:
+            self._finalizer.detach()
+            self._pool.shutdown()
+            self._pool = self._finalizer = None
+        self._view = None
+        self._version = None
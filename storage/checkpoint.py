@@ -0,0 +1,222 @@
+"""
+checkpoint.py - save a running VoidBreachModel and restore it later.
+
+A checkpoint is a single compressed .npz file. The grid-sized state (terrain
+costs, passability, fog-of-war masks) and per-agent positions/types are
+stored as NumPy arrays. The small, irregular remainder (RNG state, agent
+attributes such as Rift._tick / spawn_interval and Native.leader, path
+cache entries, the hierarchical planner's graph and per-agent routes,
+collected data, counters) is one pickled blob. Only load checkpoints you
+trust. A Native Q-table policy is stored as its table, so a model handed
+a QPolicy object restores with the same policy (transitions a recording
+policy has not handed out yet are not kept).
+
+Restoring rebuilds an empty model from model.params and then puts back
+everything that can influence later ticks: schedule order, per-type
+registry order, spatial-index bucket order and the RNG state. A restored
+model therefore continues exactly like the original run. Under
+engine="arrays" there are no agent objects; the PopulationArrays state
+arrays and its NumPy generator state are saved instead.
+
+    save_checkpoint(model, "data/invasion_t500.npz")
+    fork = load_checkpoint("data/invasion_t500.npz")
+"""
+import pickle
+import numpy as np
+from mesa import Agent
+
+from agents.native import Native
+from agents.voidspawn import Voidspawn
+from agents.rift import Rift
+from algorithms.hpa import HierarchicalPlanner
+from algorithms.qlearning import QPolicy
+from population import STATE_ARRAYS
+
+FORMAT_VERSION = 1
+AGENT_CLASSES = {"Native": Native, "Voidspawn": Voidspawn, "Rift": Rift}
+TYPE_CODES = {name: code for code, name in enumerate(AGENT_CLASSES)}
+# attributes handled separately (or owned by Mesa) and not pickled per agent
+_SKIP_ATTRS = {"model", "pos", "unique_id"}
+
+def save_checkpoint(model, path):
+    """Write model state to path (.npz)."""
+    agents = list(model.schedule.agents)
+    index = {a: i for i, a in enumerate(agents)}
+
+    positions = np.array([a.pos for a in agents], dtype=np.int32).reshape(-1, 2)
+    types = np.array([TYPE_CODES[a.__class__.__name__] for a in agents], dtype=np.int8)
+
+    # bucket contents in dict order, so nearest-agent ties resolve as before
+    spatial = {
+        cls: [(key, [index[a] for a in bucket]) for key, bucket in sh._buckets.items()]
+        for cls, sh in model.spatial.items()
+    }
+    cache_entries = None
+    if model.path_cache is not None:
+        cache_entries = [(index[a], entry) for a, entry in model.path_cache._entries.items() if a in index]
+    hpa = None
+    if model.hpa is not None:
+        # the abstract graph (its edge order breaks A* ties) and the routes agents are walking
+        planner = model.hpa
+        hpa = {
+            "config": (planner.cluster_size, planner.refine_hops, planner.wide_entrance),
+            "version": planner._version,
+            "builds": planner.builds,
+            "graph": (planner._borders, planner._inter, planner._intra, planner._nodes),
+            "routes": [(index[a], entry) for a, entry in planner._routes.items() if a in index],
+        }
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "params": model.params,
+        "rng_state": model.random.getstate(),
+        "seed": getattr(model, "_seed", None),
+        "steps": model.schedule.steps,
+        "time": model.schedule.time,
+        "running": model.running,
+        "unique_ids": [a.unique_id for a in agents],
+        "current_id": model.current_id,
+        "attrs": [{k: v for k, v in vars(a).items() if k not in _SKIP_ATTRS} for a in agents],
+        "registry": {cls: [index[a] for a in reg] for cls, reg in model.registry.items()},
+        "spatial": spatial,
+        "spawns": model.spawns,
+        "kills": model.kills,
+        "native_epoch": model._native_epoch,
+        "void_epoch": model._void_epoch,
+        "map_version": model.map_version,
+        "map_changes": list(model.map_changes),
+        "path_cache": cache_entries,
+        "path_cache_stats": model.path_cache.stats() if model.path_cache is not None else None,
+        "hpa": hpa,
+        "model_vars": model.data_collector.model_vars,
+    }
+    extra = {}
+    population = getattr(model, "population", None)
+    if population is not None:
+        meta["population_rng"] = population.rng.bit_generator.state
+        extra.update({f"population_{name}": getattr(population, name) for name in STATE_ARRAYS})
+    policy = model.native_policy
+    if policy is not None:
+        meta["policy"] = {"epsilon": policy.epsilon, "sight": policy.sight}
+        extra["policy_table"] = policy.table
+    blob = np.frombuffer(pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+
+    np.savez_compressed(
+        path,
+        **extra,
+        movement_cost=model.movement_cost,
+        passable=model.passable,
+        visible=model.visible,
+        explored=model.explored,
+        visible_native=model.visible_by_faction["Native"],
+        visible_void=model.visible_by_faction["Voidspawn"],
+        explored_native=model.explored_by_faction["Native"],
+        explored_void=model.explored_by_faction["Voidspawn"],
+        positions=positions,
+        types=types,
+        meta=blob,
+    )
+
+def load_checkpoint(path, model_cls=None, **overrides):
+    """
+    Rebuild a model from a checkpoint. overrides are passed to the model
+    constructor for settings that are not part of the simulated state
+    (e.g. results_sink=...).
+    """
+    if model_cls is None:
+        from model import VoidBreachModel as model_cls
+
+    with np.load(path) as data:
+        arrays = {k: data[k] for k in data.files}
+    meta = pickle.loads(arrays.pop("meta").tobytes())
+    if meta["format"] != FORMAT_VERSION:
+        raise ValueError(f"unsupported checkpoint format {meta['format']}")
+
+    params = dict(meta["params"])
+    if meta.get("policy") is not None and "native_policy" not in overrides:
+        # the saved table, whether the model got a path or a QPolicy object
+        params["native_policy"] = QPolicy(arrays["policy_table"], **meta["policy"])
+    model = model_cls(**params, initial_natives=0, initial_voidspawns=0,
+                      obstacle_fraction=0.0, populate=False, **overrides)
+    model.params["native_policy"] = meta["params"].get("native_policy")
+
+    # static map: the layers, plus tiles/obstacle agents when the model keeps them
+    cost = arrays["movement_cost"]
+    if model.static_agents:
+        for x, y in zip(*np.nonzero(cost != 1.0)):
+            model.set_terrain_cost((int(x), int(y)), cost[x, y])
+        for x, y in zip(*np.nonzero(~arrays["passable"])):
+            model.add_obstacle((int(x), int(y)))
+    else:
+        model.movement_cost[:] = cost
+        model.passable[:] = arrays["passable"]
+    model.map_version = meta["map_version"]
+    model.map_changes.clear()
+    model.map_changes.extend(meta["map_changes"])
+
+    # agents, in the scheduler's current activation order
+    agents = []
+    for i, code in enumerate(arrays["types"]):
+        cls = AGENT_CLASSES[list(AGENT_CLASSES)[code]]
+        agent = cls.__new__(cls)
+        Agent.__init__(agent, meta["unique_ids"][i], model)
+        agent.__dict__.update(meta["attrs"][i])
+        pos = tuple(int(v) for v in arrays["positions"][i])
+        model.grid.place_agent(agent, pos)
+        model.schedule.add(agent)
+        agents.append(agent)
+
+    if meta.get("population_rng") is not None:
+        population = model._make_population([], [], [], np.random.default_rng())
+        for name in STATE_ARRAYS:
+            setattr(population, name, arrays[f"population_{name}"])
+        population.rng.bit_generator.state = meta["population_rng"]
+        model.population = population
+
+    for cls, order in meta["registry"].items():
+        model.registry[cls] = {agents[i]: None for i in order}
+    for cls, buckets in meta["spatial"].items():
+        sh = model.spatial[cls]
+        sh._buckets = {key: {agents[i]: agents[i].pos for i in members} for key, members in buckets}
+        sh._where = {a: a.pos for members in sh._buckets.values() for a in members}
+
+    if model.path_cache is not None and meta["path_cache"] is not None:
+        model.path_cache._entries = {agents[i]: entry for i, entry in meta["path_cache"]}
+        stats = meta["path_cache_stats"]
+        model.path_cache.hits, model.path_cache.misses, model.path_cache.repairs = (
+            stats["hits"], stats["misses"], stats["repairs"])
+
+    if meta.get("hpa") is not None:
+        state = meta["hpa"]
+        cluster_size, refine_hops, wide_entrance = state["config"]
+        planner = HierarchicalPlanner(model, cluster_size=cluster_size, refine_hops=refine_hops,
+                                      wide_entrance=wide_entrance)
+        planner._borders, planner._inter, planner._intra, planner._nodes = state["graph"]
+        planner._version = state["version"]
+        planner.builds = state["builds"]
+        planner._routes = {agents[i]: entry for i, entry in state["routes"]}
+        model.hpa = planner
+
+    # fog of war (masks updated in place; visible_cells/explored_cells view them)
+    model.visible[:] = arrays["visible"]
+    model.explored[:] = arrays["explored"]
+    model.visible_by_faction["Native"][:] = arrays["visible_native"]
+    model.visible_by_faction["Voidspawn"][:] = arrays["visible_void"]
+    model.explored_by_faction["Native"][:] = arrays["explored_native"]
+    model.explored_by_faction["Voidspawn"][:] = arrays["explored_void"]
+
+    # continue the integer id sequence (older checkpoints: past the largest id seen)
+    model.current_id = meta.get("current_id", max([u for u in meta["unique_ids"] if isinstance(u, int)] + [0]))
+    model.schedule.steps = meta["steps"]
+    model.schedule.time = meta["time"]
+    model.running = meta["running"]
+    model.spawns = meta["spawns"]
+    model.kills = meta["kills"]
+    model._native_epoch = meta["native_epoch"]
+    model._void_epoch = meta["void_epoch"]
+    for name, values in meta["model_vars"].items():
+        model.data_collector.model_vars[name] = list(values)
+    if meta["seed"] is not None:
+        model._seed = meta["seed"]
+    model.random.setstate(meta["rng_state"])
+    return model
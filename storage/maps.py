@@ -0,0 +1,76 @@
+"""
+maps.py - load and save authored terrain maps for VoidBreachModel(terrain_map=...).
+
+A map is two layers indexed [x, y], like the model's own:
+    <prefix>_cost.npy       float movement cost per cell
+    <prefix>_passable.npy   bool, False where the cell is an obstacle (optional)
+
+.npy layers are opened with np.load(mmap_mode="c"): only the header is read up
+front and pages are faulted in as cells are touched, so even very large maps
+open in near-constant time. "c" is copy-on-write, so edits made by the model
+(add_obstacle, set_terrain_cost) never reach the file.
+
+Raster images (.png, .pgm, .bmp, ...) are read with Pillow if it is installed:
+black pixels are obstacles and the grey level of the rest maps linearly from
+cost 1.0 (white) to max_cost. Images are decoded in full, not memory-mapped.
+
+    save_map("data/maps/valley", model.movement_cost, model.passable)
+    model = VoidBreachModel(terrain_map="data/maps/valley")
+"""
+import os
+import numpy as np
+
+RASTER_EXTENSIONS = {".png", ".pgm", ".ppm", ".bmp", ".tif", ".tiff", ".gif"}
+
+def _prefix(path):
+    for suffix in ("_cost.npy", "_passable.npy"):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path[:-4] if path.endswith(".npy") else path
+
+def save_map(prefix, movement_cost, passable=None):
+    """Write the layers as <prefix>_cost.npy / <prefix>_passable.npy."""
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    np.save(f"{prefix}_cost.npy", np.asarray(movement_cost, dtype=np.float64))
+    if passable is not None:
+        np.save(f"{prefix}_passable.npy", np.asarray(passable, dtype=bool))
+
+def load_map(path, mmap=True, max_cost=3.0):
+    """
+    Return (movement_cost, passable) for a map prefix, one of its .npy files,
+    or a raster image. With mmap=True the .npy layers are copy-on-write memory maps.
+    """
+    if os.path.splitext(path)[1].lower() in RASTER_EXTENSIONS:
+        return _load_raster(path, max_cost)
+
+    prefix = _prefix(path)
+    mode = "c" if mmap else None
+    cost = np.load(f"{prefix}_cost.npy", mmap_mode=mode)
+    if cost.ndim != 2:
+        raise ValueError(f"{prefix}_cost.npy: expected a 2-D layer, got shape {cost.shape}")
+    if cost.dtype != np.float64:
+        # the model's layers are float64; other dtypes need one conversion pass
+        cost = cost.astype(np.float64)
+    if os.path.exists(f"{prefix}_passable.npy"):
+        passable = np.load(f"{prefix}_passable.npy", mmap_mode=mode)
+        if passable.shape != cost.shape:
+            raise ValueError(f"{prefix}: passable shape {passable.shape} does not match cost shape {cost.shape}")
+        if passable.dtype != bool:
+            passable = passable.astype(bool)
+    else:
+        passable = np.ones(cost.shape, dtype=bool)
+    return cost, passable
+
+def _load_raster(path, max_cost):
+    try:
+        from PIL import Image
+    except ImportError as exc:
+        raise ImportError("loading raster maps requires Pillow (pip install pillow)") from exc
+    with Image.open(path) as img:
+        grey = np.asarray(img.convert("L"), dtype=np.float64)
+    # images are stored row-major [y, x]; the model's layers are [x, y]
+    grey = grey.T
+    passable = grey > 0
+    cost = 1.0 + (255.0 - grey) / 254.0 * (max_cost - 1.0)
+    cost[~passable] = 1.0
+    return cost, passable
@@ -0,0 +1,273 @@
+"""
+replay.py - compact binary replay log of a run, read back without re-simulating.
+
+ReplayRecorder is handed every collected tick (VoidBreachModel(replay_log=...))
+and appends one record per tick:
+
+  delta     agent rows (op, type, id, x, y) for Natives / Voidspawns / Rifts
+            that appeared (spawns), moved or disappeared (kills); flat
+            indices of the cells whose visibility flipped; rows
+            (x, y, passable, float32 cost bits) for edited map cells
+  keyframe  every keyframe_every records: all agents plus the packed
+            visible / explored masks, so playback never replays more than
+            keyframe_every - 1 deltas
+
+Explored cells are not logged between keyframes: they are the union of
+everything visible, which is how the model maintains them.
+
+Every section is a fixed-width little-endian int32 array (packed masks are
+uint8, padded to 4 bytes). Files:
+
+    <path>        header (size, initial map) + records, append-only
+    <path>.idx    int64 rows (tick, offset, nbytes, flags), one per record
+
+ReplayLog memory-maps both and seeks to any tick through the index: nearest
+keyframe at or before it, then the deltas after it. Records become visible
+to readers at every keyframe (flush), so a run can be reviewed while it is
+still being recorded.
+
+    model = VoidBreachModel(seed=1, replay_log="data/runs/seed1.vbr")
+    ...
+    log = ReplayLog("data/runs/seed1.vbr")
+    state = log.state_at(500)      # agents, visible, explored, map, counters
+"""
+import os
+import numpy as np
+
+MAGIC = b"VBREPLAY"
+FORMAT_VERSION = 1
+TYPE_CODES = {"Native": 0, "Voidspawn": 1, "Rift": 2}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+# agent row ops
+OP_MOVE, OP_ADD, OP_REMOVE = 0, 1, 2
+# record flags
+KEYFRAME, MAP_EDITS = 1, 2
+# record header: tick, flags, agent rows, visibility flips, map rows, natives, voidspawns, kills, spawns
+_HEADER = 9
+
+def _padded(data):
+    data = np.ascontiguousarray(data, dtype=np.uint8)
+    pad = (-data.size) % 4
+    return data.tobytes() + b"\0" * pad
+
+def _agents(model):
+    # {(type code, id): (x, y)} of the live Natives, Voidspawns and Rifts
+    population = getattr(model, "population", None)
+    out = {}
+    for cls, code in TYPE_CODES.items():
+        if population is not None:
+            # array engine: the slot index stands in for the agent id
+            pos, alive = population.slots(cls)
+            for i in alive.nonzero()[0].tolist():
+                out[(code, i)] = (int(pos[i, 0]), int(pos[i, 1]))
+            continue
+        for a in model.registry.get(cls, ()):
+            out[(code, a.unique_id)] = a.pos
+    return out
+
+class ReplayRecorder:
+    def __init__(self, path, keyframe_every=100):
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self.keyframe_every = max(1, int(keyframe_every))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._data = None
+        self._index = None
+        self._offset = 0
+        self._records = 0
+        self._agents = {}
+        self._visible = None
+        self._cost = None
+        self._passable = None
+        self._map_version = None
+
+    def _open(self, model):
+        if self._records:
+            # reopened after close(): keep appending to the same log
+            self._data = open(self.path, "ab")
+            self._index = open(self.index_path, "ab")
+            return
+        cost = np.asarray(model.movement_cost, dtype=np.float32)
+        passable = np.asarray(model.passable, dtype=bool)
+        self._data = open(self.path, "wb")
+        self._index = open(self.index_path, "wb")
+        header = (MAGIC + np.array([FORMAT_VERSION, model.width, model.height, self.keyframe_every], dtype="<i4").tobytes()
+                  + cost.astype("<f4").tobytes() + _padded(passable))
+        self._data.write(header)
+        self._offset = len(header)
+        self._cost, self._passable = cost.copy(), passable.copy()
+        self._map_version = model.map_version
+
+    def record(self, model):
+        """Append the state of the tick the model just collected."""
+        if self._data is None:
+            self._open(model)
+        keyframe = self._records % self.keyframe_every == 0
+        flags = KEYFRAME if keyframe else 0
+        agents = _agents(model)
+        if keyframe:
+            rows = [(OP_ADD, code, uid, x, y) for (code, uid), (x, y) in agents.items()]
+        else:
+            old = self._agents
+            rows = [(OP_REMOVE, code, uid, 0, 0) for (code, uid) in old if (code, uid) not in agents]
+            for key, (x, y) in agents.items():
+                prev = old.get(key)
+                if prev is None:
+                    rows.append((OP_ADD, key[0], key[1], x, y))
+                elif prev != (x, y):
+                    rows.append((OP_MOVE, key[0], key[1], x, y))
+        self._agents = agents
+
+        visible = np.asarray(model.visible, dtype=bool)
+        flips = np.zeros(0, dtype="<i4")
+        if not keyframe:
+            flips = np.flatnonzero(visible != self._visible).astype("<i4")
+        self._visible = visible.copy()
+
+        edits = np.zeros((0, 4), dtype="<i4")
+        if model.map_version != self._map_version:
+            cost = np.asarray(model.movement_cost, dtype=np.float32)
+            passable = np.asarray(model.passable, dtype=bool)
+            xs, ys = np.nonzero((cost != self._cost) | (passable != self._passable))
+            if xs.size:
+                flags |= MAP_EDITS
+                edits = np.stack([xs, ys, passable[xs, ys], cost[xs, ys].astype("<f4").view("<i4")], axis=1).astype("<i4")
+            self._cost, self._passable = cost.copy(), passable.copy()
+            self._map_version = model.map_version
+
+        natives = sum(1 for code, _ in agents if code == 0)
+        voids = sum(1 for code, _ in agents if code == 1)
+        head = np.array([model.schedule.steps, flags, len(rows), flips.size, len(edits),
+                         natives, voids, model.kills, model.spawns], dtype="<i4")
+        parts = [head.tobytes(), np.array(rows, dtype="<i4").reshape(-1, 5).tobytes(), flips.tobytes(), edits.tobytes()]
+        if keyframe:
+            parts += [_padded(np.packbits(visible, axis=None)), _padded(np.packbits(model.explored, axis=None))]
+        blob = b"".join(parts)
+        self._data.write(blob)
+        self._index.write(np.array([model.schedule.steps, self._offset, len(blob), flags], dtype="<i8").tobytes())
+        self._offset += len(blob)
+        self._records += 1
+        if keyframe:
+            self.flush()
+
+    def flush(self):
+        if self._data is not None:
+            self._data.flush()
+            self._index.flush()
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+            self._data = self._index = None
+
+class ReplayState:
+    """Everything playback shows for one tick."""
+    def __init__(self, width, height, cost, passable):
+        self.tick = None
+        self.width = width
+        self.height = height
+        self.movement_cost = cost
+        self.passable = passable
+        self.map_version = 0
+        self.agents = {}
+        self.visible = np.zeros((width, height), dtype=bool)
+        self.explored = np.zeros((width, height), dtype=bool)
+        self.natives = self.voidspawns = self.kills = self.spawns = 0
+        self.record = None    # index of the record this state is at
+
+class ReplayLog:
+    def __init__(self, path):
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._data[:8]) != MAGIC:
+            raise ValueError(f"{path}: not a replay log")
+        version, self.width, self.height, self.keyframe_every = (int(v) for v in self._data[8:24].view("<i4"))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported replay format {version}")
+        cells = self.width * self.height
+        self.cost = np.array(self._data[24:24 + 4 * cells].view("<f4")).reshape(self.width, self.height)
+        self.passable = np.array(self._data[24 + 4 * cells:24 + 5 * cells], dtype=bool).reshape(self.width, self.height)
+        # a log still being written may end in a half-flushed record: keep complete ones only
+        rows = os.path.getsize(f"{path}.idx") // 32
+        index = np.memmap(f"{path}.idx", dtype="<i8", mode="r", shape=(rows, 4)) if rows else np.zeros((0, 4), "<i8")
+        self.index = index[:int(np.searchsorted(index[:, 1] + index[:, 2], len(self._data), side="right"))]
+        self.ticks = self.index[:, 0]
+        self._keyframes = np.flatnonzero(self.index[:, 3] & KEYFRAME)
+        self._map_records = np.flatnonzero(self.index[:, 3] & MAP_EDITS)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _record(self, i):
+        # (header, agent rows, visibility flips, map rows, packed visible, packed explored) views
+        _, offset, _, flags = (int(v) for v in self.index[i])
+        head = self._data[offset:offset + 4 * _HEADER].view("<i4")
+        n_rows, n_flips, n_edits = int(head[2]), int(head[3]), int(head[4])
+        at = offset + 4 * _HEADER
+        rows = self._data[at:at + 20 * n_rows].view("<i4").reshape(-1, 5)
+        at += 20 * n_rows
+        flips = self._data[at:at + 4 * n_flips].view("<i4")
+        at += 4 * n_flips
+        edits = self._data[at:at + 16 * n_edits].view("<i4").reshape(-1, 4)
+        at += 16 * n_edits
+        visible = explored = None
+        if flags & KEYFRAME:
+            nbytes = -(-self.width * self.height // 8)
+            visible = self._data[at:at + nbytes]
+            at += nbytes + (-nbytes) % 4
+            explored = self._data[at:at + nbytes]
+        return head, rows, flips, edits, visible, explored
+
+    def _unpack(self, packed):
+        return np.unpackbits(packed, count=self.width * self.height).astype(bool).reshape(self.width, self.height)
+
+    def _apply_edits(self, state, edits):
+        if len(edits):
+            state.movement_cost[edits[:, 0], edits[:, 1]] = edits[:, 3].view("<f4")
+            state.passable[edits[:, 0], edits[:, 1]] = edits[:, 2].astype(bool)
+            state.map_version += 1
+
+    def _apply_frame(self, state, i):
+        # agents, fog and counters of record i (map edits are handled separately)
+        head, rows, flips, _, visible, explored = self._record(i)
+        if visible is not None:
+            state.agents = {}
+            state.visible = self._unpack(visible)
+            state.explored = self._unpack(explored)
+        else:
+            flat = state.visible.reshape(-1)
+            flat[flips] = ~flat[flips]
+            state.explored |= state.visible
+        agents = state.agents
+        for op, code, uid, x, y in rows.tolist():
+            if op == OP_REMOVE:
+                agents.pop((code, uid), None)
+            else:
+                agents[(code, uid)] = (x, y)
+        state.tick, _, _, _, _, state.natives, state.voidspawns, state.kills, state.spawns = (int(v) for v in head)
+        state.record = i
+
+    def apply(self, state, i):
+        """Advance state from record i - 1 to record i (sequential playback)."""
+        self._apply_edits(state, self._record(i)[3])
+        self._apply_frame(state, i)
+        return state
+
+    def record_at(self, tick):
+        """Index of the last record at or before tick (0 for earlier ticks)."""
+        return max(0, int(np.searchsorted(self.ticks, tick, side="right")) - 1)
+
+    def state_at(self, tick):
+        """ReplayState at tick: nearest keyframe at or before it plus the deltas since."""
+        state = ReplayState(self.width, self.height, self.cost.copy(), self.passable.copy())
+        if not len(self):
+            return state
+        i = self.record_at(tick)
+        # map edits are rare and not repeated in keyframes: apply all of them up to i
+        for m in self._map_records[self._map_records <= i].tolist():
+            self._apply_edits(state, self._record(m)[3])
+        k = int(self._keyframes[np.searchsorted(self._keyframes, i, side="right") - 1])
+        for j in range(k, i + 1):
+            self._apply_frame(state, j)
+        return state
@@ -0,0 +1,93 @@
+"""
+stream.py - bounded-memory, append-only results output for long headless runs.
+
+ResultsSink takes each collected model-level row (and, every agent_stride
+steps, a snapshot of Native/Voidspawn/Rift positions), buffers them, and
+appends them to CSV every flush_every steps. After each flush the model's
+DataCollector history is dropped, so memory stays flat however long the run;
+a crash loses at most flush_every steps. Results are read back from disk,
+optionally in chunks.
+
+Files:
+    <path>_model.csv    Step, Natives, Voidspawns, ... (one row per collected step)
+    <path>_agents.csv   Step, Type, AgentID, x, y     (every agent_stride steps)
+"""
+import os
+from collections import deque
+import pandas as pd
+
+class ResultsSink:
+    def __init__(self, path="data/stream", flush_every=100, agent_stride=0, append=False):
+        self.model_path = f"{path}_model.csv"
+        self.agent_path = f"{path}_agents.csv"
+        self.flush_every = max(1, int(flush_every))
+        self.agent_stride = int(agent_stride)
+        self._rows = []
+        self._agent_rows = []
+        self._since_flush = 0
+        os.makedirs(os.path.dirname(self.model_path) or ".", exist_ok=True)
+        if not append:
+            for p in (self.model_path, self.agent_path):
+                if os.path.exists(p):
+                    os.remove(p)
+
+    def collect(self, model):
+        """Take the row the DataCollector just recorded, plus an agent snapshot when due."""
+        step = model.schedule.steps
+        row = {"Step": step}
+        for name, values in model.data_collector.model_vars.items():
+            row[name] = values[-1]
+        self._rows.append(row)
+        if self.agent_stride and step % self.agent_stride == 0:
+            population = getattr(model, "population", None)
+            for cls in ("Native", "Voidspawn", "Rift"):
+                if population is not None:
+                    # array engine: the slot index stands in for the agent id
+                    pos, alive = population.slots(cls)
+                    for i in alive.nonzero()[0].tolist():
+                        self._agent_rows.append((step, cls, i, int(pos[i, 0]), int(pos[i, 1])))
+                    continue
+                for a in model.registry.get(cls, ()):
+                    self._agent_rows.append((step, cls, a.unique_id, a.pos[0], a.pos[1]))
+        self._since_flush += 1
+        if self._since_flush >= self.flush_every:
+            self.flush(model)
+
+    def flush(self, model=None):
+        if self._rows:
+            _append(self.model_path, pd.DataFrame(self._rows))
+            self._rows = []
+        if self._agent_rows:
+            _append(self.agent_path, pd.DataFrame(self._agent_rows, columns=["Step", "Type", "AgentID", "x", "y"]))
+            self._agent_rows = []
+        self._since_flush = 0
+        if model is not None:
+            # everything up to here is on disk; keep only the latest value for live readers
+            for values in model.data_collector.model_vars.values():
+                del values[:-1]
+
+    def close(self, model=None):
+        self.flush(model)
+
+    def read_model(self, chunksize=None):
+        """DataFrame of all model rows, or an iterator of chunks when chunksize is given."""
+        self.flush()
+        if not os.path.exists(self.model_path):
+            return iter(()) if chunksize else pd.DataFrame()
+        return pd.read_csv(self.model_path, chunksize=chunksize)
+
+    def read_agents(self, chunksize=None):
+        self.flush()
+        if not os.path.exists(self.agent_path):
+            return iter(()) if chunksize else pd.DataFrame()
+        return pd.read_csv(self.agent_path, chunksize=chunksize)
+
+    def tail(self, n=5, chunksize=10000):
+        """Last n model rows, read chunk by chunk."""
+        last = deque(maxlen=n)
+        for chunk in self.read_model(chunksize=chunksize):
+            last.extend(chunk.to_dict("records"))
+        return pd.DataFrame(list(last))
+
+def _append(path, df):
+    df.to_csv(path, mode="a", index=False, header=not os.path.exists(path))
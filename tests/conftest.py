@@ -0,0 +1,19 @@
+"""
+conftest.py - shared helpers for the test suite (run with python -m pytest tests).
+"""
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# mesa 2.x deprecation noise from the schedulers
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+def assert_valid_path(model, path, start, goal):
+    """path runs start -> goal through passable, 4-adjacent cells."""
+    assert path, f"no path from {start} to {goal}"
+    assert path[0] == start and path[-1] == goal
+    for a, b in zip(path, path[1:]):
+        assert abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1, f"{a} -> {b} is not a single step"
+    for cell in path:
+        assert model.passable[cell], f"{cell} on the path is blocked"
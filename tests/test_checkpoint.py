@@ -0,0 +1,52 @@
+"""
+test_checkpoint.py - a restored checkpoint continues exactly like the original run.
+"""
+import numpy as np
+import pytest
+from algorithms.qlearning import QPolicy, N_STATES, N_ACTIONS
+from model import VoidBreachModel
+from storage.checkpoint import save_checkpoint, load_checkpoint
+
+MODES = {
+    "default": dict(),
+    "astar_sample": dict(void_hunting="astar", native_flee="sample"),
+    "agent_pool": dict(agent_pool=True),
+    "simultaneous": dict(activation="simultaneous", planning_workers=0),
+    "static_agents_grid": dict(static_agents=True, pathfinding="grid"),
+    "hunt_in_vision_astar": dict(void_hunting="astar", hunt_in_vision=True),
+    "hpa": dict(void_hunting="hpa", width=48, height=48),
+    "policy_leaders": dict(leaders=8, policy=True),
+    "policy_flee": dict(native_flee="policy", policy=True),
+    "arrays": dict(engine="arrays"),
+}
+
+def _state(model):
+    if model.population is not None:
+        agents = [model.population.positions(cls).tolist() for cls in ("Native", "Voidspawn", "Rift")]
+    else:
+        agents = sorted((a.__class__.__name__, a.unique_id, a.pos) for a in model.schedule.agents)
+    return (agents, model.get_results_df().values.tolist(), model.visible.tolist(),
+            model.explored.tolist(), model.kills, model.spawns, model.random.random())
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_restored_run_matches(mode, tmp_path):
+    kw = dict(MODES[mode])
+    if kw.pop("policy", False):
+        kw["native_policy"] = QPolicy(np.random.default_rng(0).normal(size=(N_STATES, N_ACTIONS)), epsilon=0.1)
+    model = VoidBreachModel(seed=11, initial_natives=50, initial_voidspawns=8, obstacle_fraction=0.1, **kw)
+    path = tmp_path / "run.npz"
+    with model:
+        for _ in range(15):
+            model.step()
+        if model.population is None:
+            # a map edit mid-run, so cached paths / fields / HPA clusters are dirty when saved
+            occupied = {a.pos for a in model.schedule.agents}
+            cell = next(c for c in zip(*np.nonzero(model.passable)) if tuple(int(v) for v in c) not in occupied)
+            model.add_obstacle(tuple(int(v) for v in cell))
+        model.step()
+        save_checkpoint(model, path)
+        with load_checkpoint(path) as restored:
+            for _ in range(25):
+                model.step()
+                restored.step()
+            assert _state(restored) == _state(model)
@@ -0,0 +1,36 @@
+"""
+test_engines.py - the array engine matches the object engine's population dynamics in distribution.
+"""
+import numpy as np
+from model import VoidBreachModel
+
+SEEDS = range(24)
+STEPS = 50
+
+def _trajectories(engine):
+    # (seeds, STEPS + 1) Native / Voidspawn counts; a stopped run holds its last value
+    natives, voids = [], []
+    for seed in SEEDS:
+        model = VoidBreachModel(seed=seed, engine=engine, initial_natives=45, initial_voidspawns=9)
+        for _ in range(STEPS):
+            if not model.running:
+                break
+            model.step()
+        df = model.get_results_df().set_index("Step").reindex(range(STEPS + 1)).ffill()
+        natives.append(df["Natives"].to_numpy())
+        voids.append(df["Voidspawns"].to_numpy())
+    return np.array(natives), np.array(voids)
+
+def _close(a, b, slack=1.0):
+    # mean trajectories within 4 standard errors of their difference (plus an agent of slack)
+    se = np.sqrt(a.var(axis=0, ddof=1) / len(a) + b.var(axis=0, ddof=1) / len(b))
+    return np.abs(a.mean(axis=0) - b.mean(axis=0)) <= 4 * se + slack
+
+def test_array_engine_matches_object_engine_in_distribution():
+    obj_natives, obj_voids = _trajectories("objects")
+    arr_natives, arr_voids = _trajectories("arrays")
+    assert _close(obj_natives, arr_natives).all()
+    assert _close(obj_voids, arr_voids).all()
+    # both engines actually hunt: Natives are lost at a comparable pace
+    assert obj_natives[:, -1].mean() < 0.8 * obj_natives[:, 0].mean()
+    assert arr_natives[:, -1].mean() < 0.8 * arr_natives[:, 0].mean()
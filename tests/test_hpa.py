@@ -0,0 +1,90 @@
+"""
+test_hpa.py - HierarchicalPlanner paths are valid and incremental rebuilds match a fresh build.
+"""
+import random
+from algorithms.astar import astar_search
+from algorithms.hpa import HierarchicalPlanner
+from model import VoidBreachModel
+
+def _model(seed=7, size=64):
+    return VoidBreachModel(width=size, height=size, seed=seed, initial_natives=0, initial_voidspawns=0,
+                           obstacle_fraction=0.2, void_hunting="hpa")
+
+def _walk(model, planner, start, goal):
+    # follow find() prefix by prefix, as a hunting agent does; returns the cells visited
+    pos, walked = start, [start]
+    for _ in range(model.width * model.height):
+        if pos == goal:
+            return walked
+        cells = planner.find("walker", pos, goal)
+        if cells is None:
+            return None
+        assert cells[0] == pos
+        for a, b in zip(cells, cells[1:]):
+            assert abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1, f"{a} -> {b} is not a single step"
+            assert model.passable[b], f"{b} on the path is blocked"
+        assert len(cells) > 1
+        walked.extend(cells[1:])
+        pos = cells[-1]
+    raise AssertionError(f"no progress from {start} to {goal}")
+
+def _graph(planner):
+    # order-free view of the abstract graph
+    return ({c: set(nodes) for c, nodes in planner._nodes.items() if nodes},
+            {n: set(edges) for n, edges in planner._intra.items()},
+            {n: set(edges) for n, edges in planner._inter.items()},
+            {k: set(v) for k, v in planner._borders.items()})
+
+def _free_cells(model, rng, n, within=None):
+    w, h = within or (model.width, model.height)
+    cells = [(x, y) for x in range(w) for y in range(h) if model.passable[x, y]]
+    return rng.sample(cells, n)
+
+def test_paths_are_valid_and_reach_the_goal():
+    model = _model()
+    planner = model.hierarchical_planner()
+    rng = random.Random(1)
+    reached = 0
+    for start, goal in zip(_free_cells(model, rng, 20), _free_cells(model, rng, 20)):
+        planner.forget("walker")
+        walked = _walk(model, planner, start, goal)
+        reachable = astar_search(model, start, goal) is not None
+        assert (walked is not None) == reachable
+        reached += walked is not None
+    assert reached
+
+def test_incremental_sync_matches_fresh_build():
+    model = _model(seed=9, size=96)
+    planner = model.hierarchical_planner()
+    rng = random.Random(2)
+    # edits stay in the lower-left 3x3 clusters, so most of the 6x6 must be left alone
+    corner = (40, 40)
+    for round_ in range(6):
+        # obstacles, openings and cost changes, including cells on cluster borders
+        for x, y in _free_cells(model, rng, 8, corner):
+            model.add_obstacle((x, y))
+        for x in (15, 16, 31, 32):
+            y = rng.randrange(corner[1])
+            if round_ % 2:
+                model.remove_obstacle((x, y))
+            else:
+                model.add_obstacle((x, y))
+        for x, y in _free_cells(model, rng, 4, corner):
+            model.set_terrain_cost((x, y), rng.choice((1.0, 3.0, 8.0)))
+        builds = planner.builds
+        planner._sync()
+        assert 0 < planner.builds - builds <= 16
+        assert _graph(planner) == _graph(HierarchicalPlanner(model))
+
+def test_paths_stay_valid_after_edits():
+    model = _model(seed=4)
+    planner = model.hierarchical_planner()
+    rng = random.Random(3)
+    start, goal = _free_cells(model, rng, 2)
+    for _ in range(5):
+        for cell in _free_cells(model, rng, 10):
+            if cell not in (start, goal):
+                model.add_obstacle(cell)
+        planner.forget("walker")
+        walked = _walk(model, planner, start, goal)
+        assert (walked is not None) == (astar_search(model, start, goal) is not None)
@@ -0,0 +1,78 @@
+"""
+test_path_cache.py - PathCache reuse / splice repair stays valid across map edits.
+"""
+import pytest
+from conftest import assert_valid_path
+from algorithms.astar import astar_search
+from model import VoidBreachModel
+
+def _empty_model(pathfinding="layers"):
+    return VoidBreachModel(width=40, height=40, seed=3, initial_natives=0, initial_voidspawns=0,
+                           obstacle_fraction=0.0, pathfinding=pathfinding,
+                           static_agents=pathfinding == "grid")
+
+@pytest.mark.parametrize("pathfinding", ["layers", "grid"])
+def test_repair_around_new_obstacle(pathfinding):
+    model = _empty_model(pathfinding)
+    cache = model.path_cache
+    start, goal = (2, 20), (37, 20)
+    path = cache.find("a", start, goal)
+    assert_valid_path(model, path, start, goal)
+
+    # block the path ahead of the agent, then query from a few cells further on
+    here = path[5]
+    model.add_obstacle(path[12])
+    repaired = cache.find("a", here, goal)
+    assert cache.repairs == 1
+    assert_valid_path(model, repaired, here, goal)
+    assert path[12] not in repaired
+
+def test_repair_after_cost_increase_and_goal_shift():
+    model = _empty_model()
+    cache = model.path_cache
+    start, goal = (5, 5), (30, 30)
+    path = cache.find("a", start, goal)
+    model.set_terrain_cost(path[10], 50.0)
+    here = path[3]
+    shifted = (goal[0] + 1, goal[1] + 1)
+    repaired = cache.find("a", here, shifted)
+    assert cache.repairs == 1
+    assert_valid_path(model, repaired, here, shifted)
+
+def test_relaxed_edit_forces_full_search():
+    model = _empty_model()
+    wall = [(20, y) for y in range(0, 39)]
+    for cell in wall:
+        model.add_obstacle(cell)
+    cache = model.path_cache
+    start, goal = (10, 10), (30, 10)
+    detour = cache.find("a", start, goal)
+    assert_valid_path(model, detour, start, goal)
+
+    # opening the wall may create a shortcut: no repair, a fresh (shorter) search
+    model.remove_obstacle((20, 10))
+    misses = cache.misses
+    path = cache.find("a", detour[1], goal)
+    assert cache.misses == misses + 1
+    assert_valid_path(model, path, detour[1], goal)
+    assert len(path) < len(detour) - 1
+
+def test_repeated_edits_keep_paths_valid():
+    model = _empty_model()
+    cache = model.path_cache
+    rng = model.random
+    pos, goal = (1, 1), (38, 38)
+    for _ in range(60):
+        path = cache.find("a", pos, goal)
+        if astar_search(model, pos, goal) is None:
+            # the edits walled the goal off: the cache must not invent a path either
+            assert path is None
+            break
+        assert_valid_path(model, path, pos, goal)
+        if len(path) < 4:
+            break
+        # drop an obstacle somewhere on the remaining path, then take two steps
+        cell = path[rng.randrange(3, len(path) - 1)]
+        model.add_obstacle(cell)
+        pos = path[2] if path[2] != cell else path[1]
+    assert cache.repairs > 0
@@ -0,0 +1,57 @@
+"""
+test_sweep.py - sweep run ids, resume and the CSV the runs are appended to.
+"""
+import pandas as pd
+import pytest
+from main import completed_runs, sweep, sweep_columns, sweep_runs
+
+GRID = {"native_vision": [3, 5]}
+
+def test_run_ids_are_stable_and_depend_on_the_base_seed():
+    first = sweep_runs(GRID, replicates=2, steps=10, base_seed=0)
+    assert [r["run_id"] for r in first] == [r["run_id"] for r in sweep_runs(GRID, 2, 10, 0)]
+    assert len({r["run_id"] for r in first}) == 4
+    other = sweep_runs(GRID, replicates=2, steps=10, base_seed=1)
+    assert not {r["run_id"] for r in first} & {r["run_id"] for r in other}
+
+def test_mixed_schemas_share_one_header(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    grid = {"profile": [False, True], "width": [12], "height": [12]}
+    sweep(grid, steps=3, workers=1, out=out)
+    df = pd.read_csv(out)
+    assert list(df.columns) == sweep_columns(grid)
+    assert df.groupby("profile")["Natives"].count().tolist() == [4, 4]
+    assert df.loc[df["profile"], "Tick ms"].notna().all()
+    assert df.loc[~df["profile"], "Tick ms"].isna().all()
+
+def test_resume_rejects_a_different_schema(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    sweep({"width": [12], "height": [12]}, steps=2, workers=1, out=out)
+    with pytest.raises(ValueError):
+        sweep({"width": [12], "height": [12], "profile": [True]}, steps=2, workers=1, out=out)
+
+def test_resume_drops_a_torn_run(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    grid = {"native_vision": [3, 5], "width": [12], "height": [12]}
+    sweep(grid, steps=3, workers=1, out=out)
+    complete = pd.read_csv(out)
+
+    # crash mid-append: half a run's rows on disk, no commit in out.done
+    with open(out, "a") as f:
+        f.write("deadbeef0000,0,1,0,5,1,\ndeadbeef0000,0,1,1,5")
+    # and a torn marker line for it
+    with open(f"{out}.done", "a") as f:
+        f.write("deadbeef0000 99")
+    assert "deadbeef0000" not in completed_runs(out)
+    pd.testing.assert_frame_equal(pd.read_csv(out), complete)
+    with open(f"{out}.done") as f:
+        assert f.read().endswith("\n")
+
+    # losing the last commit redoes that run and ends with the same rows
+    with open(f"{out}.done") as f:
+        lines = f.readlines()
+    with open(f"{out}.done", "w") as f:
+        f.writelines(lines[:-1])
+    assert len(completed_runs(out)) == 1
+    sweep(grid, steps=3, workers=1, out=out)
+    pd.testing.assert_frame_equal(pd.read_csv(out), complete)
@@ -0,0 +1,149 @@
+// LayeredCanvasModule.js - client side of visualization/layered_canvas.py.
+//
+// Keeps the lit/dim background images, the fog bitmasks and the visible agents
+// between frames, applies the deltas the server sends, and redraws:
+//   fog composite (offscreen, one pixel per cell; rebuilt when fog or background change)
+//   -> scaled onto the canvas -> agent markers on top.
+const LayeredCanvasModule = function (canvas_width, canvas_height) {
+  const AGENT_STYLE = {
+    R: { color: "#9C27B0", r: 0.7 },
+    V: { color: "#E53935", r: 0.5 },
+    N: { color: "#4CAF50", r: 0.4 },
+  };
+  const DRAW_ORDER = ["R", "V", "N"];
+
+  const parent = document.createElement("div");
+  parent.style.height = `${canvas_height}px`;
+  parent.className = "world-grid-parent";
+  const canvas = document.createElement("canvas");
+  canvas.width = canvas_width;
+  canvas.height = canvas_height;
+  canvas.className = "world-grid";
+  parent.appendChild(canvas);
+  document.getElementById("elements").appendChild(parent);
+  const context = canvas.getContext("2d");
+
+  // offscreen one-pixel-per-cell buffer holding the fogged background
+  const fogCanvas = document.createElement("canvas");
+  const fogContext = fogCanvas.getContext("2d");
+
+  let width = 0;
+  let height = 0;
+  let lit = null; // RGBA pixels of the lit / dimmed backgrounds
+  let dim = null;
+  let visible = null; // packed bitmasks, row-major in image order
+  let explored = null;
+  let agents = new Map(); // key -> [x, y]
+  let pending = 0; // background images still decoding
+  let fogDirty = false;
+  let generation = 0; // ignores decodes that finish after a newer background or reset
+
+  const decodeBits = (b64) => Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+
+  const loadPixels = (url, done) => {
+    const img = new Image();
+    const gen = generation;
+    img.onload = () => {
+      if (gen !== generation) return;
+      const tmp = document.createElement("canvas");
+      tmp.width = img.width;
+      tmp.height = img.height;
+      const ctx = tmp.getContext("2d");
+      ctx.drawImage(img, 0, 0);
+      done(ctx.getImageData(0, 0, img.width, img.height).data);
+    };
+    img.src = url;
+  };
+
+  const composeFog = () => {
+    const out = fogContext.createImageData(width, height);
+    const px = out.data;
+    for (let i = 0; i < width * height; i++) {
+      const bit = 0x80 >> (i & 7);
+      const src = visible[i >> 3] & bit ? lit : explored[i >> 3] & bit ? dim : null;
+      const o = i * 4;
+      if (src) {
+        px[o] = src[o];
+        px[o + 1] = src[o + 1];
+        px[o + 2] = src[o + 2];
+      }
+      px[o + 3] = 255; // unseen cells stay black
+    }
+    fogContext.putImageData(out, 0, 0);
+    fogDirty = false;
+  };
+
+  const draw = () => {
+    if (pending > 0 || !lit || !visible) return;
+    if (fogDirty) composeFog();
+    const cw = canvas_width / width;
+    const ch = canvas_height / height;
+    context.imageSmoothingEnabled = false;
+    context.drawImage(fogCanvas, 0, 0, canvas_width, canvas_height);
+
+    const maxR = Math.min(cw, ch) / 2;
+    for (const type of DRAW_ORDER) {
+      const style = AGENT_STYLE[type];
+      context.fillStyle = style.color;
+      context.beginPath();
+      for (const [key, [x, y]] of agents) {
+        if (key[0] !== type) continue;
+        const cx = (x + 0.5) * cw;
+        const cy = (height - y - 0.5) * ch; // y points up, as in CanvasGrid
+        if (maxR < 2) {
+          // too small for circles: fill the cell
+          context.rect(x * cw, (height - y - 1) * ch, Math.max(cw, 1), Math.max(ch, 1));
+        } else {
+          const r = Math.max(1, maxR * style.r);
+          context.moveTo(cx + r, cy);
+          context.arc(cx, cy, r, 0, Math.PI * 2);
+        }
+      }
+      context.fill();
+    }
+  };
+
+  this.render = (data) => {
+    if (!data) return;
+    if (data.reset) this.reset();
+    if (data.background) {
+      const bg = data.background;
+      width = bg.width;
+      height = bg.height;
+      fogCanvas.width = width;
+      fogCanvas.height = height;
+      generation += 1;
+      pending = 2;
+      loadPixels(bg.lit, (pixels) => {
+        lit = pixels;
+        pending -= 1;
+        fogDirty = true;
+        draw();
+      });
+      loadPixels(bg.dim, (pixels) => {
+        dim = pixels;
+        pending -= 1;
+        fogDirty = true;
+        draw();
+      });
+    }
+    if (data.fog) {
+      visible = decodeBits(data.fog.visible);
+      explored = decodeBits(data.fog.explored);
+      fogDirty = true;
+    }
+    if (data.agents) {
+      for (const key of data.agents.drop) agents.delete(key);
+      for (const [key, x, y] of data.agents.set) agents.set(key, [x, y]);
+    }
+    draw();
+  };
+
+  this.reset = () => {
+    lit = dim = visible = explored = null;
+    agents = new Map();
+    pending = 0;
+    generation += 1;
+    context.clearRect(0, 0, canvas_width, canvas_height);
+  };
+};
@@ -0,0 +1,41 @@
+// LoopControlModule.js - client side of visualization/live.LoopControl.
+//
+// Pause/Resume and ticks/s controls for the background simulation loop, sent
+// over the page's websocket (runcontrol.js `send`), plus a status line.
+const LoopControlModule = function () {
+  const div = document.createElement("div");
+  div.className = "d-flex align-items-center gap-2 mb-2";
+  div.innerHTML = `
+    <button type="button" class="btn btn-outline-secondary btn-sm">Pause</button>
+    <label class="small mb-0">ticks/s
+      <input type="number" min="0" step="1" value="0" class="form-control form-control-sm d-inline-block" style="width: 6em;" />
+    </label>
+    <span class="small text-muted"></span>
+  `;
+  document.getElementById("elements").appendChild(div);
+  const button = div.querySelector("button");
+  const rate = div.querySelector("input");
+  const status = div.querySelector("span");
+  let paused = true;
+
+  button.onclick = () => {
+    send({ type: paused ? "resume" : "pause" });
+    // confirmed by the next frame; flip now so the button responds while not sampling
+    paused = !paused;
+    button.innerText = paused ? "Resume" : "Pause";
+  };
+  // 0 = unthrottled
+  rate.onchange = () => send({ type: "set_rate", value: Number(rate.value) });
+
+  this.render = (data) => {
+    paused = data.paused;
+    button.innerText = paused ? "Resume" : "Pause";
+    if (document.activeElement !== rate) rate.value = data.target;
+    const state = !data.running ? "finished" : paused ? "paused" : "running";
+    status.innerText = `tick ${data.tick} · ${data.tps} ticks/s · ${data.skipped} skipped · ${state}`;
+  };
+
+  this.reset = () => {
+    status.innerText = "";
+  };
+};
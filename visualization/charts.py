@@ -1,5 +1,5 @@
 """
-charts.py - visualization charts for population counts.
+charts.py - visualization charts for population counts and tick profiling.
 """
 from mesa.visualization.modules import ChartModule
 
@@ -15,3 +15,24 @@ def population_chart():
         data_collector_name="data_collector",
     )
     return chart
+
+def profiler_chart():
+    """
+    Returns a ChartModule that plots per-phase tick times (ms) and per-tick
+    A* calls / spawns / kills. Requires the model to run with profile=True.
+    """
+    chart = ChartModule(
+        [
+            {"Label": "Tick ms", "Color": "#212121"},
+            {"Label": "Native ms", "Color": "#4CAF50"},
+            {"Label": "Voidspawn ms", "Color": "#E53935"},
+            {"Label": "Rift ms", "Color": "#9C27B0"},
+            {"Label": "Visibility ms", "Color": "#1E88E5"},
+            {"Label": "Collect ms", "Color": "#FB8C00"},
+            {"Label": "A* calls", "Color": "#795548"},
+            {"Label": "Spawns", "Color": "#AB47BC"},
+            {"Label": "Kills", "Color": "#8D6E63"},
+        ],
+        data_collector_name="data_collector",
+    )
+    return chart
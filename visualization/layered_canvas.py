@@ -0,0 +1,187 @@
+"""
+layered_canvas.py - fog-of-war grid renderer that only ships what changed.
+
+CanvasGrid asks agent_portrayal for every object in every cell on every frame,
+so its cost grows with W*H even though the terrain never moves. LayeredCanvas
+splits the picture into layers with different lifetimes:
+
+  background  terrain + obstacles, pre-coloured twice (lit for visible cells,
+              dimmed for explored ones) and sent as two PNG images; re-sent
+              only for a new model or after map_version changes
+  fog         visible / explored bitmasks (1 bit per cell each, base64);
+              sent only when they changed
+  agents      Rifts, Voidspawns and Natives on currently visible cells, as a
+              delta against the previous frame: {"set": [[key, x, y], ...],
+              "drop": [key, ...]}
+
+The browser side (LayeredCanvasModule.js) keeps the decoded layers, composes
+the fog once per change and redraws the few agents per frame. The grid size is
+taken from the model in each background message.
+
+Every delta is relative to what one browser tab already holds, so the
+baseline is kept per websocket connection: servers built on CanvasServer
+(or using CanvasSocketHandler) tell the canvas which connection a frame is
+for, and a connection that opens or resets gets a full frame. Rendered
+outside such a handler, the canvas keeps a single shared baseline.
+"""
+import base64
+import os
+import struct
+import zlib
+import numpy as np
+
+try:
+    from mesa.visualization import ModularServer, VisualizationElement
+except ImportError:
+    from mesa.visualization.ModularVisualization import ModularServer, VisualizationElement
+from mesa.visualization.ModularVisualization import SocketHandler
+
+# drawing order (bottom to top); the first letter of an agent key is its type
+AGENT_TYPES = ("Rift", "Voidspawn", "Native")
+
+def _png_data_url(rgb):
+    """Encode an (H, W, 3) uint8 image as a PNG data URL (stdlib zlib, no Pillow needed)."""
+    h, w, _ = rgb.shape
+    raw = np.zeros((h, w * 3 + 1), dtype=np.uint8)  # leading 0 per row: filter type "None"
+    raw[:, 1:] = rgb.reshape(h, w * 3)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    png = (b"\x89PNG\r\n\x1a\n"
+           + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+           + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+           + chunk(b"IEND", b""))
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+def _image(layer):
+    # [x, y] layer -> image rows top to bottom, y pointing up like CanvasGrid
+    return np.asarray(layer).T[::-1]
+
+def _backgrounds(model):
+    """Lit and dimmed terrain/obstacle images, same palette as the old agent_portrayal."""
+    cost = _image(model.movement_cost)
+    blocked = ~_image(model.passable)
+    lit = np.repeat((220 - np.minimum(cost * 40, 160)).astype(np.uint8)[..., None], 3, axis=2)
+    dim = np.repeat((120 - np.minimum(cost * 20, 80)).astype(np.uint8)[..., None], 3, axis=2)
+    lit[blocked] = 0x2E
+    dim[blocked] = 0x11
+    return {"width": model.width, "height": model.height,
+            "lit": _png_data_url(lit), "dim": _png_data_url(dim)}
+
+def _bits(mask):
+    return base64.b64encode(np.packbits(_image(mask), axis=None).tobytes()).decode("ascii")
+
+def visible_agents(model):
+    """{key: (x, y)} for the mobile agents on visible cells, keyed "<type letter><id>"."""
+    visible = model.visible
+    population = getattr(model, "population", None)
+    out = {}
+    for cls in AGENT_TYPES:
+        if population is not None:
+            pos, alive = population.slots(cls)
+            idx = np.nonzero(alive & visible[pos[:, 0], pos[:, 1]])[0]
+            for i, x, y in zip(idx.tolist(), pos[idx, 0].tolist(), pos[idx, 1].tolist()):
+                out[f"{cls[0]}{i}"] = (x, y)
+        else:
+            for a in model.registry.get(cls, ()):
+                x, y = a.pos
+                if visible[x, y]:
+                    out[f"{cls[0]}{a.unique_id}"] = (x, y)
+    return out
+
+class _ClientView:
+    # what one browser tab holds: the baseline its next delta is computed against
+    __slots__ = ("model", "map_version", "visible", "explored", "agents")
+
+    def __init__(self):
+        self.model = None
+        self.map_version = None
+        self.visible = None
+        self.explored = None
+        self.agents = {}
+
+class LayeredCanvas(VisualizationElement):
+    local_includes = ["LayeredCanvasModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, canvas_width=600, canvas_height=600):
+        super().__init__()
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.js_code = f"elements.push(new LayeredCanvasModule({canvas_width}, {canvas_height}));"
+        # connection being rendered for (set by render_for); None outside a CanvasSocketHandler
+        self.client = None
+        self._clients = {}
+
+    # ModularServer's PageHandler assigns index on every page load: a fresh page
+    # has none of our cached layers, so the shared baseline must start over
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._index = value
+        self.resync(None)
+
+    def resync(self, client=None):
+        """Forget what client has; the next render for it sends every layer."""
+        self._clients.pop(client, None)
+
+    def render(self, model):
+        view = self._clients.get(self.client)
+        if view is None:
+            view = self._clients[self.client] = _ClientView()
+        frame = {}
+        if model is not view.model:
+            # new or reset model: the client drops everything it holds
+            view.__init__()
+            view.model = model
+            frame["reset"] = True
+        if model.map_version != view.map_version:
+            frame["background"] = _backgrounds(model)
+            view.map_version = model.map_version
+
+        if (view.visible is None or not np.array_equal(view.visible, model.visible)
+                or not np.array_equal(view.explored, model.explored)):
+            frame["fog"] = {"visible": _bits(model.visible), "explored": _bits(model.explored)}
+            view.visible = model.visible.copy()
+            view.explored = model.explored.copy()
+
+        agents = visible_agents(model)
+        moved = [[key, x, y] for key, (x, y) in agents.items() if view.agents.get(key) != (x, y)]
+        gone = [key for key in view.agents if key not in agents]
+        if moved or gone:
+            frame["agents"] = {"set": moved, "drop": gone}
+        view.agents = agents
+        return frame
+
+def render_for(app, client):
+    """app.render_model(), with every LayeredCanvas diffing against client's last frame."""
+    canvases = [e for e in app.visualization_elements if isinstance(e, LayeredCanvas)]
+    for canvas in canvases:
+        canvas.client = client
+    try:
+        return app.render_model()
+    finally:
+        for canvas in canvases:
+            canvas.client = None
+
+class CanvasSocketHandler(SocketHandler):
+    """Stock websocket handler that keeps one LayeredCanvas baseline per connection."""
+    @property
+    def viz_state_message(self):
+        return {"type": "viz_state", "data": render_for(self.application, self)}
+
+    def on_close(self):
+        for element in self.application.visualization_elements:
+            if isinstance(element, LayeredCanvas):
+                element.resync(self)
+
+class CanvasServer(ModularServer):
+    """ModularServer whose websocket connections each get their own canvas deltas."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # rules added later are matched first, so this one takes over /ws
+        self.add_handlers(r".*$", [(r"/ws", CanvasSocketHandler)])
@@ -0,0 +1,188 @@
+"""
+live.py - visualization server whose model runs on its own thread.
+
+With the stock ModularServer, the model advances one tick per "get_step"
+message from the browser, so the tick rate is tied to render and network
+latency, and a slow tick freezes the page. LiveServer turns that around:
+
+  - SimulationLoop steps the model continuously on a background thread, as
+    fast as possible or throttled to a target ticks/s, and can be paused and
+    resumed.
+  - "get_step" no longer steps the model. It samples whatever state the loop
+    has reached, at the page's frame rate (the FPS slider). Ticks between two
+    samples are simply never rendered (frame skipping). Rendering runs on a
+    worker thread, so the websocket stays responsive during a long tick.
+  - A LoopControl element adds Pause/Resume, a ticks/s box and a status line
+    (tick, measured ticks/s, frames skipped).
+
+The loop starts with the first Start/Step after a reset. While it is paused,
+Step advances exactly one tick.
+
+    python -m visualization.server --live --tps 20
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.escape
+import tornado.ioloop
+
+try:
+    from mesa.visualization import VisualizationElement
+except ImportError:
+    from mesa.visualization.ModularVisualization import VisualizationElement
+
+from visualization.layered_canvas import CanvasServer, CanvasSocketHandler, render_for
+
+class SimulationLoop:
+    """Steps model on a daemon thread; every access to the model goes through lock."""
+    def __init__(self, model, ticks_per_second=None):
+        self.model = model
+        self.lock = threading.Lock()
+        self.ticks_per_second = ticks_per_second
+        self.ticks = 0
+        self.started = False
+        self._resume = threading.Event()
+        self._stop = threading.Event()
+        self._wake = threading.Event()   # interrupts throttle sleeps on rate changes / stop
+        self._thread = threading.Thread(target=self._run, name="simulation-loop", daemon=True)
+        self._thread.start()
+
+    @property
+    def paused(self):
+        return not self._resume.is_set()
+
+    def resume(self):
+        self.started = True
+        self._resume.set()
+
+    def pause(self):
+        self.started = True
+        self._resume.clear()
+
+    def set_rate(self, ticks_per_second):
+        """Target ticks/s; None or <= 0 runs unthrottled."""
+        self.ticks_per_second = ticks_per_second if ticks_per_second and ticks_per_second > 0 else None
+        self._wake.set()
+
+    def step_once(self):
+        """One tick on the caller's thread (used for Step while paused)."""
+        with self.lock:
+            if self.model.running:
+                self.model.step()
+                self.ticks += 1
+
+    def stop(self):
+        self._stop.set()
+        self._resume.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        deadline = time.perf_counter()
+        while True:
+            if not self._resume.is_set():
+                self._resume.wait()
+                # no burst of catch-up ticks after a pause
+                deadline = time.perf_counter()
+            if self._stop.is_set():
+                return
+            with self.lock:
+                if self.model.running:
+                    self.model.step()
+                    self.ticks += 1
+                finished = not self.model.running
+            if finished:
+                # nothing left to simulate; wait for a reset (which stops this loop)
+                self._resume.clear()
+                continue
+            tps = self.ticks_per_second
+            if tps:
+                # ticks slower than the target just run back to back
+                deadline = max(deadline + 1.0 / tps, time.perf_counter())
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    self._wake.wait(delay)
+                    self._wake.clear()
+            else:
+                deadline = time.perf_counter()
+
+class LoopControl(VisualizationElement):
+    """Pause/Resume button, ticks/s box and loop status for a LiveServer."""
+    local_includes = ["LoopControlModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    js_code = "elements.push(new LoopControlModule());"
+
+    def __init__(self):
+        super().__init__()
+        self.loop = None
+        self._last = None   # (loop, ticks, time) at the previous render
+
+    def render(self, model):
+        loop = self.loop
+        now = time.perf_counter()
+        if self._last is None or self._last[0] is not loop:
+            tps, skipped = 0.0, 0
+        else:
+            _, ticks, then = self._last
+            tps = (loop.ticks - ticks) / max(now - then, 1e-9)
+            skipped = max(0, loop.ticks - ticks - 1)
+        self._last = (loop, loop.ticks, now)
+        return {"tick": model.schedule.steps, "tps": round(tps, 1), "skipped": skipped,
+                "paused": loop.paused, "target": loop.ticks_per_second or 0, "running": model.running}
+
+class LiveSocketHandler(CanvasSocketHandler):
+    async def on_message(self, message):
+        app = self.application
+        msg = tornado.escape.json_decode(message)
+        kind = msg["type"]
+        if kind == "get_step":
+            if not app.loop.started:
+                app.loop.resume()
+            elif app.loop.paused:
+                await app.off_thread(app.loop.step_once)
+            self.write_message({"type": "viz_state", "data": await app.off_thread(render_for, app, self)})
+            if not app.model.running:
+                self.write_message({"type": "end"})
+        elif kind == "reset":
+            await app.off_thread(app.reset_model)
+            self.write_message({"type": "viz_state", "data": await app.off_thread(render_for, app, self)})
+        elif kind == "pause":
+            app.loop.pause()
+        elif kind == "resume":
+            app.loop.resume()
+        elif kind == "set_rate":
+            app.loop.set_rate(float(msg.get("value") or 0))
+        else:
+            super().on_message(message)
+
+class LiveServer(CanvasServer):
+    def __init__(self, model_cls, visualization_elements, name="Mesa Model", model_params=None,
+                 port=None, ticks_per_second=None):
+        self.ticks_per_second = ticks_per_second
+        self.loop = None
+        self.control = LoopControl()
+        # one worker: renders and resets run in order, off the IO loop
+        self._worker = ThreadPoolExecutor(max_workers=1)
+        super().__init__(model_cls, [self.control] + list(visualization_elements),
+                         name=name, model_params=model_params, port=port)
+        # ModularServer registers the stepping SocketHandler itself; rules added
+        # later are matched first, so this one takes over /ws
+        self.add_handlers(r".*$", [(r"/ws", LiveSocketHandler)])
+
+    def reset_model(self):
+        rate = self.ticks_per_second
+        if self.loop is not None:
+            rate = self.loop.ticks_per_second
+            self.loop.stop()
+        super().reset_model()
+        self.loop = SimulationLoop(self.model, ticks_per_second=rate)
+        self.control.loop = self.loop
+
+    def render_model(self):
+        with self.loop.lock:
+            return super().render_model()
+
+    def off_thread(self, fn, *args):
+        return tornado.ioloop.IOLoop.current().run_in_executor(self._worker, fn, *args)
@@ -0,0 +1,106 @@
+"""
+playback.py - review a recorded run (storage/replay.py) in the visualization server.
+
+ReplayModel stands in for VoidBreachModel: ModularServer steps and renders it
+as usual, but each step just applies the next record of the replay log, so
+even runs that took hours on a large map play back at page speed. The
+"Start tick" slider scrubs: changing it resets the page and the new model
+seeks straight to that tick (nearest keyframe plus at most keyframe_every - 1
+deltas). When playback reaches the end of a log that is still being written,
+it picks up the records flushed since.
+
+    python -m visualization.server --replay data/runs/seed1.vbr
+"""
+try:
+    from mesa.visualization import Slider
+except ImportError:
+    from mesa.visualization.UserParam import Slider
+
+from storage.replay import ReplayLog, TYPE_NAMES
+from visualization.charts import population_chart
+from visualization.layered_canvas import CanvasServer, LayeredCanvas
+
+class ReplayAgent:
+    __slots__ = ("unique_id", "pos")
+
+    def __init__(self, unique_id, pos):
+        self.unique_id = unique_id
+        self.pos = pos
+
+class _Clock:
+    def __init__(self):
+        self.steps = 0
+
+class _Series:
+    # latest values only, as ChartModule reads them
+    def __init__(self):
+        self.model_vars = {"Natives": [0], "Voidspawns": [0]}
+
+class ReplayModel:
+    """The parts of VoidBreachModel the renderers read, driven by a replay log."""
+    population = None
+
+    def __init__(self, path, tick=0):
+        self.path = path
+        self.log = ReplayLog(path)
+        self.state = self.log.state_at(tick)
+        self.width = self.log.width
+        self.height = self.log.height
+        self.running = len(self.log) > 0
+        self.schedule = _Clock()
+        self.data_collector = _Series()
+        self._sync()
+
+    # map and fog layers of the current tick
+    @property
+    def movement_cost(self):
+        return self.state.movement_cost
+
+    @property
+    def passable(self):
+        return self.state.passable
+
+    @property
+    def map_version(self):
+        return self.state.map_version
+
+    @property
+    def visible(self):
+        return self.state.visible
+
+    @property
+    def explored(self):
+        return self.state.explored
+
+    def _sync(self):
+        registry = {name: [] for name in TYPE_NAMES.values()}
+        for (code, uid), pos in self.state.agents.items():
+            registry[TYPE_NAMES[code]].append(ReplayAgent(uid, pos))
+        self.registry = registry
+        self.schedule.steps = self.state.tick or 0
+        self.data_collector.model_vars["Natives"] = [self.state.natives]
+        self.data_collector.model_vars["Voidspawns"] = [self.state.voidspawns]
+
+    def step(self):
+        i = 0 if self.state.record is None else self.state.record + 1
+        if i >= len(self.log):
+            # the recorder may have flushed more since the log was opened
+            self.log = ReplayLog(self.path)
+            if i >= len(self.log):
+                self.running = False
+                return
+        self.log.apply(self.state, i)
+        self._sync()
+
+def make_replay_server(path):
+    """ModularServer that plays back the replay log at path."""
+    log = ReplayLog(path)
+    last = int(log.ticks[-1]) if len(log) else 0
+    params = {
+        "path": path,
+        "tick": Slider("Start tick", 0, 0, last, max(1, log.keyframe_every // 10)),
+    }
+    elements = [LayeredCanvas(600, 600), population_chart()]
+    server = CanvasServer(ReplayModel, elements, f"VOID BREACH replay: {path}", params)
+    server.port = 8521
+    return server